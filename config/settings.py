@@ -11,7 +11,9 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
 import os
+import sys
 from pathlib import Path
+from celery.schedules import crontab
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -140,6 +142,77 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 # Настройки Telegram (для Celery-задач)
 TELEGRAM_BOT_TOKEN = os.getenv('TELEGRAM_BOT_TOKEN')
+# Ограничения Bot API: не больше ~30 сообщений в секунду всего и 1 сообщения в секунду в один чат
+TELEGRAM_GLOBAL_RATE = float(os.getenv('TELEGRAM_GLOBAL_RATE', 30))
+TELEGRAM_PER_CHAT_RATE = float(os.getenv('TELEGRAM_PER_CHAT_RATE', 1))
+# Сколько сообщений может отправляться одновременно (и размер пула соединений)
+TELEGRAM_MAX_IN_FLIGHT = int(os.getenv('TELEGRAM_MAX_IN_FLIGHT', 32))
+# Сколько раз повторять отправку после ответа 429 "retry after"
+TELEGRAM_MAX_RETRIES = int(os.getenv('TELEGRAM_MAX_RETRIES', 3))
+
+# Настройки рассылки напоминаний
+# Сколько привычек читается из базы и отправляется за одну порцию
+REMINDER_CHUNK_SIZE = int(os.getenv('REMINDER_CHUNK_SIZE', 1000))
+# Параллельная рассылка: не больше REMINDER_MAX_PARTITIONS подзадач,
+# в каждой в среднем не меньше REMINDER_MIN_PARTITION_SIZE привычек
+REMINDER_MAX_PARTITIONS = int(os.getenv('REMINDER_MAX_PARTITIONS', 16))
+REMINDER_MIN_PARTITION_SIZE = int(os.getenv('REMINDER_MIN_PARTITION_SIZE', 500))
+# Режим сводки: все привычки пользователя с одним сроком — одним сообщением
+REMINDER_DIGEST = os.getenv('REMINDER_DIGEST', 'False') == 'True'
+# Повторы неудачных отправок: не больше REMINDER_RETRY_LIMIT попыток с экспоненциальной
+# задержкой от REMINDER_RETRY_BASE_DELAY до REMINDER_RETRY_MAX_DELAY секунд,
+# после чего напоминание попадает в очередь недоставленных
+REMINDER_RETRY_LIMIT = int(os.getenv('REMINDER_RETRY_LIMIT', 5))
+REMINDER_RETRY_BASE_DELAY = int(os.getenv('REMINDER_RETRY_BASE_DELAY', 60))
+REMINDER_RETRY_MAX_DELAY = int(os.getenv('REMINDER_RETRY_MAX_DELAY', 3600))
+# Кэш готовых текстов напоминаний: сколько текстов держать в памяти процесса
+# и, если задано, имя кэша из CACHES для общего уровня (например, 'default' с Redis)
+REMINDER_BODY_CACHE_SIZE = int(os.getenv('REMINDER_BODY_CACHE_SIZE', 10000))
+REMINDER_BODY_SHARED_CACHE = os.getenv('REMINDER_BODY_SHARED_CACHE', '')
+
+# Кэш: общий для всех процессов Redis (версия ленты, страницы ленты, счётчики попаданий);
+# память процесса — только в тестах (manage.py test), где Redis нет
+if sys.argv[1:2] != ['test']:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.getenv('CACHE_URL', 'redis://localhost:6379/1'),
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+# Сколько секунд хранить страницы ленты публичных привычек (актуальность обеспечивает версия ленты)
+PUBLIC_FEED_CACHE_TIMEOUT = int(os.getenv('PUBLIC_FEED_CACHE_TIMEOUT', 600))
+
+# Синхронизация привычек (?since=): токен сдвигается назад на HABIT_SYNC_SAFETY_LAG секунд,
+# чтобы не потерять изменения транзакций, закоммиченных позже своего updated_at;
+# отметки об удалении хранятся HABIT_SYNC_TOMBSTONE_DAYS дней
+HABIT_SYNC_SAFETY_LAG = int(os.getenv('HABIT_SYNC_SAFETY_LAG', 5))
+HABIT_SYNC_TOMBSTONE_DAYS = int(os.getenv('HABIT_SYNC_TOMBSTONE_DAYS', 30))
+# Сколько изменённых привычек отдавать за один запрос синхронизации (остальные — по токену продолжения)
+HABIT_SYNC_PAGE_SIZE = int(os.getenv('HABIT_SYNC_PAGE_SIZE', 500))
+
+# Выгрузка привычек (NDJSON/CSV): сколько строк читать из базы и записывать в ответ за раз
+HABIT_EXPORT_CHUNK_SIZE = int(os.getenv('HABIT_EXPORT_CHUNK_SIZE', 2000))
+
+# Импорт привычек: размер пачки, которая проверяется и загружается (COPY в PostgreSQL) за раз
+HABIT_IMPORT_BATCH_SIZE = int(os.getenv('HABIT_IMPORT_BATCH_SIZE', 5000))
+
+# Отметки о выполнении: сколько отметок принимать за один запрос
+# и на сколько месяцев вперёд создавать секции таблицы (PostgreSQL)
+HABIT_CHECK_IN_MAX_ITEMS = int(os.getenv('HABIT_CHECK_IN_MAX_ITEMS', 1000))
+HABIT_COMPLETION_PARTITIONS_AHEAD = int(os.getenv('HABIT_COMPLETION_PARTITIONS_AHEAD', 3))
+
+# Дневные сводки отметок: граница обработки сдвигается назад на HABIT_ROLLUP_SAFETY_LAG секунд,
+# чтобы не пропустить отметки транзакций, закоммиченных позже своего created_at;
+# статистика (/habits/stats/) отдаётся не больше чем за HABIT_STATS_MAX_DAYS дней
+HABIT_ROLLUP_SAFETY_LAG = int(os.getenv('HABIT_ROLLUP_SAFETY_LAG', 60))
+HABIT_STATS_MAX_DAYS = int(os.getenv('HABIT_STATS_MAX_DAYS', 366))
 
 # Настройка кастомной модели пользователя (если будем расширять, пока просто указываем)
 AUTH_USER_MODEL = 'users.User'
@@ -179,4 +252,45 @@ CELERY_RESULT_BACKEND = os.getenv('CELERY_RESULT_BACKEND', 'redis://localhost:63
 CELERY_ACCEPT_CONTENT = ['json']
 CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
-CELERY_TIMEZONE = 'Europe/Moscow'
+# Расписание Celery ведётся в том же поясе, что и проект (UTC);
+# местное время напоминаний определяется часовым поясом пользователя
+CELERY_TIMEZONE = TIME_ZONE
+
+# Планировщик напоминаний:
+# 'db' — раз в час выборка по индексу next_due_at (точность — час),
+# 'redis' — раз в минуту выборка из сортированного множества в Redis (точность — минута)
+REMINDER_SCHEDULER = os.getenv('REMINDER_SCHEDULER', 'db')
+REMINDER_WHEEL_REDIS_URL = os.getenv('REMINDER_WHEEL_REDIS_URL', CELERY_BROKER_URL)
+REMINDER_WHEEL_KEY = 'habits:reminders:due'
+
+if REMINDER_SCHEDULER == 'redis':
+    CELERY_BEAT_SCHEDULE = {
+        'tick-reminder-wheel': {
+            'task': 'habits.tasks.tick_reminder_wheel',
+            'schedule': crontab(),
+        },
+        'resync-reminder-wheel': {
+            'task': 'habits.tasks.resync_reminder_wheel',
+            'schedule': crontab(minute=30, hour=3),
+        },
+    }
+else:
+    CELERY_BEAT_SCHEDULE = {
+        'send-habit-reminders': {
+            'task': 'habits.tasks.send_habit_reminders',
+            'schedule': crontab(minute=0),
+        },
+    }
+
+CELERY_BEAT_SCHEDULE['purge-habit-tombstones'] = {
+    'task': 'habits.tasks.purge_habit_tombstones',
+    'schedule': crontab(minute=0, hour=4),
+}
+CELERY_BEAT_SCHEDULE['create-completion-partitions'] = {
+    'task': 'habits.tasks.create_completion_partitions',
+    'schedule': crontab(minute=30, hour=4),
+}
+CELERY_BEAT_SCHEDULE['build-habit-rollups'] = {
+    'task': 'habits.tasks.build_habit_rollups',
+    'schedule': crontab(minute='*/10'),
+}
@@ -1,3 +1,20 @@
 from django.contrib import admin
 
-# Register your models here.
+from habits.models import ReminderDeadLetter
+from habits.tasks import replay_reminder_dead_letters
+
+
+@admin.register(ReminderDeadLetter)
+class ReminderDeadLetterAdmin(admin.ModelAdmin):
+    """Очередь недоставленных напоминаний: просмотр и повторная отправка."""
+    list_display = ('id', 'chat_id', 'error', 'attempts', 'created_at', 'replayed_at')
+    list_filter = ('replayed_at',)
+    search_fields = ('chat_id', 'error')
+    readonly_fields = ('delivery', 'chat_id', 'text', 'error', 'attempts', 'created_at', 'replayed_at')
+    actions = ('replay',)
+
+    @admin.action(description='Отправить повторно')
+    def replay(self, request, queryset):
+        ids = list(queryset.filter(replayed_at__isnull=True).values_list('id', flat=True))
+        replay_reminder_dead_letters.delay(ids)
+        self.message_user(request, f'Повторная отправка поставлена в очередь: {len(ids)} напоминаний.')
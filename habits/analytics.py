@@ -0,0 +1,248 @@
+from time import perf_counter
+
+from django.db import connection
+from django.db.models import Max, Min
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import ExtractHour, ExtractMinute
+from django.utils import timezone
+
+from habits.models import Habit, HabitCompletion
+from users.models import User
+
+try:
+    import numpy as np
+except ImportError:  # numpy ставится с зависимостями проекта; без неё аналитика и планировщик нагрузки недоступны
+    np = None
+
+DAY = 24 * 60 * 60
+WEEK = 7 * DAY
+# Множитель ключа (привычка, день): номер дня от начала эпохи меньше 2 ** 20
+DAY_KEY = 2 ** 20
+
+# Сколько строк забирать из курсора за раз при загрузке столбцов
+FETCH_SIZE = 100_000
+
+# Момент времени в секундах от начала эпохи (целое число) на стороне базы данных
+EPOCH_SQL = {
+    'postgresql': 'CAST(EXTRACT(EPOCH FROM {}) AS bigint)',
+    'sqlite': "CAST(strftime('%%s', {}) AS INTEGER)",
+}
+
+
+def epoch(model, field):
+    """Выражение: поле даты и времени модели в секундах от начала эпохи."""
+    column = f'{connection.ops.quote_name(model._meta.db_table)}.{connection.ops.quote_name(field)}'
+    return RawSQL(EPOCH_SQL[connection.vendor].format(column), [])
+
+
+def fetch_array(queryset, columns):
+    """
+    Загружает числовые столбцы выборки в массив int64 (строки × столбцы) напрямую из курсора,
+    минуя создание объектов и преобразования ORM. Сортировка по умолчанию (Meta.ordering)
+    снимается: порядок строк не нужен, а сортировка всей выборки дороже самой загрузки.
+    """
+    sql, params = queryset.order_by().values_list(*columns).query.sql_with_params()
+    parts = []
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        while rows := cursor.fetchmany(FETCH_SIZE):
+            parts.append(np.array(rows, dtype=np.int64))
+    return np.concatenate(parts) if parts else np.empty((0, len(columns)), dtype=np.int64)
+
+
+def load_chunk(first_id, last_id, offsets):
+    """
+    Столбцы пользователей с id в диапазоне [first_id, last_id), их привычек и отметок.
+    Возвращает три словаря массивов NumPy, пользователи упорядочены по id.
+    Местное время отметок (local) считается по смещению пояса в момент отметки
+    (offsets — capacity.ZoneOffsets), с учётом перехода на летнее время.
+    """
+    users = list(
+        User.objects.filter(id__gte=first_id, id__lt=last_id).order_by('id')
+        .annotate(joined=epoch(User, 'date_joined')).values_list('id', 'joined', 'timezone')
+    )
+    user_ids = np.array([user_id for user_id, _, _ in users], dtype=np.int64)
+    habits = fetch_array(
+        Habit.objects.filter(user_id__gte=first_id, user_id__lt=last_id)
+        .annotate(minute=ExtractHour('time') * 60 + ExtractMinute('time')),
+        ('user_id', 'minute', 'periodicity', 'is_pleasant'),
+    )
+    completions = fetch_array(
+        HabitCompletion.objects.filter(user_id__gte=first_id, user_id__lt=last_id)
+        .annotate(moment=epoch(HabitCompletion, 'completed_at')),
+        ('habit_id', 'user_id', 'moment'),
+    )
+    # Строки пользователей, появившихся между запросами, отбрасываются (как в capacity.load_schedule)
+    habits = habits[np.isin(habits[:, 0], user_ids)]
+    completions = completions[np.isin(completions[:, 1], user_ids)]
+    user_zones = np.array([offsets.code(name) for _, _, name in users], dtype=np.int64)
+    owner = positions(user_ids, completions[:, 1]) if len(user_ids) else completions[:, 1]
+    return (
+        {
+            'id': user_ids,
+            'joined': np.array([joined for _, joined, _ in users], dtype=np.int64),
+        },
+        {
+            'user_id': habits[:, 0], 'minute': habits[:, 1],
+            'periodicity': habits[:, 2], 'is_pleasant': habits[:, 3].astype(bool),
+        },
+        {
+            'habit_id': completions[:, 0], 'user_id': completions[:, 1], 'moment': completions[:, 2],
+            'local': offsets.to_local(user_zones[owner], completions[:, 2]),
+        },
+    )
+
+
+def positions(ids, values):
+    """
+    Номера values в упорядоченном массиве ids через плотную таблицу соответствия:
+    id порции лежат в узком диапазоне, и это быстрее двоичного поиска по каждой строке.
+    """
+    lookup = np.zeros(ids[-1] - ids[0] + 1, dtype=np.int64)
+    lookup[ids - ids[0]] = np.arange(len(ids))
+    return lookup[values - ids[0]]
+
+
+def first_occurrences(keys):
+    """Индексы первых вхождений различных ключей (сортировка и сравнение соседей)."""
+    order = np.argsort(keys)
+    ordered = keys[order]
+    return order[np.concatenate((ordered[:1] == ordered[:1], ordered[1:] != ordered[:-1]))]
+
+
+def reverse_cumsum(counts):
+    """counts[:, k] → сумма counts[:, k + 1:]: сколько значений строго больше k."""
+    return counts[:, ::-1].cumsum(axis=1)[:, ::-1][:, 1:]
+
+
+class CohortReport:
+    """
+    Накопитель когортной аналитики. Когорта — месяц регистрации пользователя,
+    недели отсчитываются от регистрации; учитываются только полностью прошедшие недели.
+    Порции пользователей добавляются по очереди (add_chunk), в памяти хранятся
+    только счётчики по когортам, поэтому объём памяти определяется размером порции.
+
+    - удержание: доля пользователей когорты с хотя бы одной отметкой за неделю k;
+    - соблюдение: выполненные дни привычек / ожидаемые (привычка ожидается раз в periodicity дней);
+    - гистограммы по часам: запланированное время полезных и приятных привычек
+      и фактическое время отметок (по местному времени пользователя).
+    """
+
+    def __init__(self, weeks, now):
+        self.weeks = weeks
+        self.now = int(now.timestamp())
+        # Месяц когорты → [пользователи, прошедшие неделю k; удержанные; ожидалось; выполнено] × недели
+        self.cohorts = {}
+        self.cohort_sizes = {}
+        self.scheduled_hours = np.zeros((2, 24), dtype=np.int64)
+        self.completed_hours = np.zeros(24, dtype=np.int64)
+        self.totals = {'users': 0, 'habits': 0, 'completions': 0}
+
+    def add_chunk(self, users, habits, completions):
+        weeks = self.weeks
+        user_ids, joined = users['id'], users['joined']
+        if not len(user_ids):
+            return
+        self.totals['users'] += len(user_ids)
+        self.totals['habits'] += len(habits['user_id'])
+        self.totals['completions'] += len(completions['user_id'])
+
+        codes, cohort = np.unique(
+            joined.astype('datetime64[s]').astype('datetime64[M]').astype(np.int64), return_inverse=True,
+        )
+        cohort = cohort.reshape(-1)
+        # Сколько полных недель прошло с регистрации (не больше weeks)
+        elapsed = np.clip((self.now - joined) // WEEK, 0, weeks)
+
+        # Привычки: сколько сроков в неделю ожидается от пользователя и запланированное время
+        habit_user = positions(user_ids, habits['user_id'])
+        due_per_week = np.bincount(habit_user, weights=7.0 / habits['periodicity'], minlength=len(user_ids))
+        hours = habits['minute'] // 60
+        self.scheduled_hours[0] += np.bincount(hours[~habits['is_pleasant']], minlength=24)
+        self.scheduled_hours[1] += np.bincount(hours[habits['is_pleasant']], minlength=24)
+
+        # Отметки: местное время, неделя от регистрации; в расчёт идут только прошедшие недели
+        completion_user = positions(user_ids, completions['user_id'])
+        local = completions['local']
+        self.completed_hours += np.bincount(local % DAY // 3600, minlength=24)
+        week = (completions['moment'] - joined[completion_user]) // WEEK
+        valid = (week >= 0) & (week < elapsed[completion_user])
+        completion_user, week, local = completion_user[valid], week[valid], local[valid]
+        habit_ids = completions['habit_id'][valid]
+
+        # Удержание: различные пары (пользователь, неделя) — отметки в таблице пользователи × недели
+        active = np.zeros(len(user_ids) * weeks, dtype=bool)
+        active[completion_user * weeks + week] = True
+        active_user, active_week = np.divmod(np.flatnonzero(active), weeks)
+        # Соблюдение: различные пары (привычка, местный день) — несколько отметок за день считаются одной
+        first = first_occurrences(habit_ids * DAY_KEY + local // DAY)
+
+        size = len(codes)
+        shape = (size, weeks + 1)
+        cells = size * weeks
+        eligible = reverse_cumsum(np.bincount(cohort * (weeks + 1) + elapsed, minlength=size * (weeks + 1))
+                                  .reshape(shape))
+        expected = reverse_cumsum(np.bincount(cohort * (weeks + 1) + elapsed, weights=due_per_week,
+                                              minlength=size * (weeks + 1)).reshape(shape))
+        retained = np.bincount(cohort[active_user] * weeks + active_week, minlength=cells).reshape(size, weeks)
+        done = np.bincount(
+            cohort[completion_user[first]] * weeks + week[first], minlength=cells,
+        ).reshape(size, weeks)
+
+        counts = np.stack([eligible, retained, expected, done], axis=1)
+        cohort_sizes = np.bincount(cohort, minlength=size)
+        for index, code in enumerate(codes.tolist()):
+            if code not in self.cohorts:
+                self.cohorts[code] = np.zeros((4, weeks))
+                self.cohort_sizes[code] = 0
+            self.cohorts[code] += counts[index]
+            self.cohort_sizes[code] += int(cohort_sizes[index])
+
+    def result(self):
+        codes = sorted(self.cohorts)
+        counts = np.array([self.cohorts[code] for code in codes]).reshape(len(codes), 4, self.weeks)
+        eligible, retained, expected, done = (counts[:, index] for index in range(4))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            retention = np.where(eligible > 0, retained / eligible, np.nan)
+            adherence = np.where(expected > 0, done / expected, np.nan)
+        return {
+            **self.totals,
+            'weeks': self.weeks,
+            'cohorts': [str(np.datetime64(code, 'M')) for code in codes],
+            'cohort_sizes': [self.cohort_sizes[code] for code in codes],
+            'retention': matrix_to_list(retention),
+            'adherence': matrix_to_list(adherence),
+            'scheduled_hours': {
+                'useful': self.scheduled_hours[0].tolist(),
+                'pleasant': self.scheduled_hours[1].tolist(),
+            },
+            'completed_hours': self.completed_hours.tolist(),
+        }
+
+
+def matrix_to_list(matrix):
+    """Матрица долей в списки; пустые ячейки (нет данных) — None."""
+    return [[None if np.isnan(value) else round(float(value), 4) for value in row] for row in matrix]
+
+
+def run_analytics(weeks=12, chunk_size=50_000, now=None):
+    """
+    Когортная аналитика по всем пользователям: данные загружаются и обрабатываются
+    порциями по chunk_size id пользователей. Возвращает результат CohortReport.result()
+    и время работы в секундах (seconds).
+    """
+    if np is None:
+        raise ImportError('Для аналитики нужен пакет numpy.')
+    from habits.capacity import ZoneOffsets
+
+    now = now or timezone.now()
+    started = perf_counter()
+    report = CohortReport(weeks, now)
+    # Таблицы смещений поясов — на отрезок от первой отметки до текущего момента, пояса добавляются по мере появления
+    first_completion = HabitCompletion.objects.aggregate(first=Min('completed_at'))['first'] or now
+    offsets = ZoneOffsets([], int(first_completion.timestamp()) // DAY - 1, int(now.timestamp()) // DAY + 2)
+    bounds = User.objects.aggregate(first=Min('id'), last=Max('id'))
+    if bounds['first'] is not None:
+        for first_id in range(bounds['first'], bounds['last'] + 1, chunk_size):
+            report.add_chunk(*load_chunk(first_id, first_id + chunk_size, offsets))
+    return {**report.result(), 'seconds': perf_counter() - started}
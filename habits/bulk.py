@@ -0,0 +1,174 @@
+from django.db import transaction
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+
+from habits.feed_cache import bump_feed_version
+from habits.message_cache import get_body_cache
+from habits.models import Habit
+from habits.scheduling import first_due_at, get_zone
+from habits.serializers import HabitSerializer
+from habits.timing_wheel import get_wheel, wheel_enabled
+
+# Наибольшее количество привычек в одном массовом запросе
+BULK_MAX_ITEMS = 100
+
+
+class BulkValidationError(Exception):
+    """
+    Ошибки массовой операции по элементам: список {'index': индекс элемента, 'errors': ошибки}.
+    В отличие от ValidationError, индексы остаются числами в ответе.
+    """
+
+    def __init__(self, errors):
+        super().__init__(errors)
+        self.errors = errors
+
+
+def check_items(items, item_type=dict, max_items=BULK_MAX_ITEMS):
+    """Проверяет, что тело запроса — непустой список не длиннее max_items из элементов item_type."""
+    if not isinstance(items, list) or not items:
+        raise ValidationError({'non_field_errors': ['Ожидается непустой список.']})
+    if len(items) > max_items:
+        raise ValidationError({'non_field_errors': [f'Не больше {max_items} элементов за запрос.']})
+    errors = [
+        {'index': index, 'errors': {'non_field_errors': ['Неверный формат элемента.']}}
+        for index, item in enumerate(items)
+        if not isinstance(item, item_type) or isinstance(item, bool)
+    ]
+    if errors:
+        raise BulkValidationError(errors)
+
+
+def load_related_habits(items):
+    """Загружает одним запросом все привычки, на которые ссылаются элементы через related_habit."""
+    related_ids = set()
+    for item in items:
+        try:
+            related_ids.add(int(item['related_habit']))
+        except (KeyError, TypeError, ValueError):
+            pass
+    return Habit.objects.in_bulk(related_ids) if related_ids else {}
+
+
+def validate_items(items, request, instances=None):
+    """
+    Проверяет все элементы HabitSerializer за один проход и возвращает проверенные данные.
+    instances — список привычек для частичного обновления (в том же порядке), иначе создание.
+    При ошибках выбрасывает BulkValidationError со списком ошибок и индексами элементов.
+    """
+    context = {'request': request, 'related_habits': load_related_habits(items)}
+    validated, errors = [], []
+    for index, item in enumerate(items):
+        instance = instances[index] if instances else None
+        serializer = HabitSerializer(instance, data=item, partial=instance is not None, context=context)
+        if serializer.is_valid():
+            validated.append(serializer.validated_data)
+        else:
+            errors.append({'index': index, 'errors': serializer.errors})
+    if errors:
+        raise BulkValidationError(errors)
+    return validated
+
+
+def bulk_create_habits(items, request):
+    """
+    Создаёт привычки пользователя одним bulk_create в одной транзакции.
+    Возвращает созданные привычки.
+    """
+    check_items(items)
+    validated = validate_items(items, request)
+
+    now = timezone.now()
+    tz = get_zone(request.user.timezone)
+    habits = [Habit(**data, next_due_at=first_due_at(data['time'], now, tz)) for data in validated]
+    with transaction.atomic():
+        Habit.objects.bulk_create(habits)
+        after_bulk_write(habits, public_changed=any(habit.is_public for habit in habits))
+    return habits
+
+
+def bulk_update_habits(items, request, queryset):
+    """
+    Частично обновляет привычки пользователя одним bulk_update в одной транзакции.
+    Каждый элемент содержит id привычки и изменяемые поля.
+    Возвращает обновлённые привычки в порядке элементов.
+    """
+    check_items(items)
+    habits_by_id = queryset.select_related('related_habit').in_bulk(
+        {item.get('id') for item in items if isinstance(item.get('id'), int) and not isinstance(item.get('id'), bool)}
+    )
+
+    errors, seen = [], set()
+    for index, item in enumerate(items):
+        habit_id = item.get('id')
+        if not isinstance(habit_id, int) or isinstance(habit_id, bool) or habit_id not in habits_by_id:
+            errors.append({'index': index, 'errors': {'id': ['Привычка не найдена.']}})
+        elif habit_id in seen:
+            errors.append({'index': index, 'errors': {'id': ['Привычка указана несколько раз.']}})
+        seen.add(habit_id)
+    if errors:
+        raise BulkValidationError(errors)
+
+    habits = [habits_by_id[item['id']] for item in items]
+    was_public = any(habit.is_public for habit in habits)
+    validated = validate_items(items, request, instances=habits)
+
+    # Все привычки выборки — привычки текущего пользователя
+    now, tz = timezone.now(), get_zone(request.user.timezone)
+    fields = {'updated_at'}
+    for habit, data in zip(habits, validated):
+        for field, value in data.items():
+            setattr(habit, field, value)
+        fields.update(data)
+        # Как и HabitSerializer.update: новое время или периодичность — новый срок напоминания
+        if 'time' in data or 'periodicity' in data:
+            habit.next_due_at = first_due_at(habit.time, now, tz)
+            fields.add('next_due_at')
+        habit.updated_at = now
+    fields.discard('user')
+
+    with transaction.atomic():
+        Habit.objects.bulk_update(habits, sorted(fields))
+        after_bulk_write(
+            habits,
+            public_changed=was_public or any(habit.is_public for habit in habits),
+            changed_ids=[habit.id for habit in habits],
+        )
+    return habits
+
+
+def bulk_delete_habits(ids, queryset):
+    """
+    Удаляет привычки пользователя по списку id в одной транзакции.
+    Удаление идёт через QuerySet.delete(), поэтому сигналы модели
+    (отметки для синхронизации, расписание, кэши) срабатывают как при одиночном удалении,
+    а запросы к базе и кэшу выполняются один раз на всю пачку (habits.deletion).
+    """
+    check_items(ids, item_type=int)
+    existing = set(queryset.filter(id__in=ids).values_list('id', flat=True))
+    errors = [
+        {'index': index, 'errors': {'id': ['Привычка не найдена.']}}
+        for index, habit_id in enumerate(ids) if habit_id not in existing
+    ]
+    if errors:
+        raise BulkValidationError(errors)
+
+    with transaction.atomic():
+        queryset.filter(id__in=existing).delete()
+    return len(existing)
+
+
+def after_bulk_write(habits, public_changed, changed_ids=()):
+    """
+    bulk_create и bulk_update не вызывают сигналы модели, поэтому то, что делают
+    обработчики из habits.signals, выполняется здесь одним действием на всю пачку:
+    расписание в Redis, версия ленты публичных привычек и кэш текстов напоминаний.
+    """
+    if wheel_enabled():
+        due_dates = {habit.id: habit.next_due_at for habit in habits}
+        transaction.on_commit(lambda: get_wheel().schedule_many(due_dates))
+    if public_changed:
+        transaction.on_commit(bump_feed_version)
+    if changed_ids:
+        habit_ids = [*changed_ids, *Habit.objects.filter(related_habit_id__in=changed_ids).values_list('id', flat=True)]
+        transaction.on_commit(lambda: get_body_cache().invalidate(habit_ids))
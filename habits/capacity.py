@@ -0,0 +1,189 @@
+import datetime
+import math
+from time import perf_counter
+
+from django.conf import settings
+from django.db.models import Max, Min
+from django.db.models.functions import ExtractHour, ExtractMinute
+from django.utils import timezone
+
+from habits.analytics import DAY, epoch, fetch_array, first_occurrences, np, positions
+from habits.models import Habit
+from habits.scheduling import get_zone
+from users.models import User
+
+# Шаг таблиц смещений поясов: переходы на летнее/зимнее время происходят на границах четверти часа
+QUARTER = 15 * 60
+
+# Длина тика планировщика в секундах: 'db' — раз в час, 'redis' — раз в минуту
+TICKS = {'db': 3600, 'redis': 60}
+
+
+class ZoneOffsets:
+    """
+    Таблицы смещений поясов от UTC с шагом QUARTER на отрезке дней [first_day, last_day)
+    (дни от начала эпохи). Переводят местное время в UTC и обратно для массивов моментов
+    без вызова zoneinfo на каждую привычку. Местное время понимается так же, как в
+    habits.scheduling: несуществующее и неоднозначное время — по правилу fold=0.
+    Моменты за пределами отрезка берут смещение ближайшей его границы.
+    Пояса нумеруются по мере появления (code), строка таблицы добавляется для каждого нового пояса.
+    """
+
+    def __init__(self, names, first_day, last_day):
+        self.start = first_day * DAY
+        self.moments = range(self.start, last_day * DAY, QUARTER)
+        self.codes = {}
+        # local — смещение по местному времени (как часы на стене), utc — по моменту в UTC
+        self.local = np.empty((0, len(self.moments)), dtype=np.int64)
+        self.utc = np.empty((0, len(self.moments)), dtype=np.int64)
+        for name in names:
+            self.code(name)
+
+    def code(self, name):
+        """Номер пояса в таблицах; для нового пояса таблицы дополняются его смещениями."""
+        if name not in self.codes:
+            zone = get_zone(name)
+            local = [
+                datetime.datetime.fromtimestamp(moment, datetime.timezone.utc).replace(tzinfo=zone).utcoffset()
+                for moment in self.moments
+            ]
+            utc = [datetime.datetime.fromtimestamp(moment, zone).utcoffset() for moment in self.moments]
+            self.local = np.vstack([self.local, [offset.total_seconds() for offset in local]]).astype(np.int64)
+            self.utc = np.vstack([self.utc, [offset.total_seconds() for offset in utc]]).astype(np.int64)
+            self.codes[name] = len(self.codes)
+        return self.codes[name]
+
+    def column(self, moments):
+        return np.clip((moments - self.start) // QUARTER, 0, self.local.shape[1] - 1)
+
+    def to_utc(self, zones, local):
+        return local - self.local[zones, self.column(local)]
+
+    def to_local(self, zones, moments):
+        return moments + self.utc[zones, self.column(moments)]
+
+
+def load_schedule(first_id, last_id, zone_code):
+    """
+    Столбцы расписания привычек пользователей с id в диапазоне [first_id, last_id), которым
+    уходят напоминания (есть Telegram, чат не на паузе): пользователь, пояс, минута суток,
+    периодичность и next_due_at в секундах от начала эпохи. Привычки без срока пропускаются.
+    zone_code — номер пояса по имени (ZoneOffsets.code), в том числе для поясов,
+    которые появились после начала расчёта.
+    """
+    users = list(
+        User.objects.filter(id__gte=first_id, id__lt=last_id, telegram_id__isnull=False,
+                            telegram_paused_at__isnull=True)
+        .order_by('id').values_list('id', 'timezone')
+    )
+    habits = fetch_array(
+        Habit.objects.filter(user_id__gte=first_id, user_id__lt=last_id, next_due_at__isnull=False,
+                             user__telegram_id__isnull=False, user__telegram_paused_at__isnull=True)
+        .annotate(minute=ExtractHour('time') * 60 + ExtractMinute('time'), due=epoch(Habit, 'next_due_at')),
+        ('user_id', 'minute', 'periodicity', 'due'),
+    )
+    user_ids = np.array([user_id for user_id, _ in users], dtype=np.int64)
+    user_zones = np.array([zone_code(name) for _, name in users], dtype=np.int16)
+    # Привычки пользователей, появившихся между двумя запросами, в расписание не попадают
+    habits = habits[np.isin(habits[:, 0], user_ids)]
+    owner = positions(user_ids, habits[:, 0]) if len(user_ids) else habits[:, 0]
+    return {
+        'user': owner.astype(np.int32),
+        'zone': user_zones[owner],
+        'minute': habits[:, 1].astype(np.int16),
+        'periodicity': habits[:, 2].astype(np.int8),
+        'due': habits[:, 3],
+    }
+
+
+class ReminderLoad:
+    """
+    Поминутная нагрузка рассылки на отрезке [start, start + minutes): сколько напоминаний
+    и сколько сообщений (обращений к Bot API) уходит на каждом тике планировщика.
+    Повторяет логику рассылки без Telegram и без записи в базу: на тике отправляются привычки
+    со сроком раньше конца окна тика (просроченные — на первом тике), а новый срок
+    считается так же, как в advance_due_at, — по календарным дням пояса пользователя.
+    В режиме сводки сообщения считаются по различным парам (пользователь, тик).
+    """
+
+    def __init__(self, start, minutes, zones, scheduler, digest):
+        self.tick = TICKS[scheduler]
+        self.digest = digest
+        self.start = start
+        self.end = start + minutes * 60
+        self.first_tick = -(-start // self.tick) * self.tick
+        self.offsets = ZoneOffsets(zones, start // DAY - 2, self.end // DAY + 3)
+        self.reminders = np.zeros(minutes, dtype=np.int64)
+        self.messages = np.zeros(minutes, dtype=np.int64)
+        self.habits = 0
+
+    def due_at(self, zone, minute, day):
+        """Срок привычки в местный день day (номер дня) в её время minute — момент UTC."""
+        return self.offsets.to_utc(zone, day * DAY + minute * 60)
+
+    def add(self, schedule):
+        self.habits += len(schedule['due'])
+        due, zone, user = schedule['due'], schedule['zone'], schedule['user']
+        minute = schedule['minute'].astype(np.int64)
+        periodicity = schedule['periodicity'].astype(np.int64)
+
+        # Первая отправка: просроченные — на первом тике, остальные — на тике, в окно которого попадает срок
+        sent = np.where(due < self.first_tick + self.tick, self.first_tick, due // self.tick * self.tick)
+        sends, users = [sent], [user]
+
+        # Следующий срок после конца окна первой отправки (как в advance_due_at)
+        after = sent + self.tick
+        day = self.offsets.to_local(zone, due) // DAY
+        missed = self.offsets.to_local(zone, after) // DAY - day
+        day += np.where(missed > 0, missed // periodicity * periodicity, 0)
+        next_due = self.due_at(zone, minute, day)
+        late = (next_due <= after) | (next_due <= due)
+        day[late] += periodicity[late]
+        next_due[late] = self.due_at(zone[late], minute[late], day[late])
+
+        # Дальше каждый срок отправляется на своём тике, следующий — через periodicity местных дней
+        active = np.flatnonzero(next_due < self.end)
+        while len(active):
+            sends.append(next_due[active] // self.tick * self.tick)
+            users.append(user[active])
+            day[active] += periodicity[active]
+            next_due[active] = self.due_at(zone[active], minute[active], day[active])
+            active = active[next_due[active] < self.end]
+
+        sent, users = np.concatenate(sends), np.concatenate(users)
+        inside = sent < self.end
+        sent, users = sent[inside], users[inside]
+        sent_minute = (sent - self.start) // 60
+        self.reminders += np.bincount(sent_minute, minlength=len(self.reminders))
+        if self.digest:
+            sent_minute = sent_minute[first_occurrences(users.astype(np.int64) * len(self.messages) + sent_minute)]
+        self.messages += np.bincount(sent_minute, minlength=len(self.messages))
+
+
+def plan_reminders(start=None, days=7, scheduler=None, digest=None, chunk_size=50_000):
+    """
+    Оценка нагрузки рассылки напоминаний на days дней вперёд без отправки сообщений.
+    Расписание загружается порциями по chunk_size id пользователей в компактные массивы
+    и проигрывается поминутно (ReminderLoad). scheduler и digest по умолчанию берутся из
+    настроек REMINDER_SCHEDULER и REMINDER_DIGEST. Возвращает ReminderLoad и время работы.
+    """
+    if np is None:
+        raise ImportError('Для планирования нагрузки нужен пакет numpy.')
+    started = perf_counter()
+    start = int((start or timezone.now()).timestamp()) // 60 * 60
+    zones = sorted(User.objects.order_by().values_list('timezone', flat=True).distinct())
+    load = ReminderLoad(
+        start, days * 24 * 60, zones,
+        scheduler or settings.REMINDER_SCHEDULER,
+        settings.REMINDER_DIGEST if digest is None else digest,
+    )
+    bounds = User.objects.aggregate(first=Min('id'), last=Max('id'))
+    if bounds['first'] is not None:
+        for first_id in range(bounds['first'], bounds['last'] + 1, chunk_size):
+            load.add(load_schedule(first_id, first_id + chunk_size, load.offsets.code))
+    return load, perf_counter() - started
+
+
+def estimate_workers(messages, rate, deadline):
+    """Сколько исполнителей со скоростью rate сообщений в секунду отправят messages за deadline секунд."""
+    return math.ceil(messages / (rate * deadline)) if messages else 0
@@ -0,0 +1,122 @@
+import datetime
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from habits.bulk import BulkValidationError, check_items
+from habits.models import Habit, HabitCompletion
+from habits.scheduling import get_zone
+from habits.streaks import STREAK_FIELDS, streak_data, update_streaks
+
+# Насколько отметка может опережать часы сервера (часы клиента могут спешить)
+CHECK_IN_MAX_CLOCK_SKEW = datetime.timedelta(minutes=5)
+
+
+def parse_completed_at(value, tz):
+    """Время выполнения из строки ISO 8601; время без пояса понимается в поясе пользователя tz."""
+    if not isinstance(value, str):
+        return None
+    try:
+        completed_at = parse_datetime(value)
+    except ValueError:
+        return None
+    if completed_at is not None and timezone.is_naive(completed_at):
+        completed_at = timezone.make_aware(completed_at, tz)
+    return completed_at
+
+
+def parse_check_ins(items, user, habits):
+    """
+    Проверяет пачку отметок {'habit': id, 'completed_at': время} и возвращает объекты HabitCompletion.
+    habits — привычки пользователя из пачки ({id: привычка}), загруженные заранее одним запросом,
+    поэтому элементы проверяются без сериализатора и без запросов на каждый элемент.
+    При ошибках выбрасывает BulkValidationError со списком ошибок и индексами элементов.
+    """
+    now = timezone.now()
+    tz = get_zone(user.timezone)
+    completions, errors = [], []
+    for index, item in enumerate(items):
+        item_errors = {}
+        habit_id = item.get('habit')
+        if habit_id not in habits or isinstance(habit_id, bool):
+            item_errors['habit'] = ['Привычка не найдена.']
+        completed_at = parse_completed_at(item.get('completed_at'), tz)
+        if completed_at is None:
+            item_errors['completed_at'] = ['Ожидаются дата и время в формате ISO 8601.']
+        elif completed_at > now + CHECK_IN_MAX_CLOCK_SKEW:
+            item_errors['completed_at'] = ['Время выполнения не может быть в будущем.']
+
+        if item_errors:
+            errors.append({'index': index, 'errors': item_errors})
+        elif not errors:
+            completions.append(
+                HabitCompletion(habit_id=habit_id, user_id=user.id, completed_at=completed_at, created_at=now)
+            )
+    if errors:
+        raise BulkValidationError(errors)
+    return completions
+
+
+def record_check_ins(items, user):
+    """
+    Записывает пачку отметок одним bulk_create. Отметки, которые уже есть (тот же habit
+    и completed_at) или повторяются внутри пачки, пропускаются, поэтому клиент может безопасно
+    повторить отправку. Затем по новым отметкам обновляются серии привычек (habits.streaks).
+    Привычки пачки блокируются до конца транзакции, поэтому параллельные запросы
+    не потеряют обновления серий и не запишут одну отметку дважды.
+    Возвращает словарь: received — сколько отметок пришло, created — сколько из них новых,
+    duplicates — сколько пропущено как повторы, streaks — серии привычек пачки.
+    """
+    check_items(items, max_items=settings.HABIT_CHECK_IN_MAX_ITEMS)
+    requested_ids = {
+        item.get('habit') for item in items
+        if isinstance(item.get('habit'), int) and not isinstance(item.get('habit'), bool)
+    }
+    tz = get_zone(user.timezone)
+    with transaction.atomic():
+        habits = {
+            habit.id: habit
+            for habit in Habit.objects.select_for_update()
+            .filter(user=user, id__in=requested_ids)
+            .order_by('id')
+            .only('id', 'periodicity', *STREAK_FIELDS)
+        }
+        completions = parse_check_ins(items, user, habits)
+        new_completions = exclude_recorded(completions)
+        HabitCompletion.objects.bulk_create(new_completions, ignore_conflicts=True)
+        update_streaks(habits, new_completions, tz)
+
+    now = timezone.now()
+    return {
+        'received': len(completions),
+        'created': len(new_completions),
+        'duplicates': len(completions) - len(new_completions),
+        'streaks': [streak_data(habit, now, tz) for habit in habits.values()],
+    }
+
+
+def exclude_recorded(completions):
+    """
+    Убирает из пачки отметки, которые уже записаны или повторяются в самой пачке.
+    Записанные отметки читаются одним запросом по первичному ключу (habit, completed_at).
+    """
+    if not completions:
+        return []
+    recorded = set(
+        HabitCompletion.objects.filter(
+            habit_id__in={completion.habit_id for completion in completions},
+            completed_at__range=(
+                min(completion.completed_at for completion in completions),
+                max(completion.completed_at for completion in completions),
+            ),
+        ).values_list('habit_id', 'completed_at')
+    )
+    new_completions = []
+    for completion in completions:
+        key = (completion.habit_id, completion.completed_at)
+        if key not in recorded:
+            recorded.add(key)
+            new_completions.append(completion)
+    return new_completions
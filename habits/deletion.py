@@ -0,0 +1,80 @@
+from django.db import models
+from django.utils import timezone
+
+
+class HabitDeletion:
+    """
+    Данные одного удаления привычек (одного Collector.delete(): Model.delete(), QuerySet.delete(),
+    каскад от пользователя). Хранятся в origin — объекте или QuerySet, у которого вызван delete().
+    Django сначала отправляет pre_delete всех удаляемых объектов и только потом post_delete,
+    поэтому обработчики сигналов (habits.signals) копят здесь удаляемые привычки, а общую
+    работу выполняют один раз — после post_delete последней из них.
+    """
+
+    ATTRIBUTE = '_habit_deletion'
+
+    def __init__(self, collector=None):
+        self.collector = collector
+        # id удаляемой привычки → (id пользователя, публичная ли)
+        self.habits = {}
+        # id привычки, ссылающейся на удаляемую, → публичная ли
+        self.referencing = {}
+        self.pending = 0
+        # Одно время изменения ссылающихся привычек на всё удаление: одно значение — один UPDATE
+        self.touched_at = timezone.now()
+
+    @classmethod
+    def of(cls, origin):
+        return origin.__dict__.setdefault(cls.ATTRIBUTE, cls())
+
+    @classmethod
+    def start(cls, collector):
+        """
+        Данные удаления, которое собирает collector. Остатки прерванного ошибкой
+        удаления с тем же origin отбрасываются. Без origin данные хранятся в самом collector
+        и сигналам недоступны.
+        """
+        owner = collector if collector.origin is None else collector.origin
+        deletion = cls.of(owner)
+        if deletion.collector is not collector:
+            deletion = owner.__dict__[cls.ATTRIBUTE] = cls(collector)
+        return deletion
+
+    def add(self, habit):
+        self.habits[habit.id] = (habit.user_id, habit.is_public)
+        self.pending += 1
+
+    @classmethod
+    def finish(cls, origin):
+        """Отмечает удаление ещё одной привычки; после последней возвращает данные удаления, иначе None."""
+        deletion = cls.of(origin)
+        deletion.pending -= 1
+        if deletion.pending > 0:
+            return None
+        del origin.__dict__[cls.ATTRIBUTE]
+        return deletion
+
+    @property
+    def touches_public(self):
+        """Удалена публичная привычка или привычка, на которую ссылаются публичные."""
+        return any(is_public for _, is_public in self.habits.values()) or any(self.referencing.values())
+
+
+def set_null_and_touch(collector, field, sub_objs, using):
+    """
+    on_delete для related_habit: как SET_NULL, но ещё обновляет updated_at ссылающихся привычек,
+    чтобы изменение попало в синхронизацию, и запоминает их в HabitDeletion для кэшей.
+    Обновления выполняются одним запросом на поле для всего удаления.
+    """
+    deletion = HabitDeletion.start(collector)
+    referencing = dict(sub_objs.order_by().values_list('id', 'is_public'))
+    if not referencing:
+        return
+    deletion.referencing.update(referencing)
+    # Обновления выполняются в порядке добавления: updated_at — раньше обнуления related_habit,
+    # по которому выбираются ссылающиеся привычки
+    collector.add_field_update(sub_objs.model._meta.get_field('updated_at'), deletion.touched_at, sub_objs)
+    models.SET_NULL(collector, field, sub_objs, using)
+
+
+set_null_and_touch.lazy_sub_objs = True
@@ -0,0 +1,78 @@
+import csv
+import io
+import json
+from itertools import islice
+
+from django.conf import settings
+from django.http import StreamingHttpResponse
+
+try:
+    import orjson
+except ImportError:  # orjson ставится с зависимостями проекта; без него строки кодирует json
+    orjson = None
+
+NDJSON = 'ndjson'
+CSV = 'csv'
+EXPORT_FORMATS = (NDJSON, CSV)
+CONTENT_TYPES = {
+    NDJSON: 'application/x-ndjson',
+    CSV: 'text/csv; charset=utf-8',
+}
+
+
+def export_chunks(queryset, read_serializer, extra_columns=(), chunk_size=None):
+    """
+    Читает привычки порциями по chunk_size строк через .iterator() и отдаёт
+    каждую порцию списком словарей HabitReadSerializer. В памяти одновременно
+    находится только одна порция, сколько бы строк ни было в выгрузке.
+    extra_columns — столбцы, которые выводятся перед полями привычки как есть (например, user).
+    """
+    chunk_size = chunk_size or settings.HABIT_EXPORT_CHUNK_SIZE
+    columns = dict.fromkeys((*extra_columns, *read_serializer.columns))
+    rows = queryset.order_by('id').values(*columns).iterator(chunk_size=chunk_size)
+    for batch in iter(lambda: list(islice(rows, chunk_size)), []):
+        items = read_serializer.to_representation(batch)
+        if extra_columns:
+            items = [
+                {**{column: row[column] for column in extra_columns}, **item}
+                for row, item in zip(batch, items)
+            ]
+        yield items
+
+
+def dumps(item):
+    if orjson is not None:
+        return orjson.dumps(item)
+    return json.dumps(item, ensure_ascii=False, separators=(',', ':')).encode()
+
+
+def ndjson_stream(chunks):
+    """По одному JSON-объекту на строку; порция записывается в ответ одним куском."""
+    for items in chunks:
+        yield b''.join(dumps(item) + b'\n' for item in items)
+
+
+def csv_stream(chunks, header):
+    """CSV с заголовком; пустые значения (None) записываются пустыми ячейками."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(header)
+    for items in chunks:
+        writer.writerows([item.get(column) for column in header] for item in items)
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+
+def export_response(queryset, read_serializer, export_format, filename, extra_columns=()):
+    """Потоковый ответ с выгрузкой привычек в формате export_format (NDJSON или CSV)."""
+    chunks = export_chunks(queryset, read_serializer, extra_columns)
+    if export_format == CSV:
+        stream = csv_stream(chunks, header=[*extra_columns, *read_serializer.fields])
+    else:
+        stream = ndjson_stream(chunks)
+    response = StreamingHttpResponse(stream, content_type=CONTENT_TYPES[export_format])
+    response['Content-Disposition'] = f'attachment; filename="{filename}.{export_format}"'
+    return response
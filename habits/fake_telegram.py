@@ -0,0 +1,118 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+
+class FakeBotAPIServer:
+    """
+    Локальный сервер, имитирующий Telegram Bot API (методы getMe и sendMessage).
+    Используется в тестах и бенчмарке отправителя вместо настоящего Telegram.
+
+    latency — задержка ответа в секундах (имитация сетевого round-trip);
+    rate_limit_first — сколько первых вызовов sendMessage ответят 429 "retry after";
+    failing_chats — чаты, для которых sendMessage вернёт 403 (бот заблокирован).
+
+    Использование:
+        with FakeBotAPIServer(latency=0.05) as server:
+            TelegramSender(token='1:fake', base_url=server.base_url)
+    """
+
+    def __init__(self, latency=0.0, rate_limit_first=0, retry_after=1, failing_chats=()):
+        self.latency = latency
+        self.rate_limit_first = rate_limit_first
+        self.retry_after = retry_after
+        self.failing_chats = {str(chat_id) for chat_id in failing_chats}
+        self.messages = []
+        self.rate_limited = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), self._make_handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self._server.server_address
+        return f'http://{host}:{port}/bot'
+
+    def __enter__(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self._server.shutdown()
+        self._server.server_close()
+        self._thread.join()
+
+    def handle(self, method, params):
+        """Возвращает (HTTP-статус, тело ответа) для вызова метода Bot API."""
+        if self.latency:
+            time.sleep(self.latency)
+
+        if method == 'getMe':
+            return 200, {'ok': True, 'result': {
+                'id': 1, 'is_bot': True, 'first_name': 'Fake', 'username': 'fake_bot',
+            }}
+
+        if method == 'sendMessage':
+            chat_id = params.get('chat_id')
+            with self._lock:
+                if self.rate_limited < self.rate_limit_first:
+                    self.rate_limited += 1
+                    return 429, {
+                        'ok': False, 'error_code': 429,
+                        'description': f'Too Many Requests: retry after {self.retry_after}',
+                        'parameters': {'retry_after': self.retry_after},
+                    }
+                if chat_id in self.failing_chats:
+                    return 403, {
+                        'ok': False, 'error_code': 403,
+                        'description': 'Forbidden: bot was blocked by the user',
+                    }
+                self.messages.append((chat_id, params.get('text')))
+                message_id = len(self.messages)
+            return 200, {'ok': True, 'result': {
+                'message_id': message_id,
+                'date': int(time.time()),
+                'chat': {'id': int(chat_id), 'type': 'private'},
+                'text': params.get('text'),
+            }}
+
+        return 404, {'ok': False, 'error_code': 404, 'description': 'Not Found'}
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_POST(self):
+                length = int(self.headers.get('Content-Length') or 0)
+                body = self.rfile.read(length).decode()
+                params = {key: values[0] for key, values in parse_qs(body).items()}
+                # Bot API принимает параметры в JSON-кодировке (строки — в кавычках)
+                params = {key: _decode_param(value) for key, value in params.items()}
+                method = self.path.rsplit('/', 1)[-1]
+
+                status, payload = server.handle(method, params)
+                data = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+
+def _decode_param(value):
+    try:
+        decoded = json.loads(value)
+    except ValueError:
+        return value
+    return decoded if isinstance(decoded, str) else value
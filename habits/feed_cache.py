@@ -0,0 +1,75 @@
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.http import urlencode
+
+# Версия ленты публичных привычек. Ключи страниц включают версию,
+# поэтому смена версии разом делает неактуальными все закэшированные страницы.
+FEED_VERSION_KEY = 'habits:public-feed:version'
+FEED_PAGE_KEY_PREFIX = 'habits:public-feed:page:'
+FEED_COUNTER_KEY_PREFIX = 'habits:public-feed:counter:'
+
+# Счётчики обращений к ленте
+HIT = 'hit'
+MISS = 'miss'
+NOT_MODIFIED = 'not_modified'
+
+
+def get_feed_version():
+    """Текущая версия ленты; если её нет в кэше, заводится новая."""
+    version = cache.get(FEED_VERSION_KEY)
+    if version is None:
+        cache.add(FEED_VERSION_KEY, time.time_ns(), timeout=None)
+        version = cache.get(FEED_VERSION_KEY)
+    return version
+
+
+def bump_feed_version():
+    """
+    Меняет версию ленты после изменения публичных привычек.
+    Версия — время в наносекундах, а не счётчик: если ключ версии вытеснят из кэша,
+    новая версия всё равно не совпадёт со старыми и не вернёт устаревшие страницы.
+    """
+    cache.set(FEED_VERSION_KEY, time.time_ns(), timeout=None)
+
+
+def feed_page_key(version, host, query_params):
+    """Ключ страницы ленты: версия плюс хэш хоста (ссылки next/previous абсолютные) и параметров запроса."""
+    query = urlencode(sorted((key, value) for key, values in query_params.lists() for value in values))
+    digest = hashlib.sha1(f'{host}?{query}'.encode()).hexdigest()
+    return f'{FEED_PAGE_KEY_PREFIX}{version}:{digest}'
+
+
+def feed_etag(page_key):
+    """ETag страницы ленты: однозначно определяется версией и параметрами, без чтения самой страницы."""
+    return '"%s"' % hashlib.sha1(page_key.encode()).hexdigest()
+
+
+def get_feed_page(page_key):
+    return cache.get(page_key)
+
+
+def set_feed_page(page_key, data):
+    cache.set(page_key, data, timeout=settings.PUBLIC_FEED_CACHE_TIMEOUT)
+
+
+def count(event):
+    """Увеличивает счётчик события ленты (HIT, MISS, NOT_MODIFIED)."""
+    key = FEED_COUNTER_KEY_PREFIX + event
+    cache.add(key, 0, timeout=None)
+    try:
+        cache.incr(key)
+    except ValueError:
+        # Ключ вытеснен между add и incr — событие не учитываем
+        pass
+
+
+def feed_cache_stats():
+    """Счётчики обращений к ленте и доля запросов, обслуженных без базы данных."""
+    counters = cache.get_many([FEED_COUNTER_KEY_PREFIX + event for event in (HIT, MISS, NOT_MODIFIED)])
+    stats = {event: counters.get(FEED_COUNTER_KEY_PREFIX + event, 0) for event in (HIT, MISS, NOT_MODIFIED)}
+    total = sum(stats.values())
+    stats['hit_rate'] = (stats[HIT] + stats[NOT_MODIFIED]) / total if total else 0.0
+    return stats
@@ -0,0 +1,237 @@
+import csv
+import datetime
+import io
+import json
+from itertools import islice
+from time import perf_counter
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+from rest_framework import serializers
+from rest_framework.fields import SkipField, empty
+
+from habits.export import CSV, NDJSON
+from habits.feed_cache import bump_feed_version
+from habits.models import Habit
+from habits.scheduling import first_due_at, get_zone
+from habits.serializers import HabitSerializer
+from habits.timing_wheel import get_wheel, wheel_enabled
+from users.models import User
+
+IMPORT_FORMATS = (NDJSON, CSV)
+
+# Столбцы таблицы привычек, которые заполняет импорт (все, кроме id), в порядке модели
+IMPORT_FIELDS = [field for field in Habit._meta.concrete_fields if not field.primary_key]
+
+
+def read_rows(stream, import_format):
+    """
+    Читает строки файла NDJSON или CSV (текстовый поток) и отдаёт пары (номер строки, данные).
+    Пустые ячейки CSV считаются отсутствующими значениями. Данные строки, которую не удалось
+    разобрать, — исходный текст (str), такая строка будет отклонена.
+    """
+    if import_format == CSV:
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, {key: value for key, value in row.items() if value not in ('', None)}
+        return
+
+    for line_number, line in enumerate(stream, start=1):
+        if not line.strip():
+            continue
+        try:
+            yield line_number, json.loads(line)
+        except ValueError:
+            yield line_number, line.rstrip('\n')
+
+
+def validate_batch(rows, default_user_id=None):
+    """
+    Проверяет пачку строк по тем же правилам, что и HabitSerializer (поля с их валидаторами
+    из habits.validators и HabitSerializer.validate), но по столбцам: сериализатор создаётся
+    один раз на пачку, пользователи и связанные привычки загружаются одним запросом каждые.
+    Возвращает (значения для вставки по attname, ошибки {индекс строки: ошибки}).
+    """
+    errors = {}
+    data = [{} for _ in rows]
+    for index, row in enumerate(rows):
+        if not isinstance(row, dict):
+            errors[index] = {'non_field_errors': ['Неверный формат строки.']}
+
+    users = load_users(rows, default_user_id)
+    context = {'related_habits': load_related_habits(rows)}
+    serializer = HabitSerializer(context=context)
+    fields = [
+        (name, field) for name, field in serializer.fields.items()
+        if not field.read_only and not isinstance(field, serializers.HiddenField)
+    ]
+
+    # Проверка по столбцам: одно поле сериализатора проверяет значения всех строк пачки
+    for name, field in fields:
+        for index, row in enumerate(rows):
+            if not isinstance(row, dict):
+                continue
+            try:
+                data[index][name] = field.run_validation(row.get(name, empty))
+            except SkipField:
+                pass
+            except serializers.ValidationError as e:
+                errors.setdefault(index, {})[name] = e.detail
+
+    for index, row in enumerate(rows):
+        if isinstance(row, dict) and users.get(user_key(row, default_user_id)) is None:
+            errors.setdefault(index, {})['user'] = ['Пользователь не найден.']
+
+    # Межполевые правила — только для строк, поля которых прошли проверку
+    for index in range(len(rows)):
+        if index in errors:
+            continue
+        try:
+            serializer.validate(data[index])
+        except serializers.ValidationError as e:
+            errors[index] = serializers.as_serializer_error(e)
+
+    now = timezone.now()
+    zones = {}
+    values = []
+    for index, row in enumerate(rows):
+        if index in errors:
+            continue
+        user = users[user_key(row, default_user_id)]
+        if user.timezone not in zones:
+            zones[user.timezone] = get_zone(user.timezone)
+        values.append(habit_values(data[index], user, now, zones[user.timezone]))
+    return values, errors
+
+
+def user_key(row, default_user_id):
+    """id пользователя строки (столбец user или пользователь по умолчанию) или None."""
+    try:
+        return int(row.get('user', default_user_id))
+    except (TypeError, ValueError):
+        return None
+
+
+def load_users(rows, default_user_id):
+    user_ids = {user_key(row, default_user_id) for row in rows if isinstance(row, dict)}
+    user_ids.discard(None)
+    return User.objects.only('id', 'timezone').in_bulk(user_ids) if user_ids else {}
+
+
+def load_related_habits(rows):
+    related_ids = set()
+    for row in rows:
+        try:
+            related_ids.add(int(row['related_habit']))
+        except (KeyError, TypeError, ValueError):
+            pass
+    return Habit.objects.only('id', 'is_pleasant').in_bulk(related_ids) if related_ids else {}
+
+
+def habit_values(data, user, now, tz):
+    """
+    Значения столбцов новой привычки по attname. Незаданные поля получают значения
+    по умолчанию из модели, служебные поля заполняются так же, как при создании через API.
+    """
+    data = {**data, 'user': user, 'next_due_at': first_due_at(data['time'], now, tz), 'updated_at': now}
+    values = {}
+    for field in IMPORT_FIELDS:
+        value = data[field.name] if field.name in data else field.get_default()
+        if field.is_relation and value is not None:
+            value = value.pk
+        values[field.attname] = value
+    return values
+
+
+def copy_value(value):
+    """Значение в текстовом формате COPY PostgreSQL."""
+    if value is None:
+        return '\\N'
+    if isinstance(value, bool):
+        return 't' if value else 'f'
+    if isinstance(value, (datetime.date, datetime.time)):
+        return value.isoformat()
+    return (
+        str(value).replace('\\', '\\\\').replace('\t', '\\t')
+        .replace('\n', '\\n').replace('\r', '\\r')
+    )
+
+
+def copy_habits(values):
+    """
+    Загружает пачку в PostgreSQL одной командой COPY. id привычек выделяются заранее
+    из последовательности таблицы одним запросом, чтобы поставить привычки в расписание.
+    Возвращает id загруженных привычек.
+    """
+    table = Habit._meta.db_table
+    columns = ['id', *(field.column for field in IMPORT_FIELDS)]
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT nextval(pg_get_serial_sequence(%s, 'id')) FROM generate_series(1, %s)",
+            [table, len(values)],
+        )
+        ids = [row[0] for row in cursor.fetchall()]
+
+        buffer = io.StringIO()
+        for habit_id, row in zip(ids, values):
+            buffer.write('\t'.join([str(habit_id), *(copy_value(row[field.attname]) for field in IMPORT_FIELDS)]))
+            buffer.write('\n')
+        buffer.seek(0)
+        quoted = ', '.join(connection.ops.quote_name(column) for column in columns)
+        cursor.cursor.copy_expert(f'COPY {connection.ops.quote_name(table)} ({quoted}) FROM STDIN', buffer)
+    return ids
+
+
+def insert_habits(values):
+    """Загрузка пачки через bulk_create для баз данных, отличных от PostgreSQL."""
+    habits = Habit.objects.bulk_create([Habit(**row) for row in values])
+    return [habit.id for habit in habits]
+
+
+def load_batch(values):
+    """
+    Записывает проверенную пачку в одной транзакции. COPY и bulk_create не вызывают
+    сигналы модели, поэтому расписание и версия ленты обновляются здесь, после коммита.
+    Возвращает id созданных привычек в порядке values.
+    """
+    loader = copy_habits if connection.vendor == 'postgresql' else insert_habits
+    with transaction.atomic():
+        ids = loader(values)
+        if wheel_enabled():
+            due_dates = {habit_id: row['next_due_at'] for habit_id, row in zip(ids, values) if habit_id is not None}
+            transaction.on_commit(lambda: get_wheel().schedule_many(due_dates))
+        if any(row['is_public'] for row in values):
+            transaction.on_commit(bump_feed_version)
+    return ids
+
+
+def import_habits(rows, reject=None, default_user_id=None, batch_size=None):
+    """
+    Импортирует привычки из пар (номер строки, данные), например из read_rows().
+    Строки проверяются и загружаются пачками по batch_size; каждая пачка — отдельная транзакция,
+    поэтому ошибка в середине файла не отменяет уже загруженные пачки.
+    Для каждой отклонённой строки вызывается reject(номер строки, данные, ошибки).
+    Возвращает {'total', 'imported', 'rejected', 'seconds'}.
+    """
+    batch_size = batch_size or settings.HABIT_IMPORT_BATCH_SIZE
+    report = {'total': 0, 'imported': 0, 'rejected': 0}
+    started = perf_counter()
+    rows = iter(rows)
+    for batch in iter(lambda: list(islice(rows, batch_size)), []):
+        values, errors = validate_batch([row for _, row in batch], default_user_id)
+        if values:
+            load_batch(values)
+        if reject is not None:
+            for index in sorted(errors):
+                line_number, row = batch[index]
+                reject(line_number, row, errors[index])
+        report['total'] += len(batch)
+        report['imported'] += len(values)
+        report['rejected'] += len(errors)
+    report['seconds'] = perf_counter() - started
+    return report
+
+
+def rows_per_second(report):
+    return report['total'] / report['seconds'] if report['seconds'] else 0.0
@@ -0,0 +1,68 @@
+import random
+from time import perf_counter
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from rest_framework.renderers import JSONRenderer
+
+from habits.models import Habit
+from habits.renderers import FastJSONRenderer, orjson
+from habits.serializers import HabitReadSerializer, HabitSerializer
+from habits.synthetic import generate_user_habits
+from users.models import User
+
+
+class Command(BaseCommand):
+    """
+    Сравнение времени сериализации страницы привычек: HabitSerializer + JSONRenderer
+    против HabitReadSerializer (строки .values()) + FastJSONRenderer.
+    Чтение из базы в замер не входит. Синтетические привычки создаются
+    во временной транзакции и откатываются.
+
+    Пример: python manage.py bench_habit_serialization --rows 100 --repeat 500
+    """
+    help = 'Сравнивает время сериализации страницы привычек до и после быстрого пути чтения.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=100, help='Размер страницы.')
+        parser.add_argument('--repeat', type=int, default=500, help='Количество повторов.')
+        parser.add_argument('--seed', type=int, default=42, help='Зерно генератора случайных чисел.')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            self.create_habits(options['rows'], options['seed'])
+            self.run(options['rows'], options['repeat'])
+            transaction.set_rollback(True)
+
+    def create_habits(self, count, seed):
+        rng = random.Random(seed)
+        user = User.objects.create(username=f'bench-serialization-{seed}')
+        habits = []
+        while len(habits) < count:
+            for habit in generate_user_habits(rng, habits_count=10):
+                habit.pop('related_index')
+                habits.append(Habit(user=user, **habit))
+        Habit.objects.bulk_create(habits[:count])
+        self.user = user
+
+    def run(self, rows, repeat):
+        queryset = Habit.objects.filter(user=self.user).order_by('time', 'id')
+        read_serializer = HabitReadSerializer()
+        instances = list(queryset)
+        values = list(queryset.values(*read_serializer.columns))
+
+        def before():
+            return JSONRenderer().render(HabitSerializer(instances, many=True).data)
+
+        def after():
+            return FastJSONRenderer().render(read_serializer.to_representation(values))
+
+        self.stdout.write(f'Строк на странице: {rows}, orjson: {"да" if orjson else "нет"}')
+        self.stdout.write(f'Ответы совпадают байт в байт: {"да" if before() == after() else "НЕТ"}')
+        for title, serialize in (('HabitSerializer + JSONRenderer', before),
+                                 ('HabitReadSerializer + FastJSONRenderer', after)):
+            started = perf_counter()
+            for _ in range(repeat):
+                serialize()
+            elapsed = (perf_counter() - started) / repeat
+            self.stdout.write(f'{title:>40}: {elapsed * 1000:.3f} мс на страницу')
@@ -0,0 +1,89 @@
+import random
+from time import perf_counter
+from urllib.parse import parse_qs, urlparse
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from rest_framework.pagination import Cursor
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from habits.models import Habit
+from habits.paginators import HabitCursorPaginator, HabitPaginator
+from habits.synthetic import generate_user_habits
+from users.models import User
+
+
+class Command(BaseCommand):
+    """
+    Сравнение постраничной (page=N) и курсорной (cursor) пагинации ленты публичных привычек
+    на первой и глубокой странице. При необходимости создаёт синтетические публичные привычки;
+    все изменения откатываются в конце замера.
+
+    Пример: python manage.py bench_pagination --create 100000 --depth 10000
+    """
+    help = 'Сравнивает время первой и глубокой страницы для постраничной и курсорной пагинации.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--create', type=int, default=0, help='Сколько публичных привычек создать для замера.')
+        parser.add_argument('--depth', type=int, default=10000, help='Номер глубокой страницы.')
+        parser.add_argument('--page-size', type=int, default=5, help='Размер страницы.')
+        parser.add_argument('--repeat', type=int, default=20, help='Сколько раз повторять каждый запрос.')
+        parser.add_argument('--seed', type=int, default=42, help='Зерно генератора случайных чисел.')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            if options['create']:
+                self.create_habits(options['create'], options['seed'])
+            self.run(options)
+            transaction.set_rollback(True)
+
+    def create_habits(self, count, seed):
+        rng = random.Random(seed)
+        user = User.objects.create(username=f'bench-pagination-{seed}')
+        habits = []
+        while len(habits) < count:
+            for habit in generate_user_habits(rng, habits_count=10, public_ratio=1):
+                habit.pop('related_index')
+                habits.append(Habit(user=user, **habit))
+        Habit.objects.bulk_create(habits[:count], batch_size=5000)
+
+    def run(self, options):
+        queryset = Habit.objects.filter(is_public=True)
+        page_size, depth = options['page_size'], options['depth']
+        total = queryset.count()
+        if total < depth * page_size:
+            self.stderr.write(f'Публичных привычек {total}: страницы {depth} нет, используйте --create.')
+            return
+
+        # Курсор на начало глубокой страницы — позиция последней привычки предыдущей
+        last = queryset.order_by('time', 'id')[(depth - 1) * page_size - 1]
+        deep_cursor = self.encode_cursor(HabitCursorPaginator.encode_position(last))
+
+        factory = APIRequestFactory(SERVER_NAME=settings.ALLOWED_HOSTS[0])
+        cases = (
+            ('page=1', HabitPaginator, {'page': 1}),
+            (f'page={depth}', HabitPaginator, {'page': depth}),
+            ('cursor (1)', HabitCursorPaginator, {'cursor': ''}),
+            (f'cursor ({depth})', HabitCursorPaginator, {'cursor': deep_cursor}),
+        )
+        self.stdout.write(f'Публичных привычек: {total}, размер страницы: {page_size}')
+        for title, paginator_class, params in cases:
+            elapsed = []
+            for _ in range(options['repeat']):
+                paginator = paginator_class()
+                request = Request(factory.get('/habits/public/', {**params, 'page_size': page_size}))
+                started = perf_counter()
+                paginator.paginate_queryset(queryset, request)
+                elapsed.append(perf_counter() - started)
+            elapsed.sort()
+            self.stdout.write(f'{title:>16}: медиана {elapsed[len(elapsed) // 2] * 1000:.2f} мс')
+
+    @staticmethod
+    def encode_cursor(position):
+        """Значение параметра cursor для позиции."""
+        paginator = HabitCursorPaginator()
+        paginator.base_url = 'http://bench/'
+        url = paginator.encode_cursor(Cursor(offset=0, reverse=False, position=position))
+        return parse_qs(urlparse(url).query)['cursor'][0]
@@ -0,0 +1,53 @@
+import random
+
+from django.core.management.base import BaseCommand
+
+from habits.reminders import group_messages
+from habits.synthetic import generate_user_habits
+
+
+class Command(BaseCommand):
+    """
+    Оценка экономии обращений к Bot API в режиме сводки (REMINDER_DIGEST).
+    Строит синтетические привычки в памяти, выбирает те, что должны сработать за сутки
+    (с учётом периодичности), и считает количество сообщений с группировкой
+    и без неё — для почасового и поминутного планировщика.
+
+    Пример: python manage.py bench_reminder_digest --users 100000 --seed 42
+    """
+    help = 'Считает, сколько сообщений Telegram экономит режим сводки на синтетических данных.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10000, help='Количество пользователей.')
+        parser.add_argument('--seed', type=int, default=42, help='Зерно генератора случайных чисел.')
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+
+        # Привычки, по которым за сутки должно уйти напоминание
+        due_rows = []
+        for user_number in range(options['users']):
+            habits = generate_user_habits(rng)
+            for habit in habits:
+                if rng.random() < 1 / habit['periodicity']:
+                    related = habits[habit['related_index']] if habit['related_index'] is not None else None
+                    due_rows.append({
+                        **habit,
+                        'user__telegram_id': str(user_number),
+                        'related_habit__action': related['action'] if related else None,
+                    })
+
+        self.stdout.write(f'Пользователей: {options["users"]}, напоминаний за сутки: {len(due_rows)}')
+
+        for title, window in (('Почасовой планировщик', lambda row: row['time'].hour),
+                              ('Поминутный планировщик', lambda row: (row['time'].hour, row['time'].minute))):
+            windows = {}
+            for row in due_rows:
+                windows.setdefault(window(row), []).append(row)
+            digest_messages = sum(len(group_messages(rows, digest=True)) for rows in windows.values())
+            saved = len(due_rows) - digest_messages
+
+            self.stdout.write(
+                f'{title}: без сводки {len(due_rows)} сообщений, со сводкой {digest_messages}, '
+                f'сэкономлено {saved} обращений к Bot API ({saved / max(len(due_rows), 1):.1%})'
+            )
@@ -0,0 +1,54 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from habits.fake_telegram import FakeBotAPIServer
+from habits.sender import TelegramSender
+
+# Верхний предел частоты, при котором ограничители фактически отключены
+UNLIMITED_RATE = 10 ** 9
+
+
+class Command(BaseCommand):
+    """
+    Бенчмарк отправки напоминаний на локальном фейковом Bot API.
+    Сравнивает прежний последовательный цикл (одно сообщение за раз)
+    с асинхронным отправителем TelegramSender.
+
+    Пример: python manage.py bench_telegram_sender --messages 500 --latency-ms 50
+    """
+    help = 'Сравнивает скорость последовательной и асинхронной отправки сообщений (сообщений в секунду).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--messages', type=int, default=300, help='Количество сообщений.')
+        parser.add_argument('--chats', type=int, default=None,
+                            help='Количество разных чатов (по умолчанию по одному сообщению в чат).')
+        parser.add_argument('--latency-ms', type=float, default=50, help='Задержка ответа фейкового API.')
+        parser.add_argument('--max-in-flight', type=int, default=None, help='Одновременных отправок.')
+        parser.add_argument('--global-rate', type=float, default=None,
+                            help='Общий лимит сообщений в секунду (по умолчанию из настроек).')
+
+    def handle(self, *args, **options):
+        chats = options['chats'] or options['messages']
+        messages = [(str(1000 + i % chats), f'Сообщение {i}') for i in range(options['messages'])]
+
+        modes = [
+            ('Последовательный цикл', {
+                'max_in_flight': 1, 'global_rate': UNLIMITED_RATE, 'per_chat_rate': UNLIMITED_RATE,
+            }),
+            ('TelegramSender', {
+                'max_in_flight': options['max_in_flight'], 'global_rate': options['global_rate'],
+            }),
+        ]
+
+        with FakeBotAPIServer(latency=options['latency_ms'] / 1000) as server:
+            for title, sender_options in modes:
+                with TelegramSender(token='1:benchmark', base_url=server.base_url, **sender_options) as sender:
+                    started = time.perf_counter()
+                    results = sender.send_batch(messages)
+                    elapsed = time.perf_counter() - started
+
+                sent = sum(result.ok for result in results)
+                self.stdout.write(
+                    f'{title}: отправлено {sent} за {elapsed:.2f} с — {sent / elapsed:.1f} сообщений/с'
+                )
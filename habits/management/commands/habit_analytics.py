@@ -0,0 +1,52 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from habits import analytics
+
+
+class Command(BaseCommand):
+    """
+    Когортная аналитика: удержание и соблюдение расписания по неделям с регистрации
+    для когорт по месяцам регистрации и распределение привычек и отметок по часам суток.
+    Столбцы пользователей, привычек и отметок загружаются в массивы NumPy порциями
+    по --chunk-size id пользователей, все расчёты векторные. Нужен пакет numpy.
+
+    Пример: python manage.py habit_analytics --weeks 12 --json analytics.json
+    """
+    help = 'Считает когортное удержание, соблюдение расписания и распределение отметок по часам.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--weeks', type=int, default=12, help='Сколько недель с регистрации учитывать.')
+        parser.add_argument('--chunk-size', type=int, default=50_000,
+                            help='Сколько id пользователей обрабатывать за раз (ограничивает память).')
+        parser.add_argument('--json', help='Записать полный результат в этот файл.')
+
+    def handle(self, *args, **options):
+        if analytics.np is None:
+            raise CommandError('Для аналитики нужен пакет numpy: pip install numpy')
+        if options['weeks'] < 1 or options['chunk_size'] < 1:
+            raise CommandError('--weeks и --chunk-size должны быть положительными.')
+
+        result = analytics.run_analytics(weeks=options['weeks'], chunk_size=options['chunk_size'])
+        if options['json']:
+            with open(options['json'], 'w', encoding='utf-8') as file:
+                json.dump(result, file, ensure_ascii=False)
+
+        for title, key in (('Удержание', 'retention'), ('Соблюдение расписания', 'adherence')):
+            self.stdout.write(f'{title} по неделям с регистрации:')
+            for cohort, size, row in zip(result['cohorts'], result['cohort_sizes'], result[key]):
+                cells = ' '.join('   -' if value is None else f'{value:4.0%}' for value in row)
+                self.stdout.write(f'  {cohort} ({size}): {cells}')
+
+        self.stdout.write('Час  запланировано (полезные/приятные)  отметок')
+        scheduled = result['scheduled_hours']
+        for hour in range(24):
+            self.stdout.write(
+                f"{hour:>3}  {scheduled['useful'][hour]:>12}/{scheduled['pleasant'][hour]:<12}"
+                f"  {result['completed_hours'][hour]:>10}"
+            )
+        self.stdout.write(
+            f"Пользователей: {result['users']}, привычек: {result['habits']}, "
+            f"отметок: {result['completions']} за {result['seconds']:.1f} с."
+        )
@@ -0,0 +1,68 @@
+import json
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from habits.importer import IMPORT_FORMATS, import_habits, read_rows, rows_per_second
+
+
+class RejectReport:
+    """Файл отклонённых строк (NDJSON: номер строки, данные и ошибки); создаётся при первой ошибке."""
+
+    def __init__(self, path):
+        self.path = path
+        self.file = None
+
+    def __call__(self, line_number, row, errors):
+        if self.file is None:
+            self.file = open(self.path, 'w', encoding='utf-8')
+        self.file.write(json.dumps({'line': line_number, 'row': row, 'errors': errors}, ensure_ascii=False))
+        self.file.write('\n')
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+
+
+class Command(BaseCommand):
+    """
+    Импорт привычек из файла NDJSON или CSV. Строки проверяются по правилам HabitSerializer
+    пачками и загружаются в PostgreSQL командой COPY (в других базах — bulk_create).
+    Отклонённые строки с ошибками записываются в отчёт.
+
+    Пример: python manage.py import_habits partner.csv --user 42 --report rejected.ndjson
+    """
+    help = 'Импортирует привычки из файла NDJSON или CSV.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Файл с привычками (.ndjson или .csv).')
+        parser.add_argument('--as', dest='import_format', choices=IMPORT_FORMATS,
+                            help='Формат файла; по умолчанию определяется по расширению.')
+        parser.add_argument('--user', type=int, help='id пользователя для строк без столбца user.')
+        parser.add_argument('--batch-size', type=int, help='Размер пачки (по умолчанию HABIT_IMPORT_BATCH_SIZE).')
+        parser.add_argument('--report', help='Файл отклонённых строк (по умолчанию <файл>.rejected.ndjson).')
+
+    def handle(self, *args, **options):
+        path = Path(options['path'])
+        if not path.is_file():
+            raise CommandError(f'Файл {path} не найден.')
+        import_format = options['import_format'] or path.suffix.lstrip('.').lower()
+        if import_format not in IMPORT_FORMATS:
+            raise CommandError(f'Не удалось определить формат файла, укажите --as ({", ".join(IMPORT_FORMATS)}).')
+
+        reject = RejectReport(options['report'] or f'{path}.rejected.ndjson')
+        try:
+            with open(path, encoding='utf-8', newline='') as stream:
+                report = import_habits(
+                    read_rows(stream, import_format), reject,
+                    default_user_id=options['user'], batch_size=options['batch_size'],
+                )
+        finally:
+            reject.close()
+
+        self.stdout.write(
+            f"Строк: {report['total']}, импортировано: {report['imported']}, отклонено: {report['rejected']}."
+        )
+        self.stdout.write(f"Время: {report['seconds']:.2f} с, скорость: {rows_per_second(report):.0f} строк/с.")
+        if reject.file is not None:
+            self.stdout.write(f'Отклонённые строки: {reject.path}')
@@ -0,0 +1,88 @@
+import datetime
+import math
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from habits.capacity import TICKS, estimate_workers, np, plan_reminders
+
+# Границы столбцов гистограммы: сколько сообщений отправляется за минуту
+LOAD_BUCKETS = (1, 10, 100, 1000, 10_000, 100_000)
+
+
+class Command(BaseCommand):
+    """
+    Пробный прогон рассылки напоминаний: поминутная нагрузка на неделю вперёд
+    с учётом времени, периодичности привычек и поясов пользователей (включая переходы
+    на летнее/зимнее время). Telegram не вызывается, база данных не меняется.
+    Выводит гистограмму нагрузки по минутам, пиковые минуты и оценку числа исполнителей,
+    которые успеют отправить пиковую минуту за --deadline секунд при скорости --rate.
+
+    Пример: python manage.py plan_reminders --days 7 --rate 25 --digest
+    """
+    help = 'Оценивает поминутную нагрузку рассылки напоминаний и нужное число исполнителей.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=7, help='На сколько дней вперёд считать нагрузку.')
+        parser.add_argument('--start', type=datetime.datetime.fromisoformat,
+                            help='Начало периода (ISO 8601, по умолчанию — сейчас).')
+        parser.add_argument('--scheduler', choices=sorted(TICKS), help='Планировщик (по умолчанию REMINDER_SCHEDULER).')
+        parser.add_argument('--digest', action='store_true', default=None,
+                            help='Считать сообщения в режиме сводки (по умолчанию REMINDER_DIGEST).')
+        parser.add_argument('--rate', type=float, default=settings.TELEGRAM_GLOBAL_RATE,
+                            help='Сообщений в секунду на одного исполнителя.')
+        parser.add_argument('--deadline', type=int, default=60,
+                            help='За сколько секунд нужно отправить сообщения одной минуты.')
+        parser.add_argument('--chunk-size', type=int, default=50_000,
+                            help='Сколько id пользователей загружать за раз (ограничивает память).')
+
+    def handle(self, *args, **options):
+        if np is None:
+            raise CommandError('Для планирования нагрузки нужен пакет numpy: pip install numpy')
+        if options['days'] < 1 or options['rate'] <= 0 or options['deadline'] < 1 or options['chunk_size'] < 1:
+            raise CommandError('--days, --rate, --deadline и --chunk-size должны быть положительными.')
+        start = options['start']
+        if start is not None and start.tzinfo is None:
+            start = start.replace(tzinfo=datetime.timezone.utc)
+
+        load, elapsed = plan_reminders(
+            start=start, days=options['days'], scheduler=options['scheduler'],
+            digest=options['digest'], chunk_size=options['chunk_size'],
+        )
+        messages = load.messages
+        self.stdout.write(
+            f'Привычек в расписании: {load.habits}, напоминаний: {load.reminders.sum()}, '
+            f'сообщений: {messages.sum()} за {options["days"]} дн. (расчёт {elapsed:.1f} с).'
+        )
+
+        self.stdout.write('Сообщений в минуту   минут')
+        edges = (0, *LOAD_BUCKETS, None)
+        for low, high in zip(edges, edges[1:]):
+            if high is None:
+                count, label = int((messages >= low).sum()), f'{low}+'
+            else:
+                count = int(((messages >= low) & (messages < high)).sum())
+                label = str(low) if high == low + 1 else f'{low}–{high - 1}'
+            bar = '#' * (math.ceil(count / len(messages) * 50) if count else 0)
+            self.stdout.write(f'{label:>18}  {count:>6}  {bar}')
+
+        self.stdout.write('Пиковые минуты (UTC):')
+        for minute in np.argsort(messages, kind='stable')[::-1][:5]:
+            if not messages[minute]:
+                break
+            moment = datetime.datetime.fromtimestamp(load.start + int(minute) * 60, datetime.timezone.utc)
+            self.stdout.write(f"  {moment:%Y-%m-%d %H:%M}  {messages[minute]}")
+
+        peak = int(messages.max(initial=0))
+        p99 = int(np.percentile(messages, 99)) if len(messages) else 0
+        workers = estimate_workers(peak, options['rate'], options['deadline'])
+        self.stdout.write(
+            f"Пик: {peak} сообщений в минуту, 99-й перцентиль: {p99}. "
+            f"Исполнителей при {options['rate']:g} сообщ./с и сроке {options['deadline']} с: {workers}."
+        )
+        drain = peak / settings.TELEGRAM_GLOBAL_RATE
+        if drain > options['deadline']:
+            self.stdout.write(self.style.WARNING(
+                f'Лимит бота ({settings.TELEGRAM_GLOBAL_RATE:g} сообщ./с) не позволяет отправить пиковую минуту '
+                f"быстрее чем за {drain:.0f} с — исполнители упрутся в него."
+            ))
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from habits.feed_cache import feed_cache_stats
+
+
+class Command(BaseCommand):
+    """
+    Счётчики кэша ленты публичных привычек: сколько запросов обслужено из кэша (HIT),
+    ответом 304 (not modified) и сколько дошло до базы данных (MISS).
+
+    Пример: python manage.py public_feed_stats
+    """
+    help = 'Показывает счётчики попаданий в кэш ленты публичных привычек.'
+
+    def handle(self, *args, **options):
+        stats = feed_cache_stats()
+        self.stdout.write(
+            f"Из кэша: {stats['hit']}, 304: {stats['not_modified']}, из базы: {stats['miss']}, "
+            f"без обращения к базе: {stats['hit_rate']:.1%}"
+        )
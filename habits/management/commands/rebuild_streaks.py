@@ -0,0 +1,56 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from habits.models import Habit
+from habits.streaks import STREAK_FIELDS, rebuild_streaks
+
+
+class Command(BaseCommand):
+    """
+    Пересчёт серий выполнений по истории отметок и сверка с сериями,
+    которые поддерживаются при приёме отметок. Привычки обрабатываются порциями по id:
+    одна выборка привычек и одна выборка их отметок на порцию.
+
+    Пример: python manage.py rebuild_streaks --check
+    """
+    help = 'Пересчитывает серии выполнений привычек по истории отметок.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--check', action='store_true', help='Только сравнить, ничего не записывать.')
+        parser.add_argument('--user', type=int, help='Только привычки этого пользователя.')
+        parser.add_argument('--chunk-size', type=int, default=1000, help='Сколько привычек обрабатывать за раз.')
+
+    def handle(self, *args, **options):
+        habits = Habit.objects.select_related('user').only('id', 'periodicity', 'user__timezone', *STREAK_FIELDS)
+        if options['user']:
+            habits = habits.filter(user_id=options['user'])
+
+        checked, mismatched, last_id = 0, 0, 0
+        while True:
+            with transaction.atomic():
+                chunk = {
+                    habit.id: habit
+                    for habit in habits.select_for_update(of=('self',)).filter(id__gt=last_id)
+                    .order_by('id')[:options['chunk_size']]
+                }
+                if not chunk:
+                    break
+                stored = {habit_id: self.state(habit) for habit_id, habit in chunk.items()}
+                rebuild_streaks(chunk)
+
+                changed = [habit for habit_id, habit in chunk.items() if self.state(habit) != stored[habit_id]]
+                for habit in changed[:max(0, 10 - mismatched)]:
+                    self.stdout.write(f'Привычка {habit.id}: было {stored[habit.id]}, по истории {self.state(habit)}')
+                if changed and not options['check']:
+                    Habit.objects.bulk_update(changed, STREAK_FIELDS)
+
+            checked += len(chunk)
+            mismatched += len(changed)
+            last_id = max(chunk)
+
+        action = 'найдено расхождений' if options['check'] else 'исправлено'
+        self.stdout.write(f'Проверено привычек: {checked}, {action}: {mismatched}.')
+
+    @staticmethod
+    def state(habit):
+        return tuple(getattr(habit, field) for field in STREAK_FIELDS)
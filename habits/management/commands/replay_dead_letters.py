@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+
+from habits.models import ReminderDeadLetter
+from habits.reminders import replay_dead_letters
+from habits.sender import TelegramSender
+
+
+class Command(BaseCommand):
+    """
+    Повторная отправка недоставленных напоминаний пачками.
+
+    Пример: python manage.py replay_dead_letters --since 2025-01-01 --chat 123456
+    """
+    help = 'Повторно отправляет напоминания из очереди недоставленных.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--since', help='Только записи, созданные начиная с этой даты (ГГГГ-ММ-ДД).')
+        parser.add_argument('--chat', help='Только записи для этого чата.')
+        parser.add_argument('--limit', type=int, help='Не больше этого количества записей.')
+
+    def handle(self, *args, **options):
+        dead_letters = ReminderDeadLetter.objects.filter(replayed_at__isnull=True)
+        if options['since']:
+            dead_letters = dead_letters.filter(created_at__date__gte=options['since'])
+        if options['chat']:
+            dead_letters = dead_letters.filter(chat_id=options['chat'])
+        if options['limit']:
+            dead_letters = ReminderDeadLetter.objects.filter(
+                id__in=list(dead_letters.order_by('id').values_list('id', flat=True)[:options['limit']])
+            )
+
+        with TelegramSender() as sender:
+            report = replay_dead_letters(dead_letters, sender)
+        self.stdout.write(f"Отправлено {report['replayed']}, не доставлено {report['failed']}.")
@@ -0,0 +1,99 @@
+import random
+import zlib
+from time import perf_counter
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from habits.importer import habit_values, load_batch
+from habits.scheduling import get_zone
+from habits.synthetic import TELEGRAM_SHARE, TIMEZONE_WEIGHTS, generate_user_habits, weighted_choice
+from users.models import User
+
+# Пароль всех синтетических пользователей; хэш вычисляется один раз на запуск
+SEED_PASSWORD = 'seed-password'
+
+
+class Command(BaseCommand):
+    """
+    Заполнение базы синтетическими пользователями и привычками для нагрузочных тестов.
+    Привычки строит habits.synthetic (время, периодичность, пары приятная/полезная, доля
+    публичных), поэтому все они проходят проверки HabitSerializer. Пользователи создаются
+    bulk_create, привычки загружаются пачками так же, как при импорте (COPY в PostgreSQL):
+    сначала приятные привычки пачки, затем полезные со ссылками на них.
+    При одном и том же --seed данные получаются одинаковыми.
+
+    Пример: python manage.py seed_habits --users 1000000 --habits-per-user 10 --seed 42
+    """
+    help = 'Создаёт синтетических пользователей и привычки для нагрузочных тестов.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000, help='Количество пользователей.')
+        parser.add_argument('--habits-per-user', type=int,
+                            help='Привычек у каждого пользователя; по умолчанию — правдоподобное распределение.')
+        parser.add_argument('--public-ratio', type=float, default=0.1, help='Доля публичных привычек.')
+        parser.add_argument('--seed', type=int, default=42, help='Зерно генератора случайных чисел.')
+        parser.add_argument('--prefix', default='seed', help='Префикс имён пользователей.')
+        parser.add_argument('--batch-size', type=int, default=2000, help='Сколько пользователей создавать за раз.')
+
+    def handle(self, *args, **options):
+        prefix = f"{options['prefix']}-{options['seed']}-"
+        if User.objects.filter(username__startswith=prefix).exists():
+            raise CommandError(f'Пользователи {prefix}* уже созданы, укажите другой --seed или --prefix.')
+
+        rng = random.Random(options['seed'])
+        password = make_password(SEED_PASSWORD)
+        started = perf_counter()
+        users_total = options['users']
+        habits_total = 0
+        for start in range(0, users_total, options['batch_size']):
+            numbers = range(start, min(start + options['batch_size'], users_total))
+            habits_total += self.seed_batch(rng, numbers, prefix, password, options)
+            self.stdout.write(f'Пользователей: {numbers.stop}/{users_total}, привычек: {habits_total}')
+
+        elapsed = perf_counter() - started
+        self.stdout.write(
+            f'Создано пользователей: {users_total}, привычек: {habits_total} за {elapsed:.1f} с '
+            f'({(users_total + habits_total) / elapsed if elapsed else 0:.0f} строк/с).'
+        )
+
+    def seed_batch(self, rng, numbers, prefix, password, options):
+        """Создаёт пользователей с номерами numbers и их привычки. Возвращает количество привычек."""
+        # Числовые id Telegram: старшие разряды — контрольная сумма префикса, младшие — номер пользователя
+        telegram_base = zlib.crc32(prefix.encode()) * 10 ** 10
+        users = User.objects.bulk_create([
+            User(
+                username=f'{prefix}{number}',
+                password=password,
+                timezone=weighted_choice(rng, TIMEZONE_WEIGHTS),
+                telegram_id=str(telegram_base + number) if rng.random() < TELEGRAM_SHARE else None,
+            )
+            for number in numbers
+        ])
+
+        now = timezone.now()
+        zones = {}
+        pleasant, useful, related_indexes = [], [], []
+        for user in users:
+            if user.timezone not in zones:
+                zones[user.timezone] = get_zone(user.timezone)
+            offset = len(pleasant)
+            habits = generate_user_habits(rng, options['habits_per_user'], options['public_ratio'])
+            for habit in habits:
+                related_index = habit.pop('related_index')
+                values = habit_values(habit, user, now, zones[user.timezone])
+                if habit['is_pleasant']:
+                    pleasant.append(values)
+                else:
+                    useful.append(values)
+                    # Приятные привычки пользователя идут первыми, related_index — их номер
+                    related_indexes.append(None if related_index is None else offset + related_index)
+
+        pleasant_ids = load_batch(pleasant) if pleasant else []
+        for values, index in zip(useful, related_indexes):
+            if index is not None:
+                values['related_habit_id'] = pleasant_ids[index]
+        if useful:
+            load_batch(useful)
+        return len(pleasant) + len(useful)
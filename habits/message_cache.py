@@ -0,0 +1,90 @@
+import collections
+import threading
+
+from django.conf import settings
+from django.core.cache import caches
+
+# Префикс ключей общего кэша (Redis)
+SHARED_KEY_PREFIX = 'habits:reminder-body:'
+
+
+def habit_stamp(row):
+    """
+    Версия текста напоминания: время изменения привычки и её связанной привычки.
+    Текст зависит от обеих, поэтому изменение любой из них даёт новую версию.
+    """
+    updated_at, related_updated_at = row['updated_at'], row['related_habit__updated_at']
+    return f"{updated_at.timestamp()}:{related_updated_at.timestamp() if related_updated_at else ''}"
+
+
+class ReminderBodyCache:
+    """
+    Кэш готовых текстов напоминаний: {id привычки: (версия, текст)}.
+    Первый уровень — ограниченный LRU в памяти процесса, второй (необязательный) —
+    общий кэш Django (обычно Redis), чтобы воркеры не собирали одни и те же тексты.
+    Текст выдаётся, только если его версия совпадает с текущей версией привычки,
+    поэтому устаревшая запись в памяти другого процесса никогда не будет отправлена.
+    """
+
+    def __init__(self, maxsize=None, shared=None):
+        self.maxsize = maxsize or settings.REMINDER_BODY_CACHE_SIZE
+        self.shared = shared
+        self._local = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_many(self, stamps):
+        """Возвращает {id: текст} для привычек из stamps ({id: версия}), у которых в кэше актуальный текст."""
+        bodies, missed = {}, []
+        with self._lock:
+            for habit_id, stamp in stamps.items():
+                entry = self._local.get(habit_id)
+                if entry is not None and entry[0] == stamp:
+                    self._local.move_to_end(habit_id)
+                    bodies[habit_id] = entry[1]
+                else:
+                    missed.append(habit_id)
+
+        if missed and self.shared is not None:
+            found = self.shared.get_many([SHARED_KEY_PREFIX + str(habit_id) for habit_id in missed])
+            entries = {}
+            for habit_id in missed:
+                entry = found.get(SHARED_KEY_PREFIX + str(habit_id))
+                if entry is not None and entry[0] == stamps[habit_id]:
+                    bodies[habit_id] = entry[1]
+                    entries[habit_id] = entry
+            self._store_local(entries)
+        return bodies
+
+    def set_many(self, entries):
+        """Сохраняет тексты: entries — словарь {id: (версия, текст)}."""
+        self._store_local(entries)
+        if self.shared is not None and entries:
+            self.shared.set_many({SHARED_KEY_PREFIX + str(habit_id): entry for habit_id, entry in entries.items()})
+
+    def invalidate(self, habit_ids):
+        """Удаляет тексты привычек из обоих уровней кэша."""
+        with self._lock:
+            for habit_id in habit_ids:
+                self._local.pop(habit_id, None)
+        if self.shared is not None and habit_ids:
+            self.shared.delete_many([SHARED_KEY_PREFIX + str(habit_id) for habit_id in habit_ids])
+
+    def _store_local(self, entries):
+        with self._lock:
+            for habit_id, entry in entries.items():
+                self._local[habit_id] = entry
+                self._local.move_to_end(habit_id)
+            while len(self._local) > self.maxsize:
+                self._local.popitem(last=False)
+
+
+_body_cache = None
+
+
+def get_body_cache():
+    """Возвращает общий для процесса экземпляр ReminderBodyCache."""
+    global _body_cache
+    if _body_cache is None:
+        alias = settings.REMINDER_BODY_SHARED_CACHE
+        _body_cache = ReminderBodyCache(shared=caches[alias] if alias else None)
+    return _body_cache
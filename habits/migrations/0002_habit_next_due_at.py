@@ -0,0 +1,36 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:17
+
+from django.db import migrations, models
+from django.utils import timezone
+
+from habits.scheduling import first_due_at
+
+
+def fill_next_due_at(apps, schema_editor):
+    """Назначает существующим привычкам ближайший срок напоминания."""
+    Habit = apps.get_model('habits', 'Habit')
+    now = timezone.now()
+    batch = []
+    for habit in Habit.objects.only('id', 'time').iterator(chunk_size=2000):
+        habit.next_due_at = first_due_at(habit.time, now)
+        batch.append(habit)
+        if len(batch) >= 2000:
+            Habit.objects.bulk_update(batch, ['next_due_at'])
+            batch = []
+    Habit.objects.bulk_update(batch, ['next_due_at'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('habits', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='habit',
+            name='next_due_at',
+            field=models.DateTimeField(blank=True, db_index=True, help_text='Момент, когда нужно отправить следующее напоминание (с учётом периодичности).', null=True, verbose_name='Следующее напоминание'),
+        ),
+        migrations.RunPython(fill_next_due_at, migrations.RunPython.noop),
+    ]
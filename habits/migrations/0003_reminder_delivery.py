@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:20
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('habits', '0002_habit_next_due_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReminderDelivery',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('slot', models.DateTimeField(help_text='Значение next_due_at привычки, за которое отправляется напоминание.', verbose_name='Срок напоминания')),
+                ('claim', models.CharField(help_text='Идентификатор задачи, которая захватила отправку.', max_length=64, verbose_name='Исполнитель')),
+                ('status', models.CharField(choices=[('pending', 'Ожидает отправки'), ('sent', 'Отправлено'), ('failed', 'Ошибка отправки')], default='pending', max_length=16, verbose_name='Статус')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Создано')),
+                ('sent_at', models.DateTimeField(blank=True, null=True, verbose_name='Отправлено')),
+                ('error', models.TextField(blank=True, default='', verbose_name='Ошибка')),
+                ('habit', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='deliveries', to='habits.habit', verbose_name='Привычка')),
+            ],
+            options={
+                'verbose_name': 'доставка напоминания',
+                'verbose_name_plural': 'доставка напоминаний',
+                'indexes': [models.Index(fields=['slot'], name='reminder_delivery_slot_idx')],
+                'constraints': [models.UniqueConstraint(fields=('habit', 'slot'), name='unique_reminder_delivery_slot')],
+            },
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:31
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('habits', '0003_reminder_delivery'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='reminderdelivery',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Ожидает отправки'), ('sent', 'Отправлено'), ('retrying', 'Ожидает повторной отправки'), ('failed', 'Ошибка отправки')], default='pending', max_length=16, verbose_name='Статус'),
+        ),
+        migrations.CreateModel(
+            name='ReminderDeadLetter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('chat_id', models.CharField(max_length=50, verbose_name='ID чата')),
+                ('text', models.TextField(verbose_name='Текст сообщения')),
+                ('error', models.TextField(blank=True, default='', verbose_name='Последняя ошибка')),
+                ('attempts', models.PositiveSmallIntegerField(default=1, verbose_name='Попыток отправки')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Создано')),
+                ('replayed_at', models.DateTimeField(blank=True, null=True, verbose_name='Отправлено повторно')),
+                ('delivery', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='dead_letter', to='habits.reminderdelivery', verbose_name='Доставка')),
+            ],
+            options={
+                'verbose_name': 'недоставленное напоминание',
+                'verbose_name_plural': 'недоставленные напоминания',
+            },
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:40
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('habits', '0006_habit_list_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HabitTombstone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('habit_id', models.BigIntegerField(verbose_name='ID привычки')),
+                ('deleted_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Удалено')),
+            ],
+            options={
+                'verbose_name': 'удалённая привычка',
+                'verbose_name_plural': 'удалённые привычки',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='habit',
+            index=models.Index(fields=['user', 'updated_at'], name='habit_user_updated_at_idx'),
+        ),
+        migrations.AddField(
+            model_name='habittombstone',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='habit_tombstones', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь'),
+        ),
+        migrations.AddIndex(
+            model_name='habittombstone',
+            index=models.Index(fields=['user', 'deleted_at'], name='habit_tombstone_user_idx'),
+        ),
+    ]
@@ -0,0 +1,83 @@
+# Generated by Django 5.2.18 on 2026-10-18 05:04
+
+import datetime
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+# Сколько месяцев вперёд создать секции при миграции; дальше их создаёт
+# задача create_completion_partitions. Значение зафиксировано в миграции намеренно.
+PARTITIONS_AHEAD = 3
+
+
+def create_month_partitions(schema_editor, months_ahead):
+    """Секции отметок с текущего месяца на months_ahead месяцев вперёд (копия кода приложения на момент миграции)."""
+    today = datetime.datetime.now(datetime.timezone.utc)
+    for months in range(months_ahead + 1):
+        month = today.year * 12 + today.month - 1 + months
+        start = datetime.datetime(month // 12, month % 12 + 1, 1, tzinfo=datetime.timezone.utc)
+        end = datetime.datetime((month + 1) // 12, (month + 1) % 12 + 1, 1, tzinfo=datetime.timezone.utc)
+        schema_editor.execute(
+            f'CREATE TABLE IF NOT EXISTS "habits_habitcompletion_y{start:%Y}m{start:%m}" '
+            f'PARTITION OF "habits_habitcompletion" FOR VALUES FROM (%s) TO (%s)',
+            [start, end],
+        )
+
+
+def partition_completion_table(apps, schema_editor):
+    """
+    В PostgreSQL пересоздаёт (ещё пустую) таблицу отметок как секционированную по месяцам
+    completed_at: старые месяцы можно будет отсоединять и удалять целиком, а запросы
+    за период читают только свои секции. Ключ секционирования входит в первичный ключ.
+    Секции ближайших месяцев создаются здесь же, дальше — задачей create_completion_partitions.
+    """
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    user_table = apps.get_model(settings.AUTH_USER_MODEL)._meta.db_table
+    schema_editor.execute('DROP TABLE "habits_habitcompletion"')
+    schema_editor.execute(f'''
+        CREATE TABLE "habits_habitcompletion" (
+            "habit_id" bigint NOT NULL
+                REFERENCES "habits_habit" ("id") DEFERRABLE INITIALLY DEFERRED,
+            "completed_at" timestamp with time zone NOT NULL,
+            "user_id" bigint NOT NULL
+                REFERENCES "{user_table}" ("id") DEFERRABLE INITIALLY DEFERRED,
+            "created_at" timestamp with time zone NOT NULL,
+            PRIMARY KEY ("habit_id", "completed_at")
+        ) PARTITION BY RANGE ("completed_at")
+    ''')
+    schema_editor.execute(
+        'CREATE INDEX "habit_completion_user_idx" ON "habits_habitcompletion" ("user_id", "completed_at")'
+    )
+    schema_editor.execute('CREATE TABLE "habits_habitcompletion_default" PARTITION OF "habits_habitcompletion" DEFAULT')
+    create_month_partitions(schema_editor, PARTITIONS_AHEAD)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('habits', '0007_habit_tombstone'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HabitCompletion',
+            fields=[
+                ('pk', models.CompositePrimaryKey('habit', 'completed_at', blank=True, editable=False, primary_key=True, serialize=False)),
+                ('completed_at', models.DateTimeField(verbose_name='Выполнено')),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Получено')),
+                ('habit', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='completions', to='habits.habit', verbose_name='Привычка')),
+                ('user', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='habit_completions', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+            ],
+            options={
+                'verbose_name': 'выполнение привычки',
+                'verbose_name_plural': 'выполнения привычек',
+                'indexes': [models.Index(fields=['user', 'completed_at'], name='habit_completion_user_idx')],
+            },
+        ),
+        # Обратная операция не нужна: удаление модели удаляет таблицу вместе с секциями
+        migrations.RunPython(partition_completion_table, migrations.RunPython.noop),
+    ]
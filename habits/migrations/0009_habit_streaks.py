@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-18 05:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('habits', '0008_habit_completion'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='habit',
+            name='current_streak',
+            field=models.PositiveIntegerField(default=0, help_text='Сколько сроков подряд привычка выполнена на момент последней отметки.', verbose_name='Текущая серия'),
+        ),
+        migrations.AddField(
+            model_name='habit',
+            name='last_completed_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Последнее выполнение'),
+        ),
+        migrations.AddField(
+            model_name='habit',
+            name='longest_streak',
+            field=models.PositiveIntegerField(default=0, verbose_name='Самая длинная серия'),
+        ),
+    ]
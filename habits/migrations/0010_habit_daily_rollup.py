@@ -0,0 +1,63 @@
+# Generated by Django 5.2.18 on 2026-10-18 05:09
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('habits', '0009_habit_streaks'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HabitDailyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(verbose_name='День')),
+                ('hour', models.PositiveSmallIntegerField(verbose_name='Час')),
+                ('completions', models.PositiveIntegerField(default=0, verbose_name='Выполнений')),
+            ],
+            options={
+                'verbose_name': 'дневная сводка',
+                'verbose_name_plural': 'дневные сводки',
+            },
+        ),
+        migrations.CreateModel(
+            name='RollupWatermark',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=64, unique=True, verbose_name='Название')),
+                ('position', models.DateTimeField(verbose_name='Обработано до')),
+            ],
+            options={
+                'verbose_name': 'отметка обработки',
+                'verbose_name_plural': 'отметки обработки',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='habitcompletion',
+            index=models.Index(fields=['created_at'], name='habit_completion_created_idx'),
+        ),
+        migrations.AddField(
+            model_name='habitdailyrollup',
+            name='habit',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='daily_rollups', to='habits.habit', verbose_name='Привычка'),
+        ),
+        migrations.AddField(
+            model_name='habitdailyrollup',
+            name='user',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='habit_rollups', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь'),
+        ),
+        migrations.AddIndex(
+            model_name='habitdailyrollup',
+            index=models.Index(fields=['user', 'day'], name='habit_rollup_user_day_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='habitdailyrollup',
+            constraint=models.UniqueConstraint(fields=('habit', 'day', 'hour'), name='habit_rollup_unique'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-18 05:58
+
+import habits.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('habits', '0010_habit_daily_rollup'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='habit',
+            name='related_habit',
+            field=models.ForeignKey(blank=True, help_text='Приятная привычка, которая выполняется сразу после полезной.', null=True, on_delete=habits.deletion.set_null_and_touch, to='habits.habit', verbose_name='Связанная привычка'),
+        ),
+    ]
@@ -1,5 +1,9 @@
 from django.conf import settings
 from django.db import models
+from django.utils import timezone
+
+from habits.deletion import set_null_and_touch
+from habits.scheduling import first_due_at, get_zone
 
 # Константы для ограничения периодичности
 # Нельзя выполнять привычку реже, чем 1 раз в 7 дней.
@@ -48,7 +52,8 @@ class Habit(models.Model):
     # Связанная привычка (может быть только приятной привычкой!)
     related_habit = models.ForeignKey(
         'self',  # Ссылка на саму себя
-        on_delete=models.SET_NULL,
+        # Как SET_NULL, но ссылающиеся привычки получают новое updated_at (см. habits.deletion)
+        on_delete=set_null_and_touch,
         null=True,
         blank=True,
         verbose_name='Связанная привычка',
@@ -85,12 +90,327 @@ class Habit(models.Model):
         help_text='Если True, привычка отображается в общем списке.',
     )
 
+    # 5. Служебные поля планировщика напоминаний
+    next_due_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        db_index=True,
+        verbose_name='Следующее напоминание',
+        help_text='Момент, когда нужно отправить следующее напоминание (с учётом периодичности).',
+    )
+
+    # Время последнего изменения; служит версией текста напоминания в кэше
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='Изменено')
+
+    # 6. Серии выполнений; обновляются при каждой отметке (habits.streaks), без чтения истории
+    current_streak = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Текущая серия',
+        help_text='Сколько сроков подряд привычка выполнена на момент последней отметки.',
+    )
+    longest_streak = models.PositiveIntegerField(default=0, verbose_name='Самая длинная серия')
+    last_completed_at = models.DateTimeField(null=True, blank=True, verbose_name='Последнее выполнение')
+
     class Meta:
         verbose_name = 'привычка'
         verbose_name_plural = 'привычки'
         # Сортировка по времени и по ID
         ordering = ('time', 'id',)
+        # Индексы под сортировку списков: курсорная пагинация читает страницу диапазоном по ним
+        indexes = [
+            models.Index(fields=('user', 'time', 'id'), name='habit_user_time_id_idx'),
+            # Выборка изменённых привычек пользователя для синхронизации (?since=)
+            models.Index(fields=('user', 'updated_at'), name='habit_user_updated_at_idx'),
+            models.Index(
+                fields=('time', 'id'), condition=models.Q(is_public=True), name='habit_public_time_id_idx'
+            ),
+        ]
+
+    # Поля, значения которых запоминаются при чтении из базы: по ним сигналы (habits.signals)
+    # узнают, что изменилось при сохранении, без дополнительного запроса
+    TRACKED_FIELDS = ('is_public', 'action')
 
     def __str__(self):
         return f'Привычка: {self.action} ({self.user.username})'
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance.remember_stored_values()
+        return instance
+
+    def remember_stored_values(self, update_fields=None):
+        """Запоминает загруженные (не отложенные) значения TRACKED_FIELDS как сохранённые в базе."""
+        stored = getattr(self, '_stored_values', {})
+        for name in self.TRACKED_FIELDS:
+            if name in self.__dict__ and (update_fields is None or name in update_fields):
+                stored[name] = self.__dict__[name]
+        self._stored_values = stored
+
+    def stored_value(self, name, default=None):
+        """Значение поля в базе на момент чтения или сохранения; default, если оно неизвестно."""
+        return getattr(self, '_stored_values', {}).get(name, default)
+
+    def fill_next_due_at(self, tz=None):
+        """
+        Назначает привычке без срока ближайший срок напоминания. tz — пояс пользователя,
+        если он уже известен вызывающему; иначе пояс читается у self.user.
+        """
+        if self.next_due_at is None and self.time is not None:
+            self.next_due_at = first_due_at(self.time, timezone.now(), tz or get_zone(self.user.timezone))
+
+    def save(self, *args, **kwargs):
+        # Привычке, созданной в обход сериализатора, назначаем ближайший срок напоминания
+        self.fill_next_due_at()
+        super().save(*args, **kwargs)
+        self.remember_stored_values(kwargs.get('update_fields'))
+
+
+class HabitTombstone(models.Model):
+    """
+    Отметка об удалённой привычке для синхронизации клиентов (?since=).
+    Сама привычка удаляется, а id остаётся здесь, чтобы клиент узнал об удалении.
+    Старые отметки удаляются задачей purge_habit_tombstones.
+    """
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='habit_tombstones',
+        verbose_name='Пользователь',
+    )
+
+    habit_id = models.BigIntegerField(verbose_name='ID привычки')
+    deleted_at = models.DateTimeField(default=timezone.now, verbose_name='Удалено')
+
+    class Meta:
+        verbose_name = 'удалённая привычка'
+        verbose_name_plural = 'удалённые привычки'
+        indexes = [
+            models.Index(fields=('user', 'deleted_at'), name='habit_tombstone_user_idx'),
+        ]
+
+    def __str__(self):
+        return f'Привычка {self.habit_id} удалена {self.deleted_at:%Y-%m-%d %H:%M}'
+
+
+class HabitCompletion(models.Model):
+    """
+    Отметка о выполнении привычки (журнал только на добавление).
+    Первичный ключ — (habit, completed_at): повторная отправка той же отметки
+    (например, офлайн-клиентом) не создаёт дубликата. В PostgreSQL таблица
+    секционирована по месяцам completed_at (см. habits.partitions).
+    """
+
+    pk = models.CompositePrimaryKey('habit', 'completed_at')
+
+    # Отдельные индексы по внешним ключам не нужны: их покрывают первичный ключ
+    # и индекс (user, completed_at), а каждый лишний индекс замедляет запись
+    habit = models.ForeignKey(
+        Habit,
+        on_delete=models.CASCADE,
+        db_index=False,
+        related_name='completions',
+        verbose_name='Привычка',
+    )
+    # Владелец привычки; хранится в отметке, чтобы выборки по пользователю не соединялись с привычками
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        db_index=False,
+        related_name='habit_completions',
+        verbose_name='Пользователь',
+    )
+
+    completed_at = models.DateTimeField(verbose_name='Выполнено')
+    created_at = models.DateTimeField(default=timezone.now, verbose_name='Получено')
+
+    class Meta:
+        verbose_name = 'выполнение привычки'
+        verbose_name_plural = 'выполнения привычек'
+        indexes = [
+            models.Index(fields=('user', 'completed_at'), name='habit_completion_user_idx'),
+            # Выборка новых отметок для дневных сводок (habits.rollups) по времени получения
+            models.Index(fields=('created_at',), name='habit_completion_created_idx'),
+        ]
+
+    def __str__(self):
+        return f'Привычка {self.habit_id} выполнена {self.completed_at:%Y-%m-%d %H:%M}'
+
+
+class HabitDailyRollup(models.Model):
+    """
+    Дневная сводка отметок: сколько раз привычка выполнена за день и час
+    (по местному времени пользователя). Статистика за период читается из сводок,
+    поэтому её стоимость зависит от длины периода, а не от количества отметок.
+    Сводки дополняет задача build_habit_rollups (см. habits.rollups).
+    """
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        db_index=False,
+        related_name='habit_rollups',
+        verbose_name='Пользователь',
+    )
+    habit = models.ForeignKey(
+        Habit,
+        on_delete=models.CASCADE,
+        db_index=False,
+        related_name='daily_rollups',
+        verbose_name='Привычка',
+    )
+    day = models.DateField(verbose_name='День')
+    hour = models.PositiveSmallIntegerField(verbose_name='Час')
+    completions = models.PositiveIntegerField(default=0, verbose_name='Выполнений')
+
+    class Meta:
+        verbose_name = 'дневная сводка'
+        verbose_name_plural = 'дневные сводки'
+        constraints = [
+            models.UniqueConstraint(fields=('habit', 'day', 'hour'), name='habit_rollup_unique'),
+        ]
+        indexes = [
+            models.Index(fields=('user', 'day'), name='habit_rollup_user_day_idx'),
+        ]
+
+    def __str__(self):
+        return f'Привычка {self.habit_id}: {self.day} {self.hour}:00 — {self.completions}'
+
+
+class RollupWatermark(models.Model):
+    """
+    Отметка обработки для инкрементальных задач: до какого момента (created_at)
+    данные уже учтены. Следующий запуск обрабатывает только более новые строки.
+    """
+
+    name = models.CharField(max_length=64, unique=True, verbose_name='Название')
+    position = models.DateTimeField(verbose_name='Обработано до')
+
+    class Meta:
+        verbose_name = 'отметка обработки'
+        verbose_name_plural = 'отметки обработки'
+
+    def __str__(self):
+        return f'{self.name}: {self.position:%Y-%m-%d %H:%M:%S}'
+
+
+class ReminderDeliveryQuerySet(models.QuerySet):
+    """
+    Запросы к журналу доставки напоминаний.
+    """
+
+    def stats(self):
+        """
+        Сводка по доставке: количество по статусам, доля ошибок
+        и средняя задержка от срока напоминания до отправки.
+        """
+        summary = self.aggregate(
+            total=models.Count('id'),
+            sent=models.Count('id', filter=models.Q(status=ReminderDelivery.STATUS_SENT)),
+            failed=models.Count('id', filter=models.Q(status=ReminderDelivery.STATUS_FAILED)),
+            pending=models.Count('id', filter=models.Q(status=ReminderDelivery.STATUS_PENDING)),
+            retrying=models.Count('id', filter=models.Q(status=ReminderDelivery.STATUS_RETRYING)),
+            avg_latency=models.Avg(
+                models.ExpressionWrapper(
+                    models.F('sent_at') - models.F('slot'), output_field=models.DurationField()
+                ),
+                filter=models.Q(status=ReminderDelivery.STATUS_SENT),
+            ),
+        )
+        finished = summary['sent'] + summary['failed']
+        summary['failure_rate'] = summary['failed'] / finished if finished else 0.0
+        return summary
+
+
+class ReminderDelivery(models.Model):
+    """
+    Журнал доставки напоминаний.
+    Уникальная пара (привычка, срок) гарантирует, что напоминание за один срок
+    отправляется не больше одного раза, сколько бы воркеров ни выполняли рассылку.
+    """
+
+    STATUS_PENDING = 'pending'
+    STATUS_SENT = 'sent'
+    STATUS_RETRYING = 'retrying'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = (
+        (STATUS_PENDING, 'Ожидает отправки'),
+        (STATUS_SENT, 'Отправлено'),
+        (STATUS_RETRYING, 'Ожидает повторной отправки'),
+        (STATUS_FAILED, 'Ошибка отправки'),
+    )
+
+    habit = models.ForeignKey(
+        Habit,
+        on_delete=models.CASCADE,
+        related_name='deliveries',
+        verbose_name='Привычка',
+    )
+
+    slot = models.DateTimeField(
+        verbose_name='Срок напоминания',
+        help_text='Значение next_due_at привычки, за которое отправляется напоминание.',
+    )
+
+    claim = models.CharField(
+        max_length=64,
+        verbose_name='Исполнитель',
+        help_text='Идентификатор задачи, которая захватила отправку.',
+    )
+
+    status = models.CharField(
+        max_length=16,
+        choices=STATUS_CHOICES,
+        default=STATUS_PENDING,
+        verbose_name='Статус',
+    )
+
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='Создано')
+    sent_at = models.DateTimeField(null=True, blank=True, verbose_name='Отправлено')
+    error = models.TextField(blank=True, default='', verbose_name='Ошибка')
+
+    objects = ReminderDeliveryQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = 'доставка напоминания'
+        verbose_name_plural = 'доставка напоминаний'
+        constraints = [
+            models.UniqueConstraint(fields=('habit', 'slot'), name='unique_reminder_delivery_slot'),
+        ]
+        indexes = [
+            models.Index(fields=('slot',), name='reminder_delivery_slot_idx'),
+        ]
+
+    def __str__(self):
+        return f'Напоминание {self.habit_id} за {self.slot:%Y-%m-%d %H:%M}: {self.status}'
+
+
+class ReminderDeadLetter(models.Model):
+    """
+    Очередь недоставленных напоминаний.
+    Сюда попадают напоминания, которые не удалось отправить ни с одной попытки;
+    их можно просмотреть в админке и отправить повторно пачкой.
+    """
+
+    delivery = models.OneToOneField(
+        ReminderDelivery,
+        on_delete=models.CASCADE,
+        related_name='dead_letter',
+        verbose_name='Доставка',
+    )
+
+    chat_id = models.CharField(max_length=50, verbose_name='ID чата')
+    text = models.TextField(verbose_name='Текст сообщения')
+    error = models.TextField(blank=True, default='', verbose_name='Последняя ошибка')
+    attempts = models.PositiveSmallIntegerField(default=1, verbose_name='Попыток отправки')
+
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='Создано')
+    replayed_at = models.DateTimeField(null=True, blank=True, verbose_name='Отправлено повторно')
+
+    class Meta:
+        verbose_name = 'недоставленное напоминание'
+        verbose_name_plural = 'недоставленные напоминания'
+
+    def __str__(self):
+        return f'Недоставленное напоминание в чат {self.chat_id}: {self.error}'
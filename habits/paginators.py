@@ -1,9 +1,80 @@
-from rest_framework.pagination import PageNumberPagination
+import datetime
+
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import Cursor, CursorPagination, PageNumberPagination
+
+
+class HabitCursorPaginator(CursorPagination):
+    """
+    Курсорная (keyset) пагинация списка привычек по сортировке модели (time, id).
+    Курсор хранит (time, id) последней привычки страницы, и следующая страница
+    выбирается условием по индексу, а не через OFFSET, — поэтому стоимость
+    страницы не зависит от её глубины. Общее количество не считается.
+    """
+    page_size = 5
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    ordering = ('time', 'id')
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.base_url = request.build_absolute_uri()
+        self.cursor = self.decode_cursor(request)
+        reverse = self.cursor is not None and self.cursor.reverse
+        position = self.decode_position(self.cursor.position) if self.cursor and self.cursor.position else None
+
+        if position is not None:
+            time, habit_id = position
+            # Условие записано так, чтобы по индексу (time, id) читался диапазон time >= / <= курсора
+            if reverse:
+                queryset = queryset.filter(time__lte=time).exclude(time=time, id__gte=habit_id)
+            else:
+                queryset = queryset.filter(time__gte=time).exclude(time=time, id__lte=habit_id)
+
+        ordering = ('-time', '-id') if reverse else self.ordering
+        results = list(queryset.order_by(*ordering)[:self.page_size + 1])
+        has_more = len(results) > self.page_size
+        self.page = results[:self.page_size]
+
+        if reverse:
+            self.page.reverse()
+            self.has_next, self.has_previous = bool(self.page), has_more
+        else:
+            self.has_next, self.has_previous = has_more, position is not None
+        return self.page
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        return self.encode_cursor(Cursor(offset=0, reverse=False, position=self.encode_position(self.page[-1])))
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        return self.encode_cursor(Cursor(offset=0, reverse=True, position=self.encode_position(self.page[0])))
+
+    @staticmethod
+    def encode_position(habit):
+        """Позиция курсора: время и id привычки (объекта модели или строки .values())."""
+        if isinstance(habit, dict):
+            return f"{habit['time'].isoformat()}|{habit['id']}"
+        return f'{habit.time.isoformat()}|{habit.id}'
+
+    def decode_position(self, position):
+        try:
+            time, habit_id = position.split('|')
+            return datetime.time.fromisoformat(time), int(habit_id)
+        except ValueError:
+            raise NotFound(self.invalid_cursor_message)
+
 
 class HabitPaginator(PageNumberPagination):
     """
     Пагинатор для списка привычек.
     Использует стандартный PageNumberPagination DRF.
+    Если в запросе есть параметр cursor (для первой страницы — пустой, ?cursor=),
+    используется курсорная пагинация HabitCursorPaginator.
     """
     # По умолчанию у нас 5 элементов на странице (указано в settings.py)
     page_size = 5
@@ -11,3 +82,18 @@ class HabitPaginator(PageNumberPagination):
     page_size_query_param = 'page_size'
     # Максимальное количество элементов на странице
     max_page_size = 100
+    # Параметр, включающий курсорную пагинацию
+    cursor_query_param = HabitCursorPaginator.cursor_query_param
+
+    cursor_paginator = None
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if self.cursor_query_param in request.query_params:
+            self.cursor_paginator = HabitCursorPaginator()
+            return self.cursor_paginator.paginate_queryset(queryset, request, view)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.cursor_paginator is not None:
+            return self.cursor_paginator.get_paginated_response(data)
+        return super().get_paginated_response(data)
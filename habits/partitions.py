@@ -0,0 +1,51 @@
+import datetime
+
+from django.conf import settings
+from django.db import connection
+from django.utils import timezone
+
+# Таблица отметок о выполнении; в PostgreSQL она секционирована по месяцам completed_at
+COMPLETION_TABLE = 'habits_habitcompletion'
+# Секция по умолчанию принимает отметки за месяцы без своей секции (например, старые офлайн-отметки)
+COMPLETION_DEFAULT_PARTITION = f'{COMPLETION_TABLE}_default'
+
+
+def month_start(day, months=0):
+    """Начало месяца (полночь UTC), сдвинутого на months от месяца day."""
+    month = day.year * 12 + day.month - 1 + months
+    return datetime.datetime(month // 12, month % 12 + 1, 1, tzinfo=datetime.timezone.utc)
+
+
+def partition_name(start):
+    return f'{COMPLETION_TABLE}_y{start:%Y}m{start:%m}'
+
+
+def create_completion_partitions(months_ahead=None, today=None):
+    """
+    Создаёт секции таблицы отметок с текущего месяца на months_ahead месяцев вперёд
+    (по умолчанию HABIT_COMPLETION_PARTITIONS_AHEAD). Секции создаются заранее: если отметки
+    за месяц уже попали в секцию по умолчанию, PostgreSQL не даст создать секцию этого месяца.
+    Вне PostgreSQL ничего не делает. Возвращает имена созданных секций.
+    """
+    if connection.vendor != 'postgresql':
+        return []
+    if months_ahead is None:
+        months_ahead = settings.HABIT_COMPLETION_PARTITIONS_AHEAD
+    today = today or timezone.now()
+
+    created = []
+    quote_name = connection.ops.quote_name
+    with connection.cursor() as cursor:
+        for months in range(months_ahead + 1):
+            start, end = month_start(today, months), month_start(today, months + 1)
+            name = partition_name(start)
+            cursor.execute('SELECT to_regclass(%s)', [name])
+            if cursor.fetchone()[0] is not None:
+                continue
+            cursor.execute(
+                f'CREATE TABLE {quote_name(name)} PARTITION OF {quote_name(COMPLETION_TABLE)} '
+                f'FOR VALUES FROM (%s) TO (%s)',
+                [start, end],
+            )
+            created.append(name)
+    return created
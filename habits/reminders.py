@@ -0,0 +1,508 @@
+import itertools
+import math
+import random
+import uuid
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Count, Max, Min
+from django.utils import timezone
+from habits.message_cache import get_body_cache, habit_stamp
+from habits.models import Habit, ReminderDeadLetter, ReminderDelivery
+from habits.scheduling import advance_due_at, first_due_at, get_zone, minute_window_end, reminder_window_end
+from habits.sender import is_chat_unavailable, is_transient
+from habits.timing_wheel import get_wheel, wheel_enabled
+
+# Поля, которые нужны для рассылки и перепланирования.
+# Связанные user и related_habit читаются тем же запросом через JOIN.
+# Сам текст напоминания берётся из кэша по версии привычки (updated_at).
+REMINDER_FIELDS = (
+    'id',
+    'time',
+    'updated_at',
+    'related_habit__updated_at',
+    'user__telegram_id',
+    'user__telegram_paused_at',
+    'user__username',
+    'user__timezone',
+    'periodicity',
+    'next_due_at',
+)
+
+# Поля для сборки текста напоминания (читаются только при промахе кэша)
+BODY_FIELDS = (
+    'id',
+    'action',
+    'time',
+    'place',
+    'reward',
+    'related_habit__action',
+)
+
+
+# Максимальная длина сообщения Telegram (с запасом под разметку)
+MAX_MESSAGE_LENGTH = 4000
+
+
+def get_due_queryset(now, user_range=None):
+    """
+    Привычки, по которым нужно отправить напоминание в текущем часовом окне.
+    Выборка — диапазон по индексу next_due_at, а не вычисление по каждой строке.
+    user_range=(start, end) ограничивает выборку диапазоном id пользователей (включительно).
+    """
+    queryset = Habit.objects.filter(
+        next_due_at__lt=reminder_window_end(now),
+        user__telegram_id__isnull=False,  # Напоминаем только тем, у кого есть ID
+        user__telegram_paused_at__isnull=True,  # и чей чат не поставлен на паузу
+    )
+    if user_range is not None:
+        queryset = queryset.filter(user_id__gte=user_range[0], user_id__lte=user_range[1])
+    return queryset.order_by()
+
+
+def get_due_habits(now, user_range=None):
+    """
+    Возвращает привычки для напоминания в виде словарей (.values()),
+    без создания объектов моделей.
+    """
+    return get_due_queryset(now, user_range).values(*REMINDER_FIELDS)
+
+
+def plan_partitions(now, max_partitions=None, min_partition_size=None):
+    """
+    Делит привычки текущего окна на диапазоны id пользователей для параллельной рассылки.
+    Все привычки одного пользователя попадают в одну подзадачу: так сводка и
+    ограничение частоты по чату работают в пределах одного процесса.
+    Количество диапазонов не превышает max_partitions, а в каждом в среднем
+    не меньше min_partition_size привычек. Выполняет один агрегирующий запрос.
+    """
+    max_partitions = max_partitions or settings.REMINDER_MAX_PARTITIONS
+    min_partition_size = min_partition_size or settings.REMINDER_MIN_PARTITION_SIZE
+
+    bounds = get_due_queryset(now).aggregate(first=Min('user_id'), last=Max('user_id'), total=Count('id'))
+    if not bounds['total']:
+        return []
+
+    partitions = max(1, min(max_partitions, math.ceil(bounds['total'] / min_partition_size)))
+    return split_id_range(bounds['first'], bounds['last'], partitions)
+
+
+def split_id_range(first, last, partitions):
+    """Делит отрезок [first, last] на partitions непересекающихся диапазонов равной ширины."""
+    width = math.ceil((last - first + 1) / partitions)
+    return [
+        (start, min(start + width - 1, last))
+        for start in range(first, last + 1, width)
+    ]
+
+
+def iter_chunks(iterable, size):
+    """Разбивает итерируемый объект на списки длиной не более size."""
+    iterator = iter(iterable)
+    while chunk := list(itertools.islice(iterator, size)):
+        yield chunk
+
+
+def iter_user_chunks(rows, size):
+    """
+    Как iter_chunks, но не разрывает привычки одного пользователя между порциями.
+    Строки должны быть упорядочены по пользователю.
+    """
+    chunk = []
+    for user_id, user_rows in itertools.groupby(rows, key=lambda row: row['user__telegram_id']):
+        chunk.extend(user_rows)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def build_reminder_body(row):
+    """Формирует описание одной привычки для напоминания."""
+    body = (
+        f"**Действие:** Я буду {row['action']}\n"
+        f"**Когда:** в {row['time'].strftime('%H:%M')}\n"
+        f"**Где:** в {row['place']}\n\n"
+    )
+
+    if row['reward']:
+        body += f"**Вознаграждение:** {row['reward']}\n"
+    elif row['related_habit__action']:
+        body += f"**Связанная привычка:** {row['related_habit__action']}\n"
+
+    return body
+
+
+def reminder_body(row):
+    """Описание привычки: готовое из кэша (row['body']) или собранное по полям строки."""
+    return row.get('body') or build_reminder_body(row)
+
+
+def render_bodies(rows, cache=None):
+    """
+    Подставляет в строки готовые описания привычек (row['body']).
+    Описания берутся из кэша по версии привычки; на промахи приходится
+    один запрос за полями текста и их сборка, после чего результат кэшируется.
+    Строки привычек, удалённых после выборки, отбрасываются.
+    """
+    cache = cache or get_body_cache()
+    stamps = {row['id']: habit_stamp(row) for row in rows}
+    bodies = cache.get_many(stamps)
+
+    missed = [habit_id for habit_id in stamps if habit_id not in bodies]
+    if missed:
+        rendered = {
+            row['id']: build_reminder_body(row)
+            for row in Habit.objects.filter(id__in=missed).order_by().values(*BODY_FIELDS)
+        }
+        cache.set_many({habit_id: (stamps[habit_id], body) for habit_id, body in rendered.items()})
+        bodies.update(rendered)
+
+    for row in rows:
+        row['body'] = bodies.get(row['id'])
+    return [row for row in rows if row['body'] is not None]
+
+
+def build_reminder_message(row):
+    """Формирует текст напоминания по строке из get_due_habits()."""
+    return "🔔 *Напоминание о привычке!* 🔔\n\n" + reminder_body(row)
+
+
+def build_digest_message(rows):
+    """Формирует одно сообщение-сводку по нескольким привычкам пользователя."""
+    if len(rows) == 1:
+        return build_reminder_message(rows[0])
+    bodies = "\n".join(reminder_body(row) for row in rows)
+    return f"🔔 *Напоминание о привычках ({len(rows)})!* 🔔\n\n" + bodies
+
+
+def group_messages(rows, digest):
+    """
+    Группирует привычки в сообщения. Без сводки — по сообщению на привычку;
+    в режиме сводки — одно сообщение на чат (длинные сводки делятся на части).
+    Возвращает список групп строк; каждая группа — одно обращение к Bot API.
+    """
+    if not digest:
+        return [[row] for row in rows]
+
+    by_chat = {}
+    for row in rows:
+        by_chat.setdefault(row['user__telegram_id'], []).append(row)
+
+    groups = []
+    for chat_rows in by_chat.values():
+        group, length = [], 0
+        for row in chat_rows:
+            body_length = len(reminder_body(row))
+            if group and length + body_length > MAX_MESSAGE_LENGTH:
+                groups.append(group)
+                group, length = [], 0
+            group.append(row)
+            length += body_length
+        groups.append(group)
+    return groups
+
+
+def send_due_reminders(now, sender, chunk_size=None, user_range=None, claim=None, digest=None):
+    """
+    Потоковая рассылка напоминаний.
+    Привычки читаются одним запросом порциями по chunk_size строк,
+    поэтому расход памяти не зависит от размера таблицы.
+    После отправки порции срок каждой привычки переносится вперёд на её периодичность.
+    claim — идентификатор исполнителя для журнала доставки (обычно id задачи Celery).
+    digest — объединять привычки одного пользователя в одно сообщение (по умолчанию REMINDER_DIGEST).
+    Возвращает словарь со счётчиками: просмотрено привычек, отправлено напоминаний
+    и сделано обращений к Bot API (сообщений).
+    """
+    chunk_size = chunk_size or settings.REMINDER_CHUNK_SIZE
+    claim = claim or uuid.uuid4().hex
+    digest = settings.REMINDER_DIGEST if digest is None else digest
+    window_end = reminder_window_end(now)
+    scanned = sent = messages = 0
+
+    rows = get_due_habits(now, user_range)
+    if digest:
+        # Привычки пользователя идут подряд и не разрываются между порциями
+        chunks = iter_user_chunks(rows.order_by('user_id').iterator(chunk_size=chunk_size), chunk_size)
+    else:
+        chunks = iter_chunks(rows.iterator(chunk_size=chunk_size), chunk_size)
+
+    for chunk in chunks:
+        scanned += len(chunk)
+        chunk_sent, chunk_messages = deliver(chunk, sender, claim, digest)
+        sent += chunk_sent
+        messages += chunk_messages
+        reschedule(chunk, window_end)
+
+    return {'scanned': scanned, 'sent': sent, 'messages': messages}
+
+
+def send_wheel_reminders(now, wheel, sender, chunk_size=None, claim=None, digest=None):
+    """
+    Рассылка по расписанию в Redis (ReminderWheel) с точностью до минуты.
+    Из расписания забираются только привычки, срок которых наступает до конца текущей минуты;
+    таблица привычек читается только по их id. Новые сроки сразу возвращаются в расписание.
+    """
+    chunk_size = chunk_size or settings.REMINDER_CHUNK_SIZE
+    claim = claim or uuid.uuid4().hex
+    digest = settings.REMINDER_DIGEST if digest is None else digest
+    window_end = minute_window_end(now)
+    scanned = sent = messages = 0
+
+    while habit_ids := wheel.pop_due(window_end, chunk_size):
+        # Привычки без Telegram или с чатом на паузе тоже перепланируются,
+        # иначе они выпадут из расписания
+        chunk = list(Habit.objects.filter(id__in=habit_ids).order_by().values(*REMINDER_FIELDS))
+        scanned += len(chunk)
+        chunk_sent, chunk_messages = deliver(
+            [row for row in chunk if row['user__telegram_id'] and not row['user__telegram_paused_at']],
+            sender, claim, digest,
+        )
+        sent += chunk_sent
+        messages += chunk_messages
+        wheel.schedule_many(reschedule(chunk, window_end))
+
+    return {'scanned': scanned, 'sent': sent, 'messages': messages}
+
+
+def deliver(rows, sender, claim, digest=False):
+    """
+    Отправляет напоминания по порции привычек.
+    Отправляются только напоминания, захваченные этим исполнителем в журнале доставки.
+    Возвращает пару (доставлено напоминаний, отправлено сообщений).
+    """
+    if not rows:
+        return 0, 0
+    claimed = claim_deliveries(rows, claim)
+    rows = render_bodies([row for row in rows if row['id'] in claimed])
+    if not rows:
+        return 0, 0
+
+    groups = group_messages(rows, digest)
+    results = sender.send_batch([
+        (group[0]['user__telegram_id'], build_digest_message(group)) for group in groups
+    ])
+
+    # Результат сообщения относится ко всем привычкам, вошедшим в него
+    outcomes = [
+        (row, claimed[row['id']], result)
+        for group, result in zip(groups, results)
+        for row in group
+    ]
+    record_results(outcomes)
+    return sum(result.ok for row, delivery_id, result in outcomes), len(groups)
+
+
+def claim_deliveries(rows, claim):
+    """
+    Захватывает отправку напоминаний за текущий срок в журнале доставки.
+    Записи вставляются одним запросом с пропуском конфликтов по (привычка, срок),
+    затем выбираются только записи этого исполнителя — их и можно отправлять.
+    Возвращает словарь {id привычки: id записи журнала}.
+    """
+    ReminderDelivery.objects.bulk_create(
+        [ReminderDelivery(habit_id=row['id'], slot=row['next_due_at'], claim=claim) for row in rows],
+        ignore_conflicts=True,
+    )
+    return dict(
+        ReminderDelivery.objects.filter(
+            claim=claim,
+            status=ReminderDelivery.STATUS_PENDING,
+            habit_id__in=[row['id'] for row in rows],
+            slot__in={row['next_due_at'] for row in rows},
+        ).values_list('habit_id', 'id')
+    )
+
+
+def record_results(outcomes):
+    """
+    Записывает в журнал доставки результаты отправки порции.
+    outcomes — список троек (строка привычки, id записи журнала, SendResult).
+    """
+    now = timezone.now()
+    ReminderDelivery.objects.filter(
+        id__in=[delivery_id for row, delivery_id, result in outcomes if result.ok]
+    ).update(status=ReminderDelivery.STATUS_SENT, sent_at=now)
+
+    failed = [outcome for outcome in outcomes if not outcome[2].ok]
+    if failed:
+        handle_failures(failed)
+
+
+def handle_failures(failed, attempts=1, retry=True):
+    """
+    Разбирает неудачные отправки (тройки как в record_results):
+    - недоступные чаты (бот заблокирован, чат не найден) ставятся на паузу;
+    - временные ошибки при retry=True ставятся в очередь повторов (задача retry_reminder_delivery);
+    - остальные сразу попадают в очередь недоставленных (ReminderDeadLetter).
+    attempts — сколько попыток отправки уже сделано.
+    """
+    paused_chats = {result.chat_id for row, delivery_id, result in failed if is_chat_unavailable(result.error)}
+    retry_ids = {
+        delivery_id for row, delivery_id, result in failed
+        if retry and result.chat_id not in paused_chats and is_transient(result.error)
+    }
+
+    ReminderDelivery.objects.bulk_update(
+        [
+            ReminderDelivery(
+                id=delivery_id,
+                status=ReminderDelivery.STATUS_RETRYING if delivery_id in retry_ids else ReminderDelivery.STATUS_FAILED,
+                error=str(result.error),
+            )
+            for row, delivery_id, result in failed
+        ],
+        ['status', 'error'],
+    )
+    # В режиме сводки каждая привычка попадает в очередь отдельным напоминанием
+    ReminderDeadLetter.objects.bulk_create(
+        [
+            ReminderDeadLetter(
+                delivery_id=delivery_id, chat_id=result.chat_id, text=build_reminder_message(row),
+                error=str(result.error), attempts=attempts,
+            )
+            for row, delivery_id, result in failed
+            if result.chat_id not in paused_chats and delivery_id not in retry_ids
+        ],
+        ignore_conflicts=True,
+    )
+
+    pause_chats(paused_chats)
+    if retry_ids:
+        transaction.on_commit(lambda: schedule_retries(retry_ids))
+
+
+def pause_chats(chat_ids):
+    """Приостанавливает рассылку в недоступные чаты, чтобы не тратить на них обращения к Bot API."""
+    if not chat_ids:
+        return
+    paused = get_user_model().objects.filter(
+        telegram_id__in=chat_ids, telegram_paused_at__isnull=True
+    ).update(telegram_paused_at=timezone.now())
+    if paused:
+        print(f"Рассылка приостановлена для {paused} недоступных чатов.")
+
+
+def retry_delay(retries):
+    """
+    Задержка перед повтором номер retries (с нуля): экспоненциальный рост
+    от REMINDER_RETRY_BASE_DELAY до REMINDER_RETRY_MAX_DELAY со случайным разбросом
+    на половину задержки, чтобы повторы после массового сбоя не пришли одновременно.
+    """
+    delay = min(settings.REMINDER_RETRY_MAX_DELAY, settings.REMINDER_RETRY_BASE_DELAY * 2 ** retries)
+    return delay / 2 + random.uniform(0, delay / 2)
+
+
+def schedule_retries(delivery_ids):
+    """Ставит повторную отправку напоминаний в очередь Celery."""
+    # Импорт внутри функции: модуль задач сам импортирует этот модуль
+    from habits.tasks import retry_reminder_delivery
+
+    for delivery_id in delivery_ids:
+        retry_reminder_delivery.apply_async((delivery_id,), countdown=retry_delay(0))
+
+
+def retry_delivery(delivery_id, sender, attempts, final=False):
+    """
+    Повторная отправка одного напоминания из очереди повторов.
+    Напоминание формируется заново по текущему состоянию привычки.
+    attempts — номер этой попытки с учётом первой отправки;
+    final — попытка последняя: при ошибке напоминание попадает в очередь недоставленных.
+    Возвращает True, если отправку нужно повторить ещё раз.
+    """
+    row = Habit.objects.filter(
+        deliveries__id=delivery_id, deliveries__status=ReminderDelivery.STATUS_RETRYING
+    ).values(*REMINDER_FIELDS).first()
+    if row is None or not render_bodies([row]):
+        # Привычка удалена или напоминание уже обработано
+        return False
+    if not row['user__telegram_id'] or row['user__telegram_paused_at']:
+        ReminderDelivery.objects.filter(id=delivery_id).update(status=ReminderDelivery.STATUS_FAILED)
+        return False
+
+    result = sender.send_batch([(row['user__telegram_id'], build_reminder_message(row))])[0]
+    if result.ok:
+        ReminderDelivery.objects.filter(id=delivery_id).update(
+            status=ReminderDelivery.STATUS_SENT, sent_at=timezone.now()
+        )
+        return False
+    if is_transient(result.error) and not final:
+        ReminderDelivery.objects.filter(id=delivery_id).update(error=str(result.error))
+        return True
+
+    handle_failures([(row, delivery_id, result)], attempts=attempts, retry=False)
+    return False
+
+
+def replay_dead_letters(dead_letters, sender, chunk_size=None):
+    """
+    Повторно отправляет пачками недоставленные напоминания из queryset dead_letters.
+    Уже переотправленные записи пропускаются. Успешные записи отмечаются
+    временем повторной отправки, у неудачных растёт счётчик попыток.
+    Возвращает словарь со счётчиками отправленных и снова не доставленных напоминаний.
+    """
+    chunk_size = chunk_size or settings.REMINDER_CHUNK_SIZE
+    replayed = failed = 0
+
+    letters = dead_letters.filter(replayed_at__isnull=True).order_by('id')
+    for chunk in iter_chunks(letters.iterator(chunk_size=chunk_size), chunk_size):
+        results = sender.send_batch([(letter.chat_id, letter.text) for letter in chunk])
+        now = timezone.now()
+
+        sent = [letter for letter, result in zip(chunk, results) if result.ok]
+        ReminderDeadLetter.objects.filter(id__in=[letter.id for letter in sent]).update(replayed_at=now)
+        ReminderDelivery.objects.filter(id__in=[letter.delivery_id for letter in sent]).update(
+            status=ReminderDelivery.STATUS_SENT, sent_at=now
+        )
+
+        still_failed = []
+        for letter, result in zip(chunk, results):
+            if not result.ok:
+                letter.attempts += 1
+                letter.error = str(result.error)
+                still_failed.append(letter)
+        ReminderDeadLetter.objects.bulk_update(still_failed, ['attempts', 'error'])
+        pause_chats({result.chat_id for result in results if not result.ok and is_chat_unavailable(result.error)})
+
+        replayed += len(sent)
+        failed += len(still_failed)
+
+    return {'replayed': replayed, 'failed': failed}
+
+
+def reschedule(rows, after):
+    """
+    Переносит срок напоминания привычек на следующий период позже after.
+    Все строки порции обновляются одним запросом.
+    Возвращает словарь {id привычки: новый срок}.
+    """
+    due_dates = {
+        row['id']: advance_due_at(
+            row['time'], row['next_due_at'], row['periodicity'], after, get_zone(row['user__timezone'])
+        )
+        for row in rows
+    }
+    Habit.objects.bulk_update(
+        [Habit(id=habit_id, next_due_at=due_at) for habit_id, due_at in due_dates.items()],
+        ['next_due_at'],
+    )
+    return due_dates
+
+
+def reschedule_user_habits(user):
+    """
+    Пересчитывает сроки напоминаний всех привычек пользователя,
+    например после смены его часового пояса.
+    """
+    now = timezone.now()
+    tz = get_zone(user.timezone)
+    habits = list(Habit.objects.filter(user=user).only('id', 'time'))
+    for habit in habits:
+        habit.next_due_at = first_due_at(habit.time, now, tz)
+    Habit.objects.bulk_update(habits, ['next_due_at'], batch_size=settings.REMINDER_CHUNK_SIZE)
+
+    if wheel_enabled():
+        due_dates = {habit.id: habit.next_due_at for habit in habits}
+        transaction.on_commit(lambda: get_wheel().schedule_many(due_dates))
@@ -0,0 +1,30 @@
+from rest_framework.renderers import JSONRenderer
+
+try:
+    import orjson
+except ImportError:  # orjson ставится с зависимостями проекта; без него работает обычный JSONRenderer
+    orjson = None
+
+# Дата и время отдаются стандартному кодировщику DRF, чтобы формат совпадал байт в байт
+ORJSON_OPTIONS = orjson.OPT_PASSTHROUGH_DATETIME if orjson else 0
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    JSON-рендерер на orjson с тем же результатом, что и JSONRenderer DRF:
+    компактные разделители, символы не-ASCII без экранирования, \\u2028 и \\u2029 экранированы.
+    Если orjson не установлен, запрошен отступ (indent) или настройки DRF требуют
+    другого формата, используется обычный JSONRenderer.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if (orjson is None or data is None or self.ensure_ascii or not self.compact
+                or self.get_indent(accepted_media_type, renderer_context or {}) is not None):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        try:
+            ret = orjson.dumps(data, default=self.encoder_class().default, option=ORJSON_OPTIONS)
+        except TypeError:
+            # Типы, которые orjson не поддерживает (например, ленивые строки перевода в ключах)
+            return super().render(data, accepted_media_type, renderer_context)
+        return ret.replace('\u2028'.encode(), b'\\u2028').replace('\u2029'.encode(), b'\\u2029')
@@ -0,0 +1,148 @@
+import datetime
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from habits.models import Habit, HabitCompletion, HabitDailyRollup, RollupWatermark
+from habits.scheduling import get_zone
+from habits.sync import EPOCH
+
+# Название отметки обработки для дневных сводок
+ROLLUP_WATERMARK = 'habit-daily-rollups'
+
+# Сколько отметок читать из базы за раз и сколько ключей сводок сливать одним запросом
+ROLLUP_READ_CHUNK_SIZE = 5000
+ROLLUP_MERGE_CHUNK_SIZE = 1000
+
+
+def build_rollups(now=None):
+    """
+    Дополняет дневные сводки отметками, полученными после отметки обработки.
+    Верхняя граница сдвинута на HABIT_ROLLUP_SAFETY_LAG секунд назад, чтобы не пропустить
+    отметки транзакций, закоммиченных позже своего created_at. Отметка обработки блокируется
+    на время работы, поэтому параллельные запуски не учтут одни и те же отметки дважды.
+    Возвращает количество обработанных отметок.
+    """
+    upper = (now or timezone.now()) - datetime.timedelta(seconds=settings.HABIT_ROLLUP_SAFETY_LAG)
+    with transaction.atomic():
+        watermark, _ = RollupWatermark.objects.select_for_update().get_or_create(
+            name=ROLLUP_WATERMARK, defaults={'position': EPOCH},
+        )
+        if upper <= watermark.position:
+            return 0
+
+        completions = (
+            HabitCompletion.objects.filter(created_at__gt=watermark.position, created_at__lte=upper)
+            .values_list('habit_id', 'user_id', 'completed_at', 'user__timezone')
+        )
+        counts, owners, zones = Counter(), {}, {}
+        for habit_id, user_id, completed_at, tz_name in completions.iterator(chunk_size=ROLLUP_READ_CHUNK_SIZE):
+            if tz_name not in zones:
+                zones[tz_name] = get_zone(tz_name)
+            local = completed_at.astimezone(zones[tz_name])
+            counts[habit_id, local.date(), local.hour] += 1
+            owners[habit_id] = user_id
+
+        merge_rollups(counts, owners)
+        watermark.position = upper
+        watermark.save(update_fields=['position'])
+    return sum(counts.values())
+
+
+def merge_rollups(counts, owners):
+    """
+    Прибавляет счётчики {(привычка, день, час): количество} к сводкам: существующие строки
+    читаются и обновляются bulk_update, недостающие создаются bulk_create — по порциям ключей.
+    """
+    keys = list(counts)
+    for start in range(0, len(keys), ROLLUP_MERGE_CHUNK_SIZE):
+        chunk = keys[start:start + ROLLUP_MERGE_CHUNK_SIZE]
+        existing = {
+            (rollup.habit_id, rollup.day, rollup.hour): rollup
+            for rollup in HabitDailyRollup.objects.filter(
+                habit_id__in={habit_id for habit_id, _, _ in chunk},
+                day__in={day for _, day, _ in chunk},
+            )
+        }
+        created, changed = [], []
+        for key in chunk:
+            rollup = existing.get(key)
+            if rollup is None:
+                habit_id, day, hour = key
+                created.append(HabitDailyRollup(
+                    user_id=owners[habit_id], habit_id=habit_id, day=day, hour=hour, completions=counts[key],
+                ))
+            else:
+                rollup.completions += counts[key]
+                changed.append(rollup)
+        HabitDailyRollup.objects.bulk_create(created)
+        HabitDailyRollup.objects.bulk_update(changed, ['completions'])
+
+
+def rollup_position():
+    """До какого момента отметки учтены в сводках (None, если сводки ещё не строились)."""
+    return RollupWatermark.objects.filter(name=ROLLUP_WATERMARK).values_list('position', flat=True).first()
+
+
+def habit_stats(user, start, end):
+    """
+    Статистика выполнения привычек пользователя за дни с start по end включительно.
+    Читает только сводки за период: по привычкам и дням недели — доля выполненных сроков
+    (ожидается выполнение раз в periodicity дней), по часам — количество и доля отметок.
+    """
+    days = (end - start).days + 1
+    habits = list(Habit.objects.filter(user=user).order_by('id').values('id', 'action', 'periodicity'))
+    rollups = HabitDailyRollup.objects.filter(user=user, day__range=(start, end)).values_list(
+        'habit_id', 'day', 'hour', 'completions',
+    )
+
+    completed_days = defaultdict(set)
+    by_hour = [0] * 24
+    for habit_id, day, hour, completions in rollups:
+        completed_days[habit_id].add(day)
+        by_hour[hour] += completions
+
+    weekday_days = Counter((start + datetime.timedelta(days=offset)).weekday() for offset in range(days))
+    weekday_completed = Counter()
+    for habit_days in completed_days.values():
+        weekday_completed.update(day.weekday() for day in habit_days)
+    # Сколько сроков приходится на один день: у ежедневной привычки 1, у привычки раз в 3 дня — 1/3
+    due_per_day = sum(1 / habit['periodicity'] for habit in habits)
+    total_completions = sum(by_hour)
+
+    return {
+        'start': start,
+        'end': end,
+        'days': days,
+        'by_habit': [
+            stats_item(
+                {'habit': habit['id'], 'action': habit['action']},
+                len(completed_days[habit['id']]), days / habit['periodicity'],
+            )
+            for habit in habits
+        ],
+        'by_weekday': [
+            stats_item({'weekday': weekday}, weekday_completed[weekday], weekday_days[weekday] * due_per_day)
+            for weekday in range(7)
+        ],
+        'by_hour': [
+            {
+                'hour': hour,
+                'completions': completions,
+                'share': round(completions / total_completions, 4) if total_completions else 0.0,
+            }
+            for hour, completions in enumerate(by_hour)
+        ],
+    }
+
+
+def stats_item(item, completed, expected):
+    """Строка статистики: выполнено дней, ожидалось сроков и доля выполнения (не больше 1)."""
+    return {
+        **item,
+        'completed_days': completed,
+        'expected_days': round(expected, 2),
+        'completion_rate': round(min(completed / expected, 1.0), 4) if expected else 0.0,
+    }
@@ -0,0 +1,61 @@
+import datetime
+import functools
+import zoneinfo
+
+from django.utils import timezone
+
+
+@functools.lru_cache(maxsize=None)
+def get_zone(name):
+    """Возвращает часовой пояс по имени IANA (с кэшированием)."""
+    return zoneinfo.ZoneInfo(name)
+
+
+def reminder_window_end(now):
+    """
+    Конец текущего окна рассылки: начало следующего часа.
+    Напоминания рассылаются по всем привычкам со сроком раньше этой границы.
+    """
+    return now.replace(minute=0, second=0, microsecond=0) + datetime.timedelta(hours=1)
+
+
+def minute_window_end(now):
+    """
+    Конец текущей минуты — граница окна для поминутного планировщика в Redis.
+    """
+    return now.replace(second=0, microsecond=0) + datetime.timedelta(minutes=1)
+
+
+def first_due_at(habit_time, now, tz=None):
+    """
+    Ближайший момент не раньше now, когда наступает время привычки habit_time
+    (время понимается в часовом поясе tz, по умолчанию — в поясе проекта).
+    Результат — момент в абсолютном времени, поэтому после перевода в UTC
+    сроки привычек пользователей из разных поясов лежат в одном индексе.
+    """
+    tz = tz or timezone.get_current_timezone()
+    day = now.astimezone(tz).date()
+    due_at = datetime.datetime.combine(day, habit_time, tzinfo=tz)
+    if due_at < now:
+        due_at = datetime.datetime.combine(day + datetime.timedelta(days=1), habit_time, tzinfo=tz)
+    return due_at
+
+
+def advance_due_at(habit_time, due_at, periodicity, after, tz=None):
+    """
+    Следующий срок привычки после due_at с шагом periodicity дней, строго позже after.
+    Если рассылка долго не работала, пропущенные сроки не накапливаются.
+    Шаг отсчитывается по календарным дням пояса tz, поэтому при переходе
+    на летнее/зимнее время напоминание остаётся в то же местное время.
+    """
+    tz = tz or timezone.get_current_timezone()
+    day = due_at.astimezone(tz).date()
+    missed_days = (after.astimezone(tz).date() - day).days
+    if missed_days > 0:
+        day += datetime.timedelta(days=missed_days // periodicity * periodicity)
+
+    next_due_at = datetime.datetime.combine(day, habit_time, tzinfo=tz)
+    while next_due_at <= after or next_due_at <= due_at:
+        day += datetime.timedelta(days=periodicity)
+        next_due_at = datetime.datetime.combine(day, habit_time, tzinfo=tz)
+    return next_due_at
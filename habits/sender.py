@@ -0,0 +1,163 @@
+import asyncio
+import datetime
+from collections import namedtuple
+
+import telegram
+from django.conf import settings
+from telegram.constants import ParseMode
+from telegram.request import HTTPXRequest
+
+# Результат отправки одного сообщения: error равен None, если сообщение доставлено
+SendResult = namedtuple('SendResult', ('chat_id', 'ok', 'error'))
+
+
+def is_chat_unavailable(error):
+    """
+    True, если чат недоступен насовсем: бот заблокирован, пользователь удалён
+    или чат не найден. Повторять отправку в такой чат бессмысленно.
+    """
+    if isinstance(error, telegram.error.Forbidden):
+        return True
+    return isinstance(error, telegram.error.BadRequest) and 'chat not found' in str(error).lower()
+
+
+def is_transient(error):
+    """
+    True, если ошибка временная и отправку стоит повторить позже:
+    сбой сети, таймаут или исчерпанные повторы после 429.
+    BadRequest в python-telegram-bot наследует NetworkError, но повторять его нет смысла.
+    """
+    if isinstance(error, telegram.error.BadRequest):
+        return False
+    return isinstance(error, (telegram.error.NetworkError, telegram.error.RetryAfter))
+
+
+class TokenBucket:
+    """
+    Ведро токенов для ограничения частоты запросов.
+    Пополняется со скоростью rate токенов в секунду, вмещает не больше capacity.
+    Предназначено для использования внутри одного event loop.
+    """
+
+    def __init__(self, rate, capacity=1):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = None
+
+    async def acquire(self):
+        """Ждёт, пока в ведре появится токен, и забирает его."""
+        loop = asyncio.get_running_loop()
+        while True:
+            now = loop.time()
+            if self.updated_at is not None:
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+            self.updated_at = now
+
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class TelegramSender:
+    """
+    Синхронная обёртка над асинхронным telegram.Bot.
+    Держит один event loop и пул HTTP-соединений на всю рассылку,
+    поэтому её удобно использовать из Celery-задач и ORM-кода.
+
+    Внутри пачки до max_in_flight сообщений отправляются одновременно.
+    Частота ограничивается общим ведром токенов (global_rate сообщений в секунду)
+    и отдельным ведром на каждый чат (per_chat_rate). Ответ 429 "retry after"
+    приостанавливает всю отправку на указанное Telegram время.
+
+    Использование:
+        with TelegramSender() as sender:
+            results = sender.send_batch([(chat_id, text), ...])
+    """
+
+    def __init__(self, token=None, base_url=None, max_in_flight=None, global_rate=None,
+                 per_chat_rate=None, max_retries=None):
+        self.max_in_flight = max_in_flight or settings.TELEGRAM_MAX_IN_FLIGHT
+        self.global_rate = global_rate or settings.TELEGRAM_GLOBAL_RATE
+        self.per_chat_rate = per_chat_rate or settings.TELEGRAM_PER_CHAT_RATE
+        self.max_retries = settings.TELEGRAM_MAX_RETRIES if max_retries is None else max_retries
+
+        bot_kwargs = {
+            'token': token or settings.TELEGRAM_BOT_TOKEN,
+            # Одно соединение на каждую одновременную отправку; соединения переиспользуются
+            'request': HTTPXRequest(connection_pool_size=self.max_in_flight, pool_timeout=None),
+        }
+        if base_url:
+            bot_kwargs['base_url'] = base_url
+        self.bot = telegram.Bot(**bot_kwargs)
+        self._loop = None
+
+    def __enter__(self):
+        self._loop = asyncio.new_event_loop()
+        self._loop.run_until_complete(self._start())
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        try:
+            self._loop.run_until_complete(self.bot.shutdown())
+        finally:
+            self._loop.close()
+            self._loop = None
+
+    async def _start(self):
+        # Примитивы asyncio создаются внутри loop, в котором будут использоваться
+        self._in_flight = asyncio.Semaphore(self.max_in_flight)
+        self._global_bucket = TokenBucket(self.global_rate, capacity=self.global_rate)
+        self._chat_buckets = {}
+        self._resume_at = 0
+        await self.bot.initialize()
+
+    def send_batch(self, messages):
+        """
+        Отправляет пачку сообщений [(chat_id, text), ...].
+        Возвращает список SendResult в том же порядке.
+        """
+        return self._loop.run_until_complete(self._send_batch(messages))
+
+    async def _send_batch(self, messages):
+        results = await asyncio.gather(*(self._send_one(chat_id, text) for chat_id, text in messages))
+        # Ведро чата, в который давно не писали, уже полное — хранить его незачем
+        now = self._loop.time()
+        self._chat_buckets = {
+            chat_id: bucket for chat_id, bucket in self._chat_buckets.items()
+            if (now - bucket.updated_at) * self.per_chat_rate < 1
+        }
+        return results
+
+    async def _send_one(self, chat_id, text):
+        chat_bucket = self._chat_buckets.setdefault(chat_id, TokenBucket(self.per_chat_rate))
+        attempt = 0
+        while True:
+            await chat_bucket.acquire()
+            async with self._in_flight:
+                await self._wait_for_flood_control()
+                await self._global_bucket.acquire()
+                try:
+                    await self.bot.send_message(chat_id=chat_id, text=text, parse_mode=ParseMode.MARKDOWN)
+                    return SendResult(chat_id, True, None)
+                except telegram.error.RetryAfter as e:
+                    attempt += 1
+                    self._pause(e.retry_after)
+                    if attempt > self.max_retries:
+                        print(f"Ошибка отправки сообщения в чат {chat_id}: {e}")
+                        return SendResult(chat_id, False, e)
+                except telegram.error.TelegramError as e:
+                    print(f"Ошибка отправки сообщения в чат {chat_id}: {e}")
+                    return SendResult(chat_id, False, e)
+
+    def _pause(self, retry_after):
+        """Приостанавливает все отправки на время, указанное Telegram в ответе 429."""
+        if isinstance(retry_after, datetime.timedelta):
+            retry_after = retry_after.total_seconds()
+        self._resume_at = max(self._resume_at, self._loop.time() + retry_after)
+
+    async def _wait_for_flood_control(self):
+        delay = self._resume_at - self._loop.time()
+        if delay > 0:
+            await asyncio.sleep(delay)
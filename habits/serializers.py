@@ -1,5 +1,8 @@
+from django.db.models import Q
+from django.utils import timezone
 from rest_framework import serializers
 from habits.models import Habit
+from habits.scheduling import first_due_at, get_zone
 from habits.validators import (
     validate_time_to_complete,
     validate_periodicity,
@@ -7,6 +10,41 @@ from habits.validators import (
 )
 
 
+class RelatedHabitField(serializers.PrimaryKeyRelatedField):
+    """
+    Связанная привычка по id. Пользователь может ссылаться только на свои и на публичные привычки;
+    без запроса в контексте (импорт администратором) ограничения нет.
+    В массовых операциях все связанные привычки загружаются заранее одним запросом
+    и передаются в контексте (context['related_habits'] — словарь {id: привычка}),
+    чтобы не делать запрос на каждый элемент.
+    """
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        request = self.context.get('request')
+        if request is None:
+            return queryset
+        return queryset.filter(Q(user_id=request.user.pk) | Q(is_public=True))
+
+    def is_available(self, habit):
+        request = self.context.get('request')
+        return request is None or habit.user_id == request.user.pk or habit.is_public
+
+    def to_internal_value(self, data):
+        related_habits = self.context.get('related_habits')
+        if related_habits is None:
+            return super().to_internal_value(data)
+        if isinstance(data, bool):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        try:
+            habit = related_habits.get(int(data))
+        except (TypeError, ValueError):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        if habit is None or not self.is_available(habit):
+            self.fail('does_not_exist', pk_value=data)
+        return habit
+
+
 class HabitSerializer(serializers.ModelSerializer):
     """
     Сериализатор для модели Habit, включающий все сложные валидаторы.
@@ -19,7 +57,7 @@ class HabitSerializer(serializers.ModelSerializer):
     periodicity = serializers.IntegerField(validators=[validate_periodicity])
 
     # 3. Делаем поля reward и related_habit необязательными на уровне сериализатора
-    related_habit = serializers.PrimaryKeyRelatedField(
+    related_habit = RelatedHabitField(
         queryset=Habit.objects.all(),
         required=False,
         allow_null=True
@@ -32,7 +70,16 @@ class HabitSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Habit
-        fields = '__all__'
+        # next_due_at — служебное поле планировщика, вычисляется при сохранении;
+        # серии выполнений отдаются отдельно (streak), потому что текущая серия зависит от даты чтения
+        exclude = ('next_due_at', 'updated_at', 'current_streak', 'longest_streak', 'last_completed_at')
+
+    def __init__(self, *args, fields=None, **kwargs):
+        """fields — разреженный набор полей вывода (?fields=); остальные поля убираются."""
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
 
     def validate(self, data):
         """
@@ -79,3 +126,83 @@ class HabitSerializer(serializers.ModelSerializer):
         validate_related_habit_is_pleasant(related_habit)
 
         return data
+
+    def create(self, validated_data):
+        """
+        Назначает новой привычке ближайший срок напоминания (в часовом поясе пользователя).
+        """
+        validated_data['next_due_at'] = first_due_at(
+            validated_data['time'], timezone.now(), get_zone(validated_data['user'].timezone)
+        )
+        return super().create(validated_data)
+
+    def update(self, instance, validated_data):
+        """
+        Пересчитывает срок напоминания, если изменилось время или периодичность.
+        """
+        if 'time' in validated_data or 'periodicity' in validated_data:
+            validated_data['next_due_at'] = first_due_at(
+                validated_data.get('time', instance.time), timezone.now(), get_zone(instance.user.timezone)
+            )
+        return super().update(instance, validated_data)
+
+
+class HabitReadSerializer:
+    """
+    Лёгкий сериализатор списков привычек только для чтения.
+    Строки берутся из .values() и преобразуются в тот же вид, что даёт
+    HabitSerializer (те же поля в том же порядке), но без создания объектов
+    модели и полей DRF для каждой строки.
+    """
+
+    # Преобразование значений столбцов в представление DRF (остальные отдаются как есть)
+    converters = {
+        'time': lambda value: value.isoformat() if value is not None else None,
+    }
+
+    # Столбцы, которые читаются всегда: по ним строится курсор пагинации
+    required_columns = ('id', 'time')
+
+    # Поля-ссылки, которые можно развернуть во вложенный объект (?expand=)
+    expandable = ('related_habit',)
+
+    def __init__(self, fields=None, expand=(), viewer=None):
+        """
+        fields — разреженный набор полей вывода (?fields=), по умолчанию все поля HabitSerializer;
+        expand — поля-ссылки, которые выводятся вложенным объектом со всеми полями вместо id;
+        viewer — id пользователя, чьи непубличные привычки можно разворачивать. Остальные
+        связанные привычки разворачиваются, только если они публичные, иначе остаются id.
+        """
+        self.all_fields = tuple(
+            name for name, field in HabitSerializer().fields.items() if not field.write_only
+        )
+        self.fields = tuple(name for name in self.all_fields if fields is None or name in fields)
+        self.expand = tuple(name for name in self.expandable if name in expand and name in self.fields)
+        self.viewer = viewer
+
+    @property
+    def columns(self):
+        """
+        Столбцы для .values(): ключи совпадают с именами полей вывода (related_habit — это id).
+        Поля развёрнутых ссылок читаются тем же запросом через JOIN (related_habit__action и т. д.).
+        """
+        expanded = [f'{name}__{field}' for name in self.expand for field in (*self.all_fields, 'user')]
+        return tuple(dict.fromkeys((*self.fields, *self.required_columns, *expanded)))
+
+    def to_representation(self, rows):
+        """Преобразует строки .values() в список словарей ответа."""
+        plan = [(name, self.converters.get(name)) for name in self.fields]
+        nested_plan = [(field, self.converters.get(field)) for field in self.all_fields]
+        result = []
+        for row in rows:
+            item = {name: convert(row[name]) if convert else row[name] for name, convert in plan}
+            for name in self.expand:
+                if item[name] is not None and (
+                    row[f'{name}__is_public'] or (self.viewer is not None and row[f'{name}__user'] == self.viewer)
+                ):
+                    item[name] = {
+                        field: convert(row[f'{name}__{field}']) if convert else row[f'{name}__{field}']
+                        for field, convert in nested_plan
+                    }
+            result.append(item)
+        return result
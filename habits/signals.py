@@ -0,0 +1,114 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from habits.deletion import HabitDeletion
+from habits.feed_cache import bump_feed_version
+from habits.message_cache import get_body_cache
+from habits.models import Habit, HabitTombstone
+from habits.reminders import reschedule_user_habits
+from habits.timing_wheel import get_wheel, wheel_enabled
+
+
+@receiver(post_save, sender=Habit)
+def schedule_habit_reminder(sender, instance, **kwargs):
+    """
+    Синхронизирует расписание в Redis после сохранения привычки.
+    Запись выполняется после коммита, чтобы не запланировать откатившиеся изменения.
+    """
+    if wheel_enabled() and instance.next_due_at is not None:
+        habit_id, due_at = instance.id, instance.next_due_at
+        transaction.on_commit(lambda: get_wheel().schedule(habit_id, due_at))
+
+
+@receiver(post_delete, sender=Habit)
+def unschedule_habit_reminder(sender, instance, **kwargs):
+    """
+    Удаляет привычку из расписания в Redis после её удаления.
+    """
+    if wheel_enabled():
+        habit_id = instance.id
+        transaction.on_commit(lambda: get_wheel().unschedule(habit_id))
+
+
+@receiver(post_save, sender=Habit)
+def invalidate_reminder_body(sender, instance, created=False, **kwargs):
+    """
+    Удаляет из кэша тексты напоминаний привычки и привычек, которые ссылаются
+    на неё как на связанную (их текст содержит её действие). Ссылающиеся привычки
+    ищутся, только если действие могло измениться. При удалении то же делает finish_habit_deletion.
+    """
+    habit_ids = [instance.id]
+    if not created and instance.stored_value('action') != instance.action:
+        habit_ids += Habit.objects.filter(related_habit_id=instance.id).values_list('id', flat=True)
+    transaction.on_commit(lambda: get_body_cache().invalidate(habit_ids))
+
+
+@receiver(pre_save, sender=Habit)
+def remember_public_state(sender, instance, **kwargs):
+    """
+    Запоминает, была ли привычка публичной до сохранения, по значению, прочитанному
+    вместе с привычкой (Habit.from_db). Если оно неизвестно, привычка считается публичной:
+    лишняя смена версии ленты дешевле устаревшей ленты.
+    """
+    instance._was_public = instance.pk is not None and instance.stored_value('is_public', True)
+
+
+@receiver(post_save, sender=Habit)
+def invalidate_public_feed_on_save(sender, instance, **kwargs):
+    """
+    Меняет версию ленты публичных привычек, если сохранённая привычка публична сейчас или была публичной.
+    """
+    if instance.is_public or getattr(instance, '_was_public', False):
+        transaction.on_commit(bump_feed_version)
+
+
+@receiver(pre_delete, sender=Habit)
+def collect_deleted_habit(sender, instance, origin=None, **kwargs):
+    """
+    Запоминает удаляемую привычку в данных удаления (habits.deletion.HabitDeletion).
+    """
+    HabitDeletion.of(instance if origin is None else origin).add(instance)
+
+
+@receiver(post_delete, sender=Habit)
+def finish_habit_deletion(sender, instance, origin=None, **kwargs):
+    """
+    После удаления последней привычки делает общую работу одним действием на всё удаление:
+    отметки об удалении для синхронизации (при удалении самого пользователя они не нужны),
+    кэш текстов напоминаний удалённых и ссылавшихся на них привычек и версия ленты,
+    если удалена публичная привычка или привычка, связанная с публичными.
+    """
+    deletion = HabitDeletion.finish(instance if origin is None else origin)
+    if deletion is None:
+        return
+    if isinstance(origin, Habit) or getattr(origin, 'model', None) is Habit:
+        HabitTombstone.objects.bulk_create([
+            HabitTombstone(user_id=user_id, habit_id=habit_id) for habit_id, (user_id, _) in deletion.habits.items()
+        ])
+    habit_ids = [*deletion.habits, *deletion.referencing]
+    transaction.on_commit(lambda: get_body_cache().invalidate(habit_ids))
+    if deletion.touches_public:
+        transaction.on_commit(bump_feed_version)
+
+
+@receiver(pre_save, sender=settings.AUTH_USER_MODEL)
+def remember_timezone_change(sender, instance, update_fields=None, **kwargs):
+    """
+    Запоминает, изменился ли часовой пояс пользователя при сохранении.
+    """
+    if instance.pk is None or (update_fields is not None and 'timezone' not in update_fields):
+        return
+    old_timezone = sender.objects.filter(pk=instance.pk).values_list('timezone', flat=True).first()
+    instance._timezone_changed = old_timezone is not None and old_timezone != instance.timezone
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def reschedule_after_timezone_change(sender, instance, **kwargs):
+    """
+    После смены часового пояса пересчитывает сроки напоминаний привычек пользователя.
+    """
+    if getattr(instance, '_timezone_changed', False):
+        instance._timezone_changed = False
+        reschedule_user_habits(instance)
@@ -0,0 +1,99 @@
+from habits.models import Habit, HabitCompletion
+from habits.scheduling import get_zone
+
+# Поля привычки, в которых хранится состояние серии
+STREAK_FIELDS = ('current_streak', 'longest_streak', 'last_completed_at')
+
+# Сколько отметок читать из базы за раз при пересчёте серий по истории
+REBUILD_CHUNK_SIZE = 5000
+
+
+def local_day(moment, tz):
+    return moment.astimezone(tz).date()
+
+
+def apply_completion(habit, completed_at, tz):
+    """
+    Шаг серии: учитывает в полях привычки одну отметку, не более раннюю, чем уже учтённые.
+    Дни считаются по календарю пояса пользователя tz. Отметка в тот же день, что и последняя,
+    серию не меняет; отметка не позже чем через periodicity дней продолжает серию, позже — начинает новую.
+    Используется и при приёме отметок, и при пересчёте по истории, поэтому результаты совпадают.
+    Возвращает False, если отметка раньше последней учтённой: тогда серию нужно пересчитать по истории.
+    """
+    if habit.last_completed_at is not None:
+        last_day, day = local_day(habit.last_completed_at, tz), local_day(completed_at, tz)
+        if day < last_day:
+            return False
+        if day == last_day:
+            habit.last_completed_at = max(habit.last_completed_at, completed_at)
+            return True
+        habit.current_streak = habit.current_streak + 1 if (day - last_day).days <= habit.periodicity else 1
+    else:
+        habit.current_streak = 1
+    habit.longest_streak = max(habit.longest_streak, habit.current_streak)
+    habit.last_completed_at = completed_at
+    return True
+
+
+def rebuild_streaks(habits, tz=None):
+    """
+    Пересчитывает серии привычек (словарь {id: привычка}) по всей истории отметок одним запросом.
+    tz — пояс для всех привычек; если не задан, берётся пояс владельца каждой привычки (habit.user).
+    """
+    zones = {}
+    for habit in habits.values():
+        habit.current_streak, habit.longest_streak, habit.last_completed_at = 0, 0, None
+        zones[habit.id] = tz or get_zone(habit.user.timezone)
+
+    completions = (
+        HabitCompletion.objects.filter(habit_id__in=list(habits))
+        .order_by('habit_id', 'completed_at')
+        .values_list('habit_id', 'completed_at')
+    )
+    for habit_id, completed_at in completions.iterator(chunk_size=REBUILD_CHUNK_SIZE):
+        apply_completion(habits[habit_id], completed_at, zones[habit_id])
+
+
+def update_streaks(habits, completions, tz):
+    """
+    Обновляет серии привычек пользователя (словарь {id: привычка}) по новым отметкам без чтения истории.
+    Привычки, для которых пришла отметка раньше уже учтённых (офлайн-выгрузка задним числом),
+    пересчитываются по истории — поэтому отметки должны быть записаны до вызова.
+    Сохраняет затронутые привычки одним bulk_update и возвращает их.
+    """
+    touched, stale = {}, {}
+    for completion in sorted(completions, key=lambda completion: completion.completed_at):
+        habit = habits[completion.habit_id]
+        if habit.id in stale:
+            continue
+        if apply_completion(habit, completion.completed_at, tz):
+            touched[habit.id] = habit
+        else:
+            stale[habit.id] = habit
+            touched.pop(habit.id, None)
+    if stale:
+        rebuild_streaks(stale, tz)
+    touched.update(stale)
+    Habit.objects.bulk_update(touched.values(), STREAK_FIELDS)
+    return list(touched.values())
+
+
+def current_streak(habit, now, tz):
+    """
+    Текущая серия на момент now: сохранённое значение, если с последней отметки прошло
+    не больше periodicity дней, иначе серия прервана. Время не зависит от длины истории.
+    """
+    if habit.last_completed_at is None:
+        return 0
+    if (local_day(now, tz) - local_day(habit.last_completed_at, tz)).days > habit.periodicity:
+        return 0
+    return habit.current_streak
+
+
+def streak_data(habit, now, tz):
+    return {
+        'habit': habit.id,
+        'current_streak': current_streak(habit, now, tz),
+        'longest_streak': habit.longest_streak,
+        'last_completed_at': habit.last_completed_at,
+    }
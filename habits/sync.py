@@ -0,0 +1,65 @@
+import datetime
+
+from django.conf import settings
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+
+EPOCH = datetime.datetime(1970, 1, 1, tzinfo=datetime.timezone.utc)
+
+
+def make_sync_token(moment):
+    """Токен синхронизации: момент в микросекундах от начала эпохи."""
+    return str((moment - EPOCH) // datetime.timedelta(microseconds=1))
+
+
+def parse_sync_token(token):
+    """
+    Разбирает токен синхронизации в момент времени.
+    Токен 0 означает полную выгрузку.
+    """
+    try:
+        microseconds = int(token)
+        if microseconds < 0:
+            raise ValueError
+        return EPOCH + datetime.timedelta(microseconds=microseconds)
+    except (ValueError, OverflowError):
+        raise ValidationError({'since': 'Неверный токен синхронизации.'})
+
+
+def make_page_token(since, updated_at, habit_id):
+    """
+    Токен продолжения выгрузки изменений: исходный момент since и позиция (updated_at, id)
+    последней выданной привычки. Передаётся в since вместо токена синхронизации.
+    """
+    return f'{make_sync_token(since)}.{make_sync_token(updated_at)}.{habit_id}'
+
+
+def parse_page_token(token):
+    """
+    Разбирает токен синхронизации или токен продолжения (make_page_token).
+    Возвращает момент since и позицию (updated_at, id), после которой продолжается выгрузка;
+    для первой страницы позиция — None.
+    """
+    since, _, position = token.partition('.')
+    if not position:
+        return parse_sync_token(since), None
+    updated_at, _, habit_id = position.partition('.')
+    try:
+        habit_id = int(habit_id)
+    except ValueError:
+        raise ValidationError({'since': 'Неверный токен синхронизации.'})
+    return parse_sync_token(since), (parse_sync_token(updated_at), habit_id)
+
+
+def next_sync_token():
+    """
+    Токен для следующей синхронизации. Берётся с запасом HABIT_SYNC_SAFETY_LAG в прошлое:
+    updated_at ставится при сохранении, а видимой запись становится при коммите,
+    поэтому последние секунды лучше отдать повторно, чем пропустить.
+    """
+    return make_sync_token(timezone.now() - datetime.timedelta(seconds=settings.HABIT_SYNC_SAFETY_LAG))
+
+
+def is_expired(since):
+    """True, если отметки об удалениях после since уже могли быть удалены."""
+    return since != EPOCH and since < timezone.now() - datetime.timedelta(days=settings.HABIT_SYNC_TOMBSTONE_DAYS)
@@ -0,0 +1,93 @@
+import datetime
+
+# Генератор правдоподобных синтетических привычек для нагрузочных тестов и замеров.
+# Распределения подобраны так, чтобы воспроизводить типичную картину:
+# большинство привычек приходится на утро и вечер, большинство — ежедневные.
+
+# Популярное время привычек (часы, минуты)
+POPULAR_TIMES = (
+    (6, 30), (7, 0), (7, 30), (8, 0), (9, 0),
+    (12, 30), (13, 0),
+    (18, 0), (19, 0), (20, 0), (21, 0), (22, 0),
+)
+# Доля привычек, назначенных на популярное время
+POPULAR_TIME_SHARE = 0.7
+
+# Количество привычек у пользователя и его вес
+HABITS_PER_USER_WEIGHTS = {1: 25, 2: 20, 3: 16, 4: 12, 5: 9, 6: 6, 7: 4, 8: 3, 10: 3, 12: 2}
+
+# Периодичность (дни) и её вес
+PERIODICITY_WEIGHTS = {1: 60, 2: 12, 3: 10, 4: 3, 5: 4, 6: 1, 7: 10}
+
+# Доля приятных привычек и доля полезных, вознаграждаемых приятной привычкой
+PLEASANT_SHARE = 0.2
+RELATED_SHARE = 0.5
+
+USEFUL_ACTIONS = (
+    'сделать зарядку', 'выпить стакан воды', 'пройти 10 000 шагов', 'прочитать 10 страниц',
+    'помедитировать', 'выучить 5 новых слов', 'сделать планку', 'разобрать почту',
+    'позаниматься английским', 'сделать растяжку', 'записать расходы', 'полить цветы',
+)
+PLEASANT_ACTIONS = (
+    'выпить кофе', 'послушать музыку', 'посмотреть серию сериала', 'съесть десерт',
+    'поиграть в игру', 'принять ванну', 'погулять в парке',
+)
+# Часовые пояса пользователей и их вес
+TIMEZONE_WEIGHTS = {
+    'Europe/Moscow': 50, 'Asia/Yekaterinburg': 10, 'Asia/Novosibirsk': 7, 'Europe/Samara': 5,
+    'Asia/Vladivostok': 3, 'Europe/Kaliningrad': 3, 'Europe/Berlin': 7, 'America/New_York': 5, 'UTC': 10,
+}
+# Доля пользователей, подключивших Telegram
+TELEGRAM_SHARE = 0.8
+
+PLACES = ('дома', 'в парке', 'в офисе', 'на кухне', 'в спортзале', 'в транспорте', 'на балконе')
+REWARDS = ('чашка чая', 'шоколадка', 'похвала себе', '15 минут отдыха', 'любимая песня')
+
+
+def weighted_choice(rng, weights):
+    """Выбирает ключ словаря weights пропорционально его весу."""
+    return rng.choices(tuple(weights), weights=tuple(weights.values()))[0]
+
+
+def random_habit_time(rng):
+    """Время привычки: чаще популярное (со смещением до получаса), иначе любое, кратное 5 минутам."""
+    if rng.random() < POPULAR_TIME_SHARE:
+        hour, minute = rng.choice(POPULAR_TIMES)
+        minute_of_day = (hour * 60 + minute + rng.choice((0, 0, 0, 15, -15, 30))) % (24 * 60)
+    else:
+        minute_of_day = rng.randrange(0, 24 * 60, 5)
+    return datetime.time(minute_of_day // 60, minute_of_day % 60)
+
+
+def generate_user_habits(rng, habits_count=None, public_ratio=0.1):
+    """
+    Генерирует привычки одного пользователя в виде словарей полей модели Habit.
+    Приятные привычки идут первыми; полезная привычка либо ссылается на одну из них
+    через related_index (индекс в возвращаемом списке), либо имеет вознаграждение.
+    Все привычки удовлетворяют правилам валидации HabitSerializer.
+    """
+    if habits_count is None:
+        habits_count = weighted_choice(rng, HABITS_PER_USER_WEIGHTS)
+    pleasant_count = sum(rng.random() < PLEASANT_SHARE for _ in range(habits_count))
+
+    habits = []
+    for index in range(habits_count):
+        is_pleasant = index < pleasant_count
+        habit = {
+            'place': rng.choice(PLACES),
+            'time': random_habit_time(rng),
+            'action': rng.choice(PLEASANT_ACTIONS if is_pleasant else USEFUL_ACTIONS),
+            'is_pleasant': is_pleasant,
+            'reward': None,
+            'related_index': None,
+            'periodicity': weighted_choice(rng, PERIODICITY_WEIGHTS),
+            'time_to_complete': rng.randrange(10, 121, 10),
+            'is_public': rng.random() < public_ratio,
+        }
+        if not is_pleasant:
+            if pleasant_count and rng.random() < RELATED_SHARE:
+                habit['related_index'] = rng.randrange(pleasant_count)
+            else:
+                habit['reward'] = rng.choice(REWARDS)
+        habits.append(habit)
+    return habits
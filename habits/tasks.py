@@ -1,11 +1,19 @@
 import datetime
-from celery import shared_task
+from celery import chord, shared_task
 from django.conf import settings
-from habits.models import Habit
-import telegram
-
-# Инициализируем бота
-bot = telegram.Bot(token=settings.TELEGRAM_BOT_TOKEN)
+from django.utils import timezone
+from habits import partitions, rollups
+from habits.models import Habit, HabitTombstone, ReminderDeadLetter
+from habits.reminders import (
+    plan_partitions,
+    replay_dead_letters,
+    retry_delay,
+    retry_delivery,
+    send_due_reminders,
+    send_wheel_reminders,
+)
+from habits.sender import TelegramSender
+from habits.timing_wheel import get_wheel
 
 
 @shared_task
@@ -13,45 +21,144 @@ def send_habit_reminders():
     """
     Отложенная задача Celery для отправки напоминаний о привычках.
     Задача должна запускаться периодически (например, раз в час или минуту).
+
+    Задача-координатор: делит привычки текущего окна на диапазоны id пользователей
+    и запускает по подзадаче send_reminders_partition на каждый диапазон (chord).
+    Итоговые счётчики собирает collect_reminder_reports.
+    """
+    # Определяем текущее время. Все подзадачи работают с одним и тем же окном.
+    now = timezone.now()
+    partitions = plan_partitions(now)
+
+    if not partitions:
+        print(f"[{now.strftime('%H:%M')}] Напоминаний не найдено.")
+        return {'partitions': 0}
+
+    header = [
+        send_reminders_partition.s(now.isoformat(), start_user_id, end_user_id)
+        for start_user_id, end_user_id in partitions
+    ]
+    chord(header)(collect_reminder_reports.s(now.isoformat()))
+    return {'partitions': len(partitions)}
+
+
+@shared_task(bind=True)
+def send_reminders_partition(self, now, start_user_id, end_user_id):
+    """
+    Подзадача рассылки: отправляет напоминания по привычкам пользователей
+    с id в [start_user_id, end_user_id].
+    Id задачи служит меткой исполнителя в журнале доставки: при повторном запуске
+    задача продолжит отправку своих незавершённых напоминаний.
     """
-    # Определяем текущее время
-    now = datetime.datetime.now()
-    current_time = now.time().replace(minute=0, second=0, microsecond=0)
+    now = datetime.datetime.fromisoformat(now)
+    with TelegramSender() as sender:
+        return send_due_reminders(
+            now, sender, user_range=(start_user_id, end_user_id), claim=self.request.id
+        )
+
 
-    # Ищем привычки, которые должны быть выполнены в текущем часовом окне
-    habits_to_remind = Habit.objects.filter(
-        time__hour=now.hour,
-        user__telegram_id__isnull=False  # Напоминаем только тем, у кого есть ID
+@shared_task
+def collect_reminder_reports(reports, now):
+    """
+    Завершение chord: суммирует счётчики всех подзадач рассылки.
+    """
+    now = datetime.datetime.fromisoformat(now)
+    total = {
+        'partitions': len(reports),
+        'scanned': sum(report['scanned'] for report in reports),
+        'sent': sum(report['sent'] for report in reports),
+        'messages': sum(report['messages'] for report in reports),
+    }
+    print(
+        f"[{now.strftime('%H:%M')}] Рассылка завершена. "
+        f"Подзадач: {total['partitions']}, просмотрено {total['scanned']} привычек, "
+        f"отправлено {total['sent']} напоминаний в {total['messages']} сообщениях."
     )
+    return total
 
-    if not habits_to_remind.exists():
-        print(f"[{now.strftime('%H:%M')}] Напоминаний не найдено.")
-        return
-
-    for habit in habits_to_remind:
-        # Формируем сообщение
-        message = (
-            f"🔔 *Напоминание о привычке!* 🔔\n\n"
-            f"**Действие:** Я буду {habit.action}\n"
-            f"**Когда:** в {habit.time.strftime('%H:%M')}\n"
-            f"**Где:** в {habit.place}\n\n"
+
+@shared_task(bind=True)
+def tick_reminder_wheel(self):
+    """
+    Поминутный тик планировщика в Redis (REMINDER_SCHEDULER='redis').
+    Отправляет напоминания только по привычкам, срок которых наступает в текущую минуту.
+    """
+    now = timezone.now()
+    with TelegramSender() as sender:
+        report = send_wheel_reminders(now, get_wheel(), sender, claim=self.request.id)
+
+    if report['scanned']:
+        print(
+            f"[{now.strftime('%H:%M')}] Рассылка завершена. "
+            f"Просмотрено {report['scanned']} привычек, отправлено {report['sent']} напоминаний "
+            f"в {report['messages']} сообщениях."
         )
+    return report
 
-        if habit.reward:
-            message += f"**Вознаграждение:** {habit.reward}\n"
-        elif habit.related_habit:
-            message += f"**Связанная привычка:** {habit.related_habit.action}\n"
 
-        try:
-            # Отправляем сообщение в Telegram
-            bot.send_message(
-                chat_id=habit.user.telegram_id,
-                text=message,
-                parse_mode=telegram.ParseMode.MARKDOWN
-            )
-            print(f"Отправлено напоминание пользователю {habit.user.username} о привычке '{habit.action}'.")
+@shared_task
+def resync_reminder_wheel():
+    """
+    Пересобирает расписание в Redis по базе данных.
+    Восстанавливает привычки, выпавшие из расписания (например, если воркер упал
+    между выборкой из Redis и записью новых сроков), и убирает удалённые.
+    """
+    get_wheel().rebuild(Habit.objects.filter(next_due_at__isnull=False))
 
-        except telegram.error.TelegramError as e:
-            print(f"Ошибка отправки сообщения пользователю {habit.user.username}: {e}")
 
-    print(f"[{now.strftime('%H:%M')}] Рассылка завершена. Отправлено {habits_to_remind.count()} напоминаний.")
+@shared_task(bind=True, max_retries=settings.REMINDER_RETRY_LIMIT)
+def retry_reminder_delivery(self, delivery_id):
+    """
+    Повторная отправка напоминания после временной ошибки (сеть, таймаут, 429).
+    Вынесена из основной рассылки, чтобы сбойные чаты не задерживали остальные.
+    Задержка между попытками растёт экспоненциально со случайным разбросом;
+    после REMINDER_RETRY_LIMIT повторов напоминание попадает в очередь недоставленных.
+    """
+    with TelegramSender() as sender:
+        again = retry_delivery(
+            delivery_id, sender,
+            attempts=self.request.retries + 2,  # первая отправка и предыдущие повторы
+            final=self.request.retries >= self.max_retries,
+        )
+    if again:
+        raise self.retry(countdown=retry_delay(self.request.retries + 1))
+
+
+@shared_task
+def replay_reminder_dead_letters(dead_letter_ids):
+    """
+    Повторная отправка недоставленных напоминаний (например, по действию в админке).
+    """
+    with TelegramSender() as sender:
+        report = replay_dead_letters(ReminderDeadLetter.objects.filter(id__in=dead_letter_ids), sender)
+    print(f"Недоставленные напоминания: отправлено {report['replayed']}, не доставлено {report['failed']}.")
+    return report
+
+
+@shared_task
+def purge_habit_tombstones():
+    """
+    Удаляет отметки об удалённых привычках старше HABIT_SYNC_TOMBSTONE_DAYS дней.
+    Клиенты с более старым токеном синхронизации выполняют полную выгрузку.
+    """
+    border = timezone.now() - datetime.timedelta(days=settings.HABIT_SYNC_TOMBSTONE_DAYS)
+    deleted, _ = HabitTombstone.objects.filter(deleted_at__lt=border).delete()
+    return deleted
+
+
+@shared_task
+def create_completion_partitions():
+    """
+    Заранее создаёт месячные секции таблицы отметок о выполнении (PostgreSQL).
+    Возвращает имена созданных секций.
+    """
+    return partitions.create_completion_partitions()
+
+
+@shared_task
+def build_habit_rollups():
+    """
+    Дополняет дневные сводки отметками, полученными с прошлого запуска.
+    Возвращает количество обработанных отметок.
+    """
+    return rollups.build_rollups()
@@ -1,14 +1,80 @@
 # habits/tests.py
 from rest_framework.test import APITestCase
 from rest_framework import status
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
 from users.models import User
-from habits.models import Habit
-from datetime import time
+from habits.fake_telegram import FakeBotAPIServer
+from habits import analytics, capacity
+from habits.feed_cache import feed_cache_stats
+from habits.importer import copy_value, import_habits, read_rows
+from habits.renderers import FastJSONRenderer
+from habits.serializers import HabitSerializer
+from rest_framework.renderers import JSONRenderer
+from habits.message_cache import ReminderBodyCache
+from habits.models import (
+    Habit,
+    HabitCompletion,
+    HabitDailyRollup,
+    HabitTombstone,
+    ReminderDeadLetter,
+    ReminderDelivery,
+)
+from habits.partitions import create_completion_partitions, month_start, partition_name
+from habits.reminders import (
+    build_digest_message,
+    deliver,
+    get_due_habits,
+    get_due_queryset,
+    group_messages,
+    plan_partitions,
+    render_bodies,
+    replay_dead_letters,
+    retry_delay,
+    retry_delivery,
+    send_due_reminders,
+    send_wheel_reminders,
+    split_id_range,
+)
+from habits.scheduling import advance_due_at, first_due_at, get_zone
+from habits.sender import SendResult, TelegramSender, is_chat_unavailable, is_transient
+from habits.rollups import build_rollups
+from habits.streaks import current_streak
+from habits.sync import make_sync_token
+from habits.tasks import collect_reminder_reports, purge_habit_tombstones, send_habit_reminders
+from datetime import datetime, time, timedelta, timezone as dt_timezone
+from random import Random
+from time import monotonic
+from types import SimpleNamespace
+from unittest import skipUnless
+from unittest.mock import patch
+import csv
+import io
+import json
+import tempfile
+import telegram
 
 
 HABIT_LIST_URL = reverse('habits:my_habits-list')
 PUBLIC_HABIT_LIST_URL = reverse('habits:public_habits')
+HABIT_EXPORT_URL = reverse('habits:my_habits-export')
+ADMIN_HABIT_EXPORT_URL = reverse('habits:export_habits')
+ADMIN_HABIT_IMPORT_URL = reverse('habits:import_habits')
+CHECK_IN_URL = reverse('habits:my_habits-check-in')
+HABIT_STATS_URL = reverse('habits:habit_stats')
+
+
+def create_habit(user, **fields):
+    """Привычка пользователя; обязательные поля, которые не заданы в fields, получают простые значения."""
+    return Habit.objects.create(
+        **{'user': user, 'place': 'Дом', 'time': time(8, 0), 'action': 'Зарядка', 'time_to_complete': 60, **fields}
+    )
 
 
 class HabitTestCase(APITestCase):
@@ -18,6 +84,9 @@ class HabitTestCase(APITestCase):
 
     def setUp(self):
         """Настройка тестовых данных и пользователей."""
+        # Лента публичных привычек кэшируется; версия меняется только после коммита
+        cache.clear()
+
         # 1. Создание пользователей
         self.user = User.objects.create_user(
             username='testuser',
@@ -228,6 +297,31 @@ class HabitTestCase(APITestCase):
         self.assertIn('periodicity', response.data)
         self.assertIn("должна быть в диапазоне от 1 до 7 дней.", response.data['periodicity'][0])
 
+    def test_next_due_at_is_set_on_create_and_update(self):
+        """Срок напоминания назначается при создании и пересчитывается при смене времени."""
+        data = {
+            "place": "Кухня",
+            "time": "09:00:00",
+            "action": "Съесть яблоко",
+            "reward": "Похвала",
+            "periodicity": 3,
+            "time_to_complete": 50,
+        }
+        response = self.client.post(HABIT_LIST_URL, data, format='json')
+        self.assertNotIn('next_due_at', response.data)
+
+        habit = Habit.objects.get(pk=response.data['id'])
+        self.assertEqual(habit.next_due_at.time(), time(9, 0))
+        self.assertLessEqual(habit.next_due_at - timezone.now(), timedelta(days=1))
+
+        detail_url = reverse('habits:my_habits-detail', kwargs={'pk': habit.pk})
+        with CaptureQueriesContext(connection) as queries:
+            self.client.patch(detail_url, {'time': '21:30:00'}, format='json')
+        habit.refresh_from_db()
+        self.assertEqual(habit.next_due_at.time(), time(21, 30))
+        # Часовой пояс берётся у текущего пользователя, повторно он не читается
+        self.assertFalse([query for query in queries if 'FROM "users_user"' in query['sql']])
+
     # ------------------ ТЕСТЫ ПРАВ ДОСТУПА И СПИСКОВ ------------------
 
     def test_list_my_habits(self):
@@ -250,6 +344,34 @@ class HabitTestCase(APITestCase):
             any(habit['id'] == self.public_habit_other.id for habit in response.data['results'])
         )
 
+    def test_list_public_habits_with_cursor(self):
+        """Курсорная пагинация обходит ленту в порядке (time, id) без общего количества."""
+        for hour in (8, 8, 8, 9, 10, 20):
+            Habit.objects.create(
+                user=self.another_user, place='Двор', time=time(hour, 0), action='Зарядка',
+                reward='Чай', time_to_complete=60, is_public=True,
+            )
+        expected = list(Habit.objects.filter(is_public=True).order_by('time', 'id').values_list('id', flat=True))
+
+        ids, pages, url = [], [], PUBLIC_HABIT_LIST_URL + '?cursor=&page_size=3'
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertNotIn('count', response.data)
+            pages.append([habit['id'] for habit in response.data['results']])
+            ids.extend(pages[-1])
+            url = response.data['next']
+        self.assertEqual(ids, expected)
+
+        # Ссылка previous возвращает на предыдущую страницу
+        response = self.client.get(PUBLIC_HABIT_LIST_URL + '?cursor=&page_size=3')
+        response = self.client.get(self.client.get(response.data['next']).data['next'])
+        response = self.client.get(response.data['previous'])
+        self.assertEqual([habit['id'] for habit in response.data['results']], pages[1])
+
+        response = self.client.get(PUBLIC_HABIT_LIST_URL + '?cursor=broken')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
     def test_unauthenticated_access_denied(self):
         """Тестирование: неавторизованный пользователь не может просматривать список."""
         self.client.force_authenticate(user=None)
@@ -273,3 +395,1543 @@ class HabitTestCase(APITestCase):
 
         self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
         self.assertEqual(Habit.objects.count(), habit_count_before - 1)
+
+
+class HabitReadPathTestCase(APITestCase):
+    """
+    Тестирование быстрого пути чтения списков привычек.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='reader', password='pass')
+        self.client.force_authenticate(user=self.user)
+        pleasant = Habit.objects.create(
+            user=self.user, place='Дом', time=time(20, 15, 30), action='Какао\u2028с зефиром',
+            is_pleasant=True, time_to_complete=30, is_public=True,
+        )
+        for number in range(3):
+            Habit.objects.create(
+                user=self.user, place='Парк «Северный»', time=time(8, number), action=f'Пробежка {number}',
+                related_habit=pleasant if number else None, reward=None if number else 'Кофе',
+                time_to_complete=60, is_public=bool(number),
+            )
+
+    def assert_same_as_serializer(self, url, queryset):
+        """Ответ совпадает байт в байт с HabitSerializer + JSONRenderer."""
+        response = self.client.get(url, {'page_size': 10})
+        expected = JSONRenderer().render({
+            'count': queryset.count(),
+            'next': None,
+            'previous': None,
+            'results': HabitSerializer(queryset, many=True).data,
+        })
+        self.assertEqual(response.content, expected)
+
+    def test_lists_are_byte_compatible(self):
+        """Личный список и лента публичных привычек не изменились по формату."""
+        self.assert_same_as_serializer(HABIT_LIST_URL, Habit.objects.filter(user=self.user))
+        self.assert_same_as_serializer(PUBLIC_HABIT_LIST_URL, Habit.objects.filter(is_public=True))
+
+    def test_fast_renderer_matches_json_renderer(self):
+        """FastJSONRenderer даёт тот же результат, что и JSONRenderer, включая дату и экранирование."""
+        data = {
+            'text': 'Привет\u2028мир\u2029!',
+            'moment': datetime(2025, 1, 1, 9, 0, 0, 123456, tzinfo=dt_timezone.utc),
+            'items': [1, None, True, {'time': time(8, 0)}],
+        }
+        self.assertEqual(FastJSONRenderer().render(data), JSONRenderer().render(data))
+        self.assertEqual(
+            FastJSONRenderer().render(data, 'application/json; indent=2'),
+            JSONRenderer().render(data, 'application/json; indent=2'),
+        )
+
+
+class SparseFieldsTestCase(APITestCase):
+    """
+    Тестирование разреженного набора полей (?fields=).
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='sparse', password='pass')
+        self.client.force_authenticate(user=self.user)
+        self.habit = Habit.objects.create(
+            user=self.user, place='Парк', time=time(8, 0), action='Пробежка',
+            reward='Кофе', time_to_complete=60, is_public=True,
+        )
+
+    def test_list_returns_and_reads_only_requested_fields(self):
+        """В ответе только запрошенные поля, и из базы читаются только их столбцы."""
+        for url in (HABIT_LIST_URL, PUBLIC_HABIT_LIST_URL):
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url, {'fields': 'time,action'})
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(list(response.data['results'][0]), ['time', 'action'])
+            page_query = queries.captured_queries[-1]['sql']
+            self.assertNotIn('"place"', page_query)
+            self.assertNotIn('"reward"', page_query)
+
+        response = self.client.get(HABIT_LIST_URL, {'fields': 'action', 'cursor': ''})
+        self.assertEqual(response.data['results'], [{'action': 'Пробежка'}])
+
+    def test_retrieve_with_fields(self):
+        """Детальный просмотр тоже поддерживает ?fields= и откладывает чтение остальных столбцов."""
+        url = reverse('habits:my_habits-detail', kwargs={'pk': self.habit.pk})
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, {'fields': 'action,reward'})
+        self.assertEqual(response.data, {'reward': 'Кофе', 'action': 'Пробежка'})
+        self.assertEqual(len(queries), 1)
+        self.assertNotIn('"place"', queries.captured_queries[0]['sql'])
+
+    def test_unknown_field_is_rejected(self):
+        """Неизвестное или служебное поле — ошибка 400."""
+        for fields in ('action,password', 'next_due_at', 'user'):
+            response = self.client.get(HABIT_LIST_URL, {'fields': fields})
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertIn('fields', response.data)
+
+
+class ExpandRelatedHabitTestCase(APITestCase):
+    """
+    Тестирование развёрнутой связанной привычки (?expand=related_habit).
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='expander', password='pass')
+        self.client.force_authenticate(user=self.user)
+        self.pleasant = create_habit(self.user, time=time(7, 0), action='Выпить какао', is_pleasant=True)
+
+    def create_related(self, count):
+        for minute in range(count):
+            create_habit(
+                self.user, time=time(8, minute), action='Пробежка', related_habit=self.pleasant, is_public=True,
+            )
+
+    def test_related_habit_is_embedded(self):
+        """Связанная привычка выводится объектом с теми же полями, что и сама привычка."""
+        self.create_related(1)
+        response = self.client.get(HABIT_LIST_URL, {'expand': 'related_habit'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        pleasant, runner = response.data['results']
+        self.assertIsNone(pleasant['related_habit'])
+        self.assertEqual(runner['related_habit'], HabitSerializer(self.pleasant).data)
+
+        response = self.client.get(HABIT_LIST_URL, {'expand': 'related_habit', 'fields': 'action'})
+        self.assertEqual(response.data['results'][1], {'action': 'Пробежка'})
+
+    def test_query_count_does_not_depend_on_page_size(self):
+        """Связанные привычки читаются тем же запросом, что и страница, при любом её размере."""
+        self.create_related(20)
+        counts = []
+        for page_size in (2, 20):
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(HABIT_LIST_URL, {'expand': 'related_habit', 'page_size': page_size})
+            self.assertEqual(len(response.data['results']), page_size)
+            counts.append(len(queries))
+        self.assertEqual(counts[0], counts[1])
+
+    def test_private_related_habit_is_not_expanded_in_public_feed(self):
+        """В ленте публичных привычек непубличная связанная привычка остаётся id."""
+        self.create_related(1)
+        response = self.client.get(PUBLIC_HABIT_LIST_URL, {'expand': 'related_habit'})
+        self.assertEqual(response.data['results'][0]['related_habit'], self.pleasant.id)
+
+    def test_foreign_private_habit_is_not_linked_or_expanded(self):
+        """Чужую непубличную привычку нельзя связать, а уже связанная не разворачивается."""
+        victim = User.objects.create_user(username='victim', password='pass')
+        secret = Habit.objects.create(
+            user=victim, place='SECRET PLACE', time=time(6, 0), action='secret action',
+            time_to_complete=60, is_pleasant=True,
+        )
+        data = {
+            'place': 'Дом', 'time': '08:00:00', 'action': 'Пробежка', 'is_pleasant': False,
+            'related_habit': secret.id, 'periodicity': 1, 'time_to_complete': 60,
+        }
+        response = self.client.post(HABIT_LIST_URL, data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('related_habit', response.data)
+        response = self.client.post(reverse('habits:my_habits-bulk'), [data], format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        # Связь, созданная в обход API, разворачивается только у владельца связанной привычки
+        create_habit(self.user, action='Пробежка', related_habit=secret)
+        response = self.client.get(HABIT_LIST_URL, {'expand': 'related_habit'})
+        self.assertEqual(response.data['results'][1]['related_habit'], secret.id)
+        self.assertNotIn('SECRET PLACE', response.content.decode())
+
+        # На публичную чужую привычку ссылаться можно
+        Habit.objects.filter(id=secret.id).update(is_public=True)
+        response = self.client.post(HABIT_LIST_URL, {**data, 'time': '09:00:00'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+    def test_unknown_expand_is_rejected(self):
+        response = self.client.get(HABIT_LIST_URL, {'expand': 'user'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('expand', response.data)
+
+
+class HabitExportTestCase(APITestCase):
+    """
+    Тестирование потоковой выгрузки привычек (NDJSON и CSV).
+    """
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='exporter', password='pass')
+        self.other = User.objects.create_user(username='other-exporter', password='pass')
+        self.client.force_authenticate(user=self.user)
+        self.pleasant = create_habit(self.user, action='Выпить какао', is_pleasant=True)
+        self.runner = create_habit(self.user, action='Пробежка, утро', related_habit=self.pleasant)
+        create_habit(self.other, reward='Чай')
+
+    @staticmethod
+    def content(response):
+        return b''.join(response.streaming_content).decode()
+
+    def test_ndjson_matches_serializer(self):
+        """Каждая строка NDJSON — привычка пользователя в формате HabitSerializer."""
+        with override_settings(HABIT_EXPORT_CHUNK_SIZE=1):
+            response = self.client.get(HABIT_EXPORT_URL)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        lines = self.content(response).splitlines()
+        expected = HabitSerializer([self.pleasant, self.runner], many=True).data
+        self.assertEqual([json.loads(line) for line in lines], json.loads(JSONRenderer().render(expected)))
+
+    def test_csv_with_fields(self):
+        """CSV начинается с заголовка и содержит только запрошенные поля."""
+        response = self.client.get(HABIT_EXPORT_URL, {'as': 'csv', 'fields': 'related_habit,action'})
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        rows = list(csv.reader(self.content(response).splitlines()))
+        self.assertEqual(rows, [
+            ['related_habit', 'action'],
+            ['', 'Выпить какао'],
+            [str(self.pleasant.id), 'Пробежка, утро'],
+        ])
+
+    def test_unknown_format_is_rejected(self):
+        response = self.client.get(HABIT_EXPORT_URL, {'as': 'xml'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('as', response.data)
+
+    def test_admin_export(self):
+        """Выгрузка всех привычек доступна только администратору и содержит id владельца."""
+        self.assertEqual(self.client.get(ADMIN_HABIT_EXPORT_URL).status_code, status.HTTP_403_FORBIDDEN)
+
+        self.user.is_staff = True
+        self.user.save()
+        response = self.client.get(ADMIN_HABIT_EXPORT_URL, {'fields': 'action'})
+        lines = [json.loads(line) for line in self.content(response).splitlines()]
+        self.assertEqual([line['user'] for line in lines], [self.user.id, self.user.id, self.other.id])
+        self.assertEqual(list(lines[0]), ['user', 'action'])
+
+        response = self.client.get(ADMIN_HABIT_EXPORT_URL, {'as': 'csv', 'user': self.other.id})
+        rows = list(csv.DictReader(self.content(response).splitlines()))
+        self.assertEqual([row['action'] for row in rows], ['Зарядка'])
+
+
+class HabitImportTestCase(APITestCase):
+    """
+    Тестирование импорта привычек из NDJSON и CSV.
+    """
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='importer', password='pass', timezone='Asia/Tokyo')
+        self.pleasant = Habit.objects.create(
+            user=self.user, place='Дом', time=time(7, 0), action='Выпить какао', time_to_complete=60, is_pleasant=True,
+        )
+        self.useful = Habit.objects.create(
+            user=self.user, place='Дом', time=time(7, 0), action='Зарядка', time_to_complete=60, reward='Чай',
+        )
+
+    def row(self, **fields):
+        return {
+            'user': self.user.id, 'place': 'Парк', 'time': '08:30', 'action': 'Пробежка',
+            'time_to_complete': 60, 'periodicity': 1, 'reward': 'Кофе', **fields,
+        }
+
+    def ndjson(self, *rows):
+        return io.StringIO(''.join(json.dumps(row, ensure_ascii=False) + '\n' for row in rows))
+
+    def test_valid_rows_are_imported_with_defaults(self):
+        rows = [self.row(), self.row(reward=None, related_habit=self.pleasant.id, is_public=True)]
+        report = import_habits(read_rows(self.ndjson(*rows), 'ndjson'), batch_size=1)
+        self.assertEqual((report['total'], report['imported'], report['rejected']), (2, 2, 0))
+
+        first, second = Habit.objects.filter(action='Пробежка').order_by('id')
+        self.assertEqual((first.reward, first.is_pleasant, first.is_public), ('Кофе', False, False))
+        self.assertEqual(second.related_habit, self.pleasant)
+        self.assertTrue(second.is_public)
+        # Срок напоминания — ближайшие 08:30 в поясе пользователя, как при создании через API
+        self.assertEqual(first.next_due_at.astimezone(get_zone('Asia/Tokyo')).time(), time(8, 30))
+        self.assertIsNotNone(first.updated_at)
+
+    def test_rejected_rows_have_serializer_errors(self):
+        """Отклонённые строки получают те же ошибки, что и HabitSerializer, остальные загружаются."""
+        rows = [
+            self.row(time_to_complete=121),
+            self.row(related_habit=self.pleasant.id),
+            self.row(reward=None, related_habit=self.useful.id),
+            self.row(periodicity=8, place=None),
+            self.row(user=0),
+            self.row(),
+        ]
+        rejected = []
+        stream = io.StringIO(self.ndjson(*rows).getvalue() + 'не json\n')
+        report = import_habits(read_rows(stream, 'ndjson'), lambda *args: rejected.append(args))
+        self.assertEqual((report['imported'], report['rejected']), (1, 6))
+
+        errors = {line: errors for line, _, errors in rejected}
+        self.assertEqual(list(errors), [1, 2, 3, 4, 5, 7])
+        for line, row in ((1, rows[0]), (2, rows[1]), (3, rows[2]), (4, rows[3])):
+            serializer = HabitSerializer(data=row, context={'request': SimpleNamespace(user=self.user)})
+            serializer.is_valid()
+            self.assertEqual(errors[line], serializer.errors)
+        self.assertEqual(errors[5], {'user': ['Пользователь не найден.']})
+        self.assertIn('non_field_errors', errors[7])
+
+    def test_csv_empty_cells_are_missing_values(self):
+        stream = io.StringIO(
+            'place,time,action,time_to_complete,periodicity,reward,related_habit,is_public\n'
+            f'Парк,08:30,Пробежка,60,2,,{self.pleasant.id},true\n'
+        )
+        report = import_habits(read_rows(stream, 'csv'), default_user_id=self.user.id)
+        self.assertEqual(report['imported'], 1)
+        habit = Habit.objects.get(action='Пробежка')
+        self.assertEqual((habit.reward, habit.periodicity, habit.is_public), (None, 2, True))
+
+    def test_command_writes_report(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = f'{directory}/habits.ndjson'
+            with open(path, 'w', encoding='utf-8') as file:
+                file.write(self.ndjson(self.row(), self.row(time='25:00')).getvalue())
+            out = io.StringIO()
+            call_command('import_habits', path, stdout=out)
+            with open(f'{path}.rejected.ndjson', encoding='utf-8') as file:
+                rejected = [json.loads(line) for line in file]
+        self.assertIn('импортировано: 1, отклонено: 1', out.getvalue())
+        self.assertIn('строк/с', out.getvalue())
+        self.assertEqual([(item['line'], list(item['errors'])) for item in rejected], [(2, ['time'])])
+
+    def test_admin_endpoint(self):
+        upload = SimpleUploadedFile('habits.ndjson', self.ndjson(self.row(), self.row(action='')).getvalue().encode())
+        self.client.force_authenticate(user=self.user)
+        self.assertEqual(
+            self.client.post(ADMIN_HABIT_IMPORT_URL, {'file': upload}).status_code, status.HTTP_403_FORBIDDEN
+        )
+
+        self.user.is_staff = True
+        self.user.save()
+        upload.seek(0)
+        response = self.client.post(ADMIN_HABIT_IMPORT_URL, {'file': upload})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual((response.data['imported'], response.data['rejected']), (1, 1))
+        self.assertEqual(response.data['errors'][0]['line'], 2)
+        self.assertIn('action', response.data['errors'][0]['errors'])
+
+    def test_copy_value(self):
+        self.assertEqual(copy_value(None), '\\N')
+        self.assertEqual(copy_value(True), 't')
+        self.assertEqual(copy_value(time(8, 30)), '08:30:00')
+        self.assertEqual(copy_value('a\tb\\c\nd'), 'a\\tb\\\\c\\nd')
+
+
+class SeedHabitsTestCase(TestCase):
+    """
+    Тестирование команды seed_habits.
+    """
+
+    def seed(self, prefix, **options):
+        call_command('seed_habits', users=30, seed=5, prefix=prefix, batch_size=7, stdout=io.StringIO(), **options)
+        return Habit.objects.filter(user__username__startswith=f'{prefix}-5-').select_related('user', 'related_habit')
+
+    def test_habits_are_valid_and_reproducible(self):
+        habits = list(self.seed('first').order_by('user__username', 'id'))
+        self.assertEqual(User.objects.filter(username__startswith='first-5-').count(), 30)
+        self.assertTrue(habits)
+        for habit in habits:
+            data = HabitSerializer(habit).data
+            data['related_habit'] = habit.related_habit_id
+            serializer = HabitSerializer(data=data, context={'request': SimpleNamespace(user=habit.user)})
+            self.assertTrue(serializer.is_valid(), serializer.errors)
+            if habit.related_habit is not None:
+                self.assertEqual(habit.related_habit.user_id, habit.user_id)
+            self.assertEqual(habit.next_due_at.astimezone(get_zone(habit.user.timezone)).time(), habit.time)
+
+        fields = ('user__username', 'action', 'time', 'periodicity', 'is_public', 'related_habit__action')
+        second = self.seed('second').order_by('user__username', 'id').values_list(*fields)
+        self.assertEqual(
+            [row[1:] for row in second],
+            [row[1:] for row in Habit.objects.filter(id__in=[h.id for h in habits])
+             .order_by('user__username', 'id').values_list(*fields)],
+        )
+
+    def test_habits_per_user_and_rerun(self):
+        habits = self.seed('fixed', habits_per_user=3)
+        self.assertEqual(habits.count(), 90)
+        with self.assertRaises(CommandError):
+            self.seed('fixed')
+
+
+class CheckInTestCase(APITestCase):
+    """
+    Тестирование пакетных отметок о выполнении привычек.
+    """
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='checker', password='pass', timezone='Europe/Moscow')
+        self.client.force_authenticate(user=self.user)
+        self.habit = Habit.objects.create(
+            user=self.user, place='Дом', time=time(8, 0), action='Зарядка', time_to_complete=60, reward='Чай',
+        )
+        other = User.objects.create_user(username='other-checker', password='pass')
+        self.foreign = Habit.objects.create(
+            user=other, place='Дом', time=time(8, 0), action='Зарядка', time_to_complete=60, reward='Чай',
+        )
+
+    def test_batch_is_recorded_and_retry_is_idempotent(self):
+        items = [
+            {'habit': self.habit.id, 'completed_at': f'2025-01-{day:02d}T08:05:00+03:00'} for day in range(1, 31)
+        ]
+        response = self.client.post(CHECK_IN_URL, items, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual((response.data['received'], response.data['created'], response.data['duplicates']),
+                         (30, 30, 0))
+
+        # Повтор той же выгрузки (и дубликат внутри пачки) не создаёт новых отметок
+        extra = {'habit': self.habit.id, 'completed_at': '2025-01-31T08:05:00+03:00'}
+        response = self.client.post(CHECK_IN_URL, [*items, items[0], extra], format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual((response.data['received'], response.data['created'], response.data['duplicates']),
+                         (32, 1, 31))
+        self.assertEqual(HabitCompletion.objects.filter(habit=self.habit).count(), 31)
+
+    def test_naive_time_is_in_user_timezone(self):
+        self.client.post(CHECK_IN_URL, [{'habit': self.habit.id, 'completed_at': '2025-01-01T08:05:00'}], format='json')
+        completion = HabitCompletion.objects.get()
+        self.assertEqual(completion.completed_at, datetime(2025, 1, 1, 5, 5, tzinfo=dt_timezone.utc))
+        self.assertEqual(completion.user, self.user)
+
+    def test_query_count_does_not_depend_on_batch_size(self):
+        for size in (1, 200):
+            items = [
+                {'habit': self.habit.id, 'completed_at': (datetime(2025, 2, 1, tzinfo=dt_timezone.utc)
+                                                          + timedelta(minutes=size * 1000 + minute)).isoformat()}
+                for minute in range(size)
+            ]
+            # Точка сохранения, привычки пачки, уже записанные отметки, вставка отметок,
+            # обновление серий, снятие точки сохранения
+            with self.assertNumQueries(6):
+                self.client.post(CHECK_IN_URL, items, format='json')
+
+    def test_invalid_items_are_reported_and_nothing_is_written(self):
+        items = [
+            {'habit': self.habit.id, 'completed_at': '2025-01-01T08:05:00+03:00'},
+            {'habit': self.foreign.id, 'completed_at': '2025-01-01T08:05:00+03:00'},
+            {'habit': self.habit.id, 'completed_at': 'вчера'},
+            {'habit': self.habit.id, 'completed_at': (timezone.now() + timedelta(days=1)).isoformat()},
+        ]
+        response = self.client.post(CHECK_IN_URL, items, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual([error['index'] for error in response.data['errors']], [1, 2, 3])
+        self.assertIn('habit', response.data['errors'][0]['errors'])
+        self.assertFalse(HabitCompletion.objects.exists())
+
+        with override_settings(HABIT_CHECK_IN_MAX_ITEMS=1):
+            response = self.client.post(CHECK_IN_URL, items[:1] * 2, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_completions_are_deleted_with_habit(self):
+        HabitCompletion.objects.create(habit=self.habit, user=self.user, completed_at=timezone.now())
+        self.habit.delete()
+        self.assertFalse(HabitCompletion.objects.exists())
+
+    def test_partition_names(self):
+        start = month_start(datetime(2025, 12, 15, tzinfo=dt_timezone.utc), months=1)
+        self.assertEqual(start, datetime(2026, 1, 1, tzinfo=dt_timezone.utc))
+        self.assertEqual(partition_name(start), 'habits_habitcompletion_y2026m01')
+        # Секционирование есть только в PostgreSQL
+        self.assertEqual(create_completion_partitions(), [])
+
+
+class StreakTestCase(APITestCase):
+    """
+    Тестирование серий выполнений привычек.
+    """
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='streaker', password='pass', timezone='Europe/Moscow')
+        self.client.force_authenticate(user=self.user)
+        self.tz = get_zone('Europe/Moscow')
+        self.daily = create_habit(self.user, reward='Чай', periodicity=1)
+        self.every_third = create_habit(self.user, reward='Чай', periodicity=3)
+
+    def check_in(self, habit, *days, hour=8):
+        items = [
+            {'habit': habit.id, 'completed_at': datetime(2025, 3, day, hour, 0, tzinfo=self.tz).isoformat()}
+            for day in days
+        ]
+        response = self.client.post(CHECK_IN_URL, items, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        habit.refresh_from_db()
+        return response
+
+    def streaks(self, habit):
+        return habit.current_streak, habit.longest_streak
+
+    def test_consecutive_days_and_same_day(self):
+        response = self.check_in(self.daily, 1, 2, 3)
+        self.assertEqual(self.streaks(self.daily), (3, 3))
+        self.assertEqual(response.data['streaks'][0]['longest_streak'], 3)
+
+        # Вторая отметка в тот же день серию не продлевает
+        self.check_in(self.daily, 3, hour=21)
+        self.assertEqual(self.streaks(self.daily), (3, 3))
+        self.assertEqual(self.daily.last_completed_at, datetime(2025, 3, 3, 21, 0, tzinfo=self.tz))
+
+        self.check_in(self.daily, 5)
+        self.assertEqual(self.streaks(self.daily), (1, 3))
+
+    def test_periodicity_keeps_streak(self):
+        """Привычка раз в 3 дня сохраняет серию при отметке каждые 3 дня."""
+        self.check_in(self.every_third, 1, 4, 7, 9)
+        self.assertEqual(self.streaks(self.every_third), (4, 4))
+        self.check_in(self.every_third, 13)
+        self.assertEqual(self.streaks(self.every_third), (1, 4))
+
+    def test_out_of_order_check_in_rebuilds_from_history(self):
+        self.check_in(self.daily, 1, 2, 5, 6)
+        self.assertEqual(self.streaks(self.daily), (2, 2))
+        # Офлайн-клиент досылает пропущенные дни задним числом
+        self.check_in(self.daily, 3, 4)
+        self.assertEqual(self.streaks(self.daily), (6, 6))
+
+    def test_incremental_matches_rebuild(self):
+        """При любом порядке пачек серии совпадают с пересчётом по истории."""
+        rng = Random(3)
+        days = [day for day in range(1, 29) if rng.random() < 0.7]
+        rng.shuffle(days)
+        for start in range(0, len(days), 4):
+            self.check_in(self.every_third, *days[start:start + 4])
+        incremental = self.streaks(self.every_third)
+
+        Habit.objects.filter(id=self.every_third.id).update(current_streak=0, longest_streak=0)
+        out = io.StringIO()
+        call_command('rebuild_streaks', '--check', stdout=out)
+        self.assertIn('найдено расхождений: 1', out.getvalue())
+        self.every_third.refresh_from_db()
+        self.assertEqual(self.streaks(self.every_third), (0, 0))
+
+        call_command('rebuild_streaks', stdout=io.StringIO())
+        self.every_third.refresh_from_db()
+        self.assertEqual(self.streaks(self.every_third), incremental)
+        call_command('rebuild_streaks', '--check', stdout=out)
+        self.assertIn('найдено расхождений: 0', out.getvalue())
+
+    def test_current_streak_expires_after_periodicity(self):
+        self.check_in(self.every_third, 1, 4)
+        last = datetime(2025, 3, 4, 23, 0, tzinfo=self.tz)
+        self.assertEqual(current_streak(self.every_third, last + timedelta(days=3), self.tz), 2)
+        self.assertEqual(current_streak(self.every_third, last + timedelta(days=4), self.tz), 0)
+
+        response = self.client.get(reverse('habits:my_habits-streak', kwargs={'pk': self.every_third.pk}))
+        self.assertEqual(response.data['current_streak'], 0)
+        self.assertEqual(response.data['longest_streak'], 2)
+
+
+class HabitRollupTestCase(APITestCase):
+    """
+    Тестирование дневных сводок отметок и статистики по ним.
+    """
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='roller', password='pass', timezone='Asia/Tokyo')
+        self.client.force_authenticate(user=self.user)
+        self.tz = get_zone('Asia/Tokyo')
+        self.daily = create_habit(self.user, reward='Чай', periodicity=1)
+        self.every_other = create_habit(self.user, reward='Чай', periodicity=2)
+        self.received = timezone.now() - timedelta(hours=1)
+
+    def complete(self, habit, day, hour=8, minute=0, created_at=None):
+        HabitCompletion.objects.create(
+            habit=habit, user=self.user, completed_at=datetime(2025, 3, day, hour, minute, tzinfo=self.tz),
+            created_at=created_at or self.received,
+        )
+
+    def test_rollups_use_local_day_and_watermark(self):
+        # 00:30 по Токио — это ещё предыдущий день по UTC
+        self.complete(self.daily, 3, hour=0, minute=30)
+        self.complete(self.daily, 3, hour=0, minute=45)
+        self.assertEqual(build_rollups(), 2)
+        rollup = HabitDailyRollup.objects.get()
+        self.assertEqual((rollup.day, rollup.hour, rollup.completions), (datetime(2025, 3, 3).date(), 0, 2))
+
+        # Повторный запуск ничего не учитывает дважды, новые отметки прибавляются к сводке
+        self.assertEqual(build_rollups(), 0)
+        # Отметки моложе HABIT_ROLLUP_SAFETY_LAG ждут следующего запуска
+        self.complete(self.daily, 3, hour=0, minute=50, created_at=timezone.now())
+        self.complete(self.daily, 4, created_at=timezone.now())
+        self.assertEqual(build_rollups(), 0)
+        self.assertEqual(build_rollups(now=timezone.now() + timedelta(minutes=5)), 2)
+        self.assertEqual(
+            list(HabitDailyRollup.objects.order_by('day').values_list('completions', flat=True)), [3, 1]
+        )
+
+    def test_stats(self):
+        for day in range(1, 6):
+            self.complete(self.daily, day)
+            self.complete(self.every_other, day * 2 - 1, hour=20)
+        build_rollups()
+
+        response = self.client.get(HABIT_STATS_URL, {'start': '2025-03-01', 'end': '2025-03-10'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['days'], 10)
+        rates = {item['habit']: item['completion_rate'] for item in response.data['by_habit']}
+        self.assertEqual(rates, {self.daily.id: 0.5, self.every_other.id: 1.0})
+        # Суббот в периоде две (1 и 8 марта), в день ожидается 1 + 1/2 срока; 1 марта выполнены обе привычки
+        saturday = response.data['by_weekday'][5]
+        self.assertEqual((saturday['completed_days'], saturday['expected_days']), (2, 3.0))
+        hours = {item['hour']: item['completions'] for item in response.data['by_hour'] if item['completions']}
+        self.assertEqual(hours, {8: 5, 20: 5})
+        self.assertIsNotNone(response.data['rolled_up_to'])
+
+    def test_query_count_does_not_depend_on_completions(self):
+        counts = []
+        for minutes in (1, 50):
+            for minute in range(minutes):
+                self.complete(self.daily, minutes % 28 + 1, minute=minute)
+            build_rollups()
+            with CaptureQueriesContext(connection) as queries:
+                self.client.get(HABIT_STATS_URL, {'start': '2025-03-01', 'end': '2025-03-31'})
+            counts.append(len(queries))
+        self.assertEqual(counts[0], counts[1])
+
+    def test_invalid_period(self):
+        for params in ({'start': 'вчера'}, {'start': '2025-03-10', 'end': '2025-03-01'},
+                       {'start': '2020-01-01', 'end': '2025-01-01'}):
+            response = self.client.get(HABIT_STATS_URL, params)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+@skipUnless(analytics.np is not None, 'нужен numpy')
+class HabitAnalyticsTestCase(TestCase):
+    """
+    Тестирование когортной аналитики на массивах NumPy.
+    """
+
+    def setUp(self):
+        self.now = datetime(2025, 4, 1, tzinfo=dt_timezone.utc)
+        # Полных недель с регистрации: у first — 4, у second — 3
+        self.first = User.objects.create_user(
+            username='first', password='pass', date_joined=datetime(2025, 3, 3, tzinfo=dt_timezone.utc),
+        )
+        self.second = User.objects.create_user(
+            username='second', password='pass', timezone='Asia/Tokyo',
+            date_joined=datetime(2025, 3, 10, tzinfo=dt_timezone.utc),
+        )
+        self.daily = create_habit(self.first, reward='Чай', periodicity=1)
+        create_habit(self.first, time=time(19, 0), periodicity=7, is_pleasant=True)
+        self.every_other = create_habit(self.second, time=time(20, 0), reward='Чай', periodicity=2)
+
+        for day, minute in ((3, 0), (3, 5), (4, 0), (17, 0)):
+            self.complete(self.daily, datetime(2025, 3, day, 8, minute, tzinfo=dt_timezone.utc))
+        # 11 марта по Токио: две отметки в один местный день считаются одним выполненным днём
+        self.complete(self.every_other, datetime(2025, 3, 10, 23, 30, tzinfo=dt_timezone.utc))
+        self.complete(self.every_other, datetime(2025, 3, 11, 0, 30, tzinfo=dt_timezone.utc))
+        # Неделя, которая для second ещё не прошла: в когорты не попадает, в часы — попадает
+        self.complete(self.every_other, datetime(2025, 3, 31, 3, 0, tzinfo=dt_timezone.utc))
+
+    def complete(self, habit, moment):
+        HabitCompletion.objects.create(habit=habit, user=habit.user, completed_at=moment)
+
+    def test_cohort_matrices(self):
+        result = analytics.run_analytics(weeks=4, now=self.now)
+        self.assertEqual((result['users'], result['habits'], result['completions']), (2, 3, 7))
+        self.assertEqual((result['cohorts'], result['cohort_sizes']), (['2025-03'], [2]))
+        # Неделя 3 прошла только у first
+        self.assertEqual(result['retention'], [[1.0, 0.0, 0.5, 0.0]])
+        # Ожидается 7 + 1 сроков в неделю у first и 3.5 у second
+        self.assertEqual(result['adherence'], [[round(3 / 11.5, 4), 0.0, round(1 / 11.5, 4), 0.0]])
+
+        self.assertEqual(result['scheduled_hours']['useful'][8], 1)
+        self.assertEqual(result['scheduled_hours']['useful'][20], 1)
+        self.assertEqual(result['scheduled_hours']['pleasant'][19], 1)
+        hours = {hour: count for hour, count in enumerate(result['completed_hours']) if count}
+        self.assertEqual(hours, {8: 5, 9: 1, 12: 1})
+
+    def test_chunks_give_same_result(self):
+        # Пользователь без привычек и отметок — порция без строк
+        User.objects.create_user(username='idle', password='pass',
+                                 date_joined=datetime(2025, 1, 20, tzinfo=dt_timezone.utc))
+        whole = analytics.run_analytics(weeks=4, now=self.now)
+        chunked = analytics.run_analytics(weeks=4, chunk_size=1, now=self.now)
+        whole.pop('seconds'), chunked.pop('seconds')
+        self.assertEqual(whole, chunked)
+
+    def test_completion_hours_follow_daylight_saving(self):
+        """Местный час отметки считается по смещению пояса в момент отметки, а не на текущий момент."""
+        berlin = User.objects.create_user(
+            username='berlin', password='pass', timezone='Europe/Berlin',
+            date_joined=datetime(2025, 1, 6, tzinfo=dt_timezone.utc),
+        )
+        habit = create_habit(berlin, reward='Чай')
+        # 08:00 по Берлину зимой (UTC+1) и летом (UTC+2)
+        self.complete(habit, datetime(2025, 1, 15, 7, 0, tzinfo=dt_timezone.utc))
+        self.complete(habit, datetime(2025, 3, 31, 6, 0, tzinfo=dt_timezone.utc))
+        result = analytics.run_analytics(weeks=4, now=self.now)
+        hours = {hour: count for hour, count in enumerate(result['completed_hours']) if count}
+        self.assertEqual(hours, {8: 7, 9: 1, 12: 1})
+
+    def test_command(self):
+        with tempfile.NamedTemporaryFile(suffix='.json') as file:
+            out = io.StringIO()
+            call_command('habit_analytics', '--weeks', '2', '--json', file.name, stdout=out)
+            self.assertEqual(json.load(file)['cohorts'], ['2025-03'])
+        self.assertIn('2025-03 (2)', out.getvalue())
+
+
+@skipUnless(capacity.np is not None, 'нужен numpy')
+class ReminderCapacityTestCase(TestCase):
+    """
+    Тестирование пробного прогона рассылки: векторный расчёт сверяется с пошаговым,
+    который использует те же функции планирования, что и настоящая рассылка.
+    """
+
+    def setUp(self):
+        # Период захватывает переход на летнее время в Берлине (30 марта) и на зимнее на острове Лорд-Хау (6 апреля)
+        self.start = datetime(2025, 3, 27, 12, 34, tzinfo=dt_timezone.utc)
+        self.days = 11
+        rng = Random(7)
+        zones = ('Europe/Moscow', 'Europe/Berlin', 'America/New_York', 'Australia/Lord_Howe', 'Asia/Kolkata')
+        times = (time(0, 10), time(2, 30), time(8, 0), time(8, 0), time(12, 45), time(23, 50))
+        for number in range(10):
+            user = User.objects.create_user(
+                username=f'planned{number}', password='pass', timezone=zones[number % len(zones)],
+                telegram_id=str(1000 + number),
+            )
+            for _ in range(3):
+                habit = Habit.objects.create(
+                    user=user, place='Дом', time=rng.choice(times), action='Действие', time_to_complete=60,
+                    reward='Чай', periodicity=rng.choice((1, 1, 2, 3, 7)),
+                )
+                # Часть сроков просрочена, часть наступит позже начала периода
+                due = self.start + timedelta(minutes=rng.randint(-3 * 24 * 60, 3 * 24 * 60))
+                Habit.objects.filter(id=habit.id).update(next_due_at=due)
+        # Без Telegram и с чатом на паузе напоминаний не получают
+        silent = User.objects.create_user(username='silent', password='pass')
+        paused = User.objects.create_user(username='paused', password='pass', telegram_id='999',
+                                          telegram_paused_at=self.start)
+        for user in (silent, paused):
+            Habit.objects.create(user=user, place='Дом', time=time(8, 0), action='Действие',
+                                 time_to_complete=60, reward='Чай')
+
+    def expected(self, scheduler):
+        """Пошаговая рассылка: на тике — привычки со сроком до конца окна, новый срок — advance_due_at."""
+        tick = timedelta(seconds=capacity.TICKS[scheduler])
+        end = self.start + timedelta(days=self.days)
+        first_tick = datetime.fromtimestamp(
+            -(-int(self.start.timestamp()) // int(tick.total_seconds())) * tick.total_seconds(), dt_timezone.utc,
+        )
+        sends = []
+        for habit in Habit.objects.filter(user__telegram_id__isnull=False, user__telegram_paused_at__isnull=True):
+            tz, due = get_zone(habit.user.timezone), habit.next_due_at
+            while True:
+                if due < first_tick + tick:
+                    sent = first_tick
+                else:
+                    sent = datetime.fromtimestamp(
+                        int(due.timestamp()) // int(tick.total_seconds()) * tick.total_seconds(), dt_timezone.utc,
+                    )
+                if sent >= end:
+                    break
+                sends.append((habit.user_id, int((sent - self.start).total_seconds()) // 60))
+                due = advance_due_at(habit.time, due, habit.periodicity, sent + tick, tz)
+        return sends
+
+    def test_matches_step_by_step_scheduling(self):
+        for scheduler in ('db', 'redis'):
+            with self.subTest(scheduler=scheduler):
+                load, _ = capacity.plan_reminders(
+                    start=self.start, days=self.days, scheduler=scheduler, digest=True, chunk_size=3,
+                )
+                sends = self.expected(scheduler)
+                self.assertEqual(load.habits, 30)
+                reminders = [0] * len(load.reminders)
+                for _, minute in sends:
+                    reminders[minute] += 1
+                self.assertEqual(load.reminders.tolist(), reminders)
+                messages = [0] * len(load.messages)
+                for _, minute in set(sends):
+                    messages[minute] += 1
+                self.assertEqual(load.messages.tolist(), messages)
+
+    def test_zone_saved_after_zone_list_is_added(self):
+        """Пояс, появившийся после чтения списка поясов, дописывается в таблицы смещений."""
+        first_day = int(self.start.timestamp()) // capacity.DAY
+        offsets = capacity.ZoneOffsets(['Europe/Moscow'], first_day, first_day + 2)
+        schedule = capacity.load_schedule(0, 10 ** 9, offsets.code)
+        self.assertEqual(len(offsets.codes), 5)
+        self.assertEqual(offsets.local.shape[0], 5)
+        self.assertEqual(set(schedule['zone'].tolist()), set(range(5)))
+
+    def test_estimate_workers(self):
+        self.assertEqual(capacity.estimate_workers(0, 25, 60), 0)
+        self.assertEqual(capacity.estimate_workers(1500, 25, 60), 1)
+        self.assertEqual(capacity.estimate_workers(1501, 25, 60), 2)
+
+    def test_command(self):
+        out = io.StringIO()
+        call_command('plan_reminders', '--start', '2025-03-27T12:34', '--days', '2', '--scheduler', 'redis',
+                     '--rate', '1', '--deadline', '1', stdout=out)
+        self.assertIn('Привычек в расписании: 30', out.getvalue())
+        self.assertIn('Исполнителей при 1 сообщ./с', out.getvalue())
+
+
+class HabitSyncTestCase(APITestCase):
+    """
+    Тестирование синхронизации личных привычек по токену (?since=).
+    """
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='syncer', password='pass')
+        self.client.force_authenticate(user=self.user)
+        self.pleasant = create_habit(self.user, action='Выпить какао', is_pleasant=True)
+        self.runner = create_habit(self.user, action='Пробежка', related_habit=self.pleasant)
+        self.other = create_habit(self.user, reward='Чай')
+
+    def sync(self, since):
+        response = self.client.get(HABIT_LIST_URL, {'since': since})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data
+
+    def test_full_sync_then_delta(self):
+        """Первая синхронизация выгружает всё, следующая — только изменения и удаления."""
+        full = self.sync(0)
+        self.assertEqual(len(full['changed']), 3)
+        self.assertEqual(full['deleted'], [])
+
+        since = make_sync_token(timezone.now())
+        self.other.action = 'Планка'
+        self.other.save()
+        Habit.objects.filter(id=self.pleasant.id).delete()
+
+        with self.assertNumQueries(2):
+            delta = self.sync(since)
+        # Пробежка ссылалась на удалённую привычку — её связь обнулилась, и она тоже изменилась
+        self.assertEqual({habit['id'] for habit in delta['changed']}, {self.other.id, self.runner.id})
+        self.assertEqual(delta['deleted'], [self.pleasant.id])
+
+        runner = next(habit for habit in delta['changed'] if habit['id'] == self.runner.id)
+        self.assertIsNone(runner['related_habit'])
+
+    def test_changes_are_paged(self):
+        """Изменения отдаются страницами; удаления и токен следующей синхронизации — с последней."""
+        Habit.objects.filter(id=self.other.id).delete()
+        create_habit(self.user, action='Планка', reward='Чай')
+        with override_settings(HABIT_SYNC_PAGE_SIZE=2):
+            first = self.sync(0)
+            self.assertEqual((len(first['changed']), first['deleted'], first['since']), (2, [], None))
+            second = self.sync(first['next'])
+        self.assertIsNone(second['next'])
+        self.assertIsNotNone(second['since'])
+        self.assertEqual(second['deleted'], [self.other.id])
+
+        ids = [habit['id'] for habit in first['changed'] + second['changed']]
+        self.assertCountEqual(ids, Habit.objects.filter(user=self.user).values_list('id', flat=True))
+        self.assertEqual(first['changed'][0], HabitSerializer(Habit.objects.get(id=ids[0])).data)
+        self.assertEqual(self.client.get(HABIT_LIST_URL, {'since': '0.0.x'}).status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_invalid_and_expired_tokens(self):
+        """Неверный токен отклоняется, устаревший требует полной синхронизации."""
+        self.assertEqual(self.client.get(HABIT_LIST_URL, {'since': 'abc'}).status_code, status.HTTP_400_BAD_REQUEST)
+        old = make_sync_token(timezone.now() - timedelta(days=31))
+        self.assertEqual(self.client.get(HABIT_LIST_URL, {'since': old}).status_code, status.HTTP_410_GONE)
+
+    def test_old_tombstones_are_purged(self):
+        """Задача очистки удаляет только старые отметки об удалении."""
+        habit_id = self.other.id
+        self.other.delete()
+        HabitTombstone.objects.create(user=self.user, habit_id=999, deleted_at=timezone.now() - timedelta(days=40))
+        self.assertEqual(purge_habit_tombstones(), 1)
+        self.assertEqual(list(HabitTombstone.objects.values_list('habit_id', flat=True)), [habit_id])
+
+    def test_user_deletion_leaves_no_tombstones(self):
+        """При удалении пользователя вместе с привычками отметки не создаются."""
+        self.user.delete()
+        self.assertFalse(HabitTombstone.objects.exists())
+
+
+class HabitBulkTestCase(APITestCase):
+    """
+    Тестирование массовых операций над личными привычками.
+    """
+
+    BULK_URL = reverse('habits:my_habits-bulk')
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='bulk', password='pass', timezone='Europe/Moscow')
+        self.client.force_authenticate(user=self.user)
+        self.pleasant = Habit.objects.create(
+            user=self.user, place='Дом', time=time(20, 0), action='Выпить какао',
+            is_pleasant=True, time_to_complete=30,
+        )
+
+    def make_items(self, count):
+        return [
+            {'place': 'Парк', 'time': '08:00', 'action': f'Пробежка {number}', 'time_to_complete': 60,
+             'periodicity': 1, 'related_habit': self.pleasant.id}
+            for number in range(count)
+        ]
+
+    def test_bulk_create_uses_constant_number_of_queries(self):
+        """Количество запросов не зависит от количества привычек: связанные загружаются одним запросом."""
+        with CaptureQueriesContext(connection) as few:
+            response = self.client.post(self.BULK_URL, self.make_items(2), format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        with CaptureQueriesContext(connection) as many:
+            response = self.client.post(self.BULK_URL, self.make_items(30), format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        self.assertEqual(len(many), len(few))
+        self.assertEqual(len(response.data), 30)
+        self.assertEqual(Habit.objects.filter(user=self.user, related_habit=self.pleasant).count(), 32)
+        self.assertFalse(Habit.objects.filter(next_due_at__isnull=True).exists())
+
+    def test_bulk_create_reports_errors_by_index(self):
+        """Ошибки возвращаются по индексам элементов, и ничего не создаётся."""
+        items = self.make_items(3)
+        items[1]['reward'] = 'Кофе'
+        items[2]['related_habit'] = 999999
+        response = self.client.post(self.BULK_URL, items, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual([error['index'] for error in response.data['errors']], [1, 2])
+        self.assertIn('related_habit', response.data['errors'][1]['errors'])
+        self.assertEqual(Habit.objects.filter(user=self.user).count(), 1)
+
+    def test_bulk_update(self):
+        """Частичное обновление списка привычек; смена времени пересчитывает срок напоминания."""
+        first, second = Habit.objects.bulk_create([
+            Habit(user=self.user, place='Парк', time=time(8, 0), action='Пробежка', reward='Чай', time_to_complete=60),
+            Habit(user=self.user, place='Дом', time=time(9, 0), action='Зарядка', reward='Чай', time_to_complete=60),
+        ])
+        response = self.client.patch(self.BULK_URL, [
+            {'id': first.id, 'time': '07:30'},
+            {'id': second.id, 'reward': None, 'related_habit': self.pleasant.id},
+        ], format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertEqual(first.time, time(7, 30))
+        self.assertEqual(first.next_due_at.astimezone(get_zone('Europe/Moscow')).time(), time(7, 30))
+        self.assertEqual(second.related_habit, self.pleasant)
+
+        response = self.client.patch(self.BULK_URL, [{'id': first.id, 'reward': None}, {'id': 999999}], format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual([error['index'] for error in response.data['errors']], [1])
+
+    def test_bulk_update_rejects_boolean_ids(self):
+        """true и false в JSON — не id привычек 1 и 0."""
+        response = self.client.patch(self.BULK_URL, [{'id': True, 'place': 'Парк'}, {'id': False}], format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual([error['index'] for error in response.data['errors']], [0, 1])
+        self.assertFalse(Habit.objects.filter(place='Парк').exists())
+
+    def test_bulk_delete(self):
+        """Удаление по списку id оставляет отметки для синхронизации; чужие id — ошибка."""
+        other = User.objects.create_user(username='other', password='pass')
+        foreign = Habit.objects.create(
+            user=other, place='Дом', time=time(9, 0), action='Чужая', reward='Чай', time_to_complete=60,
+        )
+        response = self.client.delete(self.BULK_URL, [self.pleasant.id, foreign.id], format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data['errors'][0]['index'], 1)
+
+        response = self.client.delete(self.BULK_URL, [self.pleasant.id], format='json')
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertFalse(Habit.objects.filter(user=self.user).exists())
+        self.assertTrue(HabitTombstone.objects.filter(habit_id=self.pleasant.id).exists())
+
+    def test_delete_uses_constant_number_of_queries(self):
+        """Удаление пачки и удаление пользователя не выполняют запросов на каждую привычку."""
+        def delete_habits(count):
+            ids = [create_habit(self.user, related_habit=self.pleasant).id for _ in range(count)]
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.delete(self.BULK_URL, ids, format='json')
+            self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+            return len(queries)
+
+        self.assertEqual(delete_habits(2), delete_habits(20))
+        self.assertEqual(HabitTombstone.objects.count(), 22)
+
+        self.client.delete(self.BULK_URL, [self.pleasant.id], format='json')
+        self.assertEqual(HabitTombstone.objects.count(), 23)
+
+        def delete_user(count):
+            user = User.objects.create_user(username=f'leaving{count}', password='pass')
+            pleasant = create_habit(user, is_pleasant=True, is_public=True)
+            for _ in range(count):
+                create_habit(user, related_habit=pleasant)
+            with CaptureQueriesContext(connection) as queries:
+                user.delete()
+            return len(queries)
+
+        self.assertEqual(delete_user(2), delete_user(20))
+        self.assertEqual(HabitTombstone.objects.count(), 23)
+
+
+class PublicFeedCacheTestCase(APITestCase):
+    """
+    Тестирование кэша ленты публичных привычек.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='reader', password='pass')
+        self.client.force_authenticate(user=self.user)
+        self.habit = Habit.objects.create(
+            user=self.user, place='Парк', time=time(8, 0), action='Пробежка',
+            reward='Кофе', time_to_complete=60, is_public=True,
+        )
+
+    def commit_habit(self, is_public):
+        """Создаёт привычку и выполняет обработчики после коммита (смену версии ленты)."""
+        with self.captureOnCommitCallbacks(execute=True):
+            return create_habit(self.user, time=time(9, 0), reward='Чай', is_public=is_public)
+
+    def test_feed_is_served_from_cache(self):
+        """Повторный запрос ленты обслуживается из кэша без обращения к базе."""
+        first = self.client.get(PUBLIC_HABIT_LIST_URL)
+        self.assertEqual(first['X-Cache'], 'MISS')
+
+        with self.assertNumQueries(0):
+            second = self.client.get(PUBLIC_HABIT_LIST_URL)
+        self.assertEqual(second['X-Cache'], 'HIT')
+        self.assertEqual(second.data, first.data)
+
+        # Другие параметры запроса — другая страница кэша
+        self.assertEqual(self.client.get(PUBLIC_HABIT_LIST_URL + '?page_size=1')['X-Cache'], 'MISS')
+        self.assertEqual(feed_cache_stats()['hit'], 1)
+        self.assertEqual(feed_cache_stats()['miss'], 2)
+
+    def test_etag_answers_not_modified(self):
+        """Запрос с совпавшим If-None-Match получает 304 без тела."""
+        etag = self.client.get(PUBLIC_HABIT_LIST_URL)['ETag']
+        response = self.client.get(PUBLIC_HABIT_LIST_URL, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(feed_cache_stats()['not_modified'], 1)
+
+        self.commit_habit(is_public=True)
+        response = self.client.get(PUBLIC_HABIT_LIST_URL, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_only_public_changes_invalidate_feed(self):
+        """Лента сбрасывается при изменении публичных привычек и не сбрасывается из-за приватных."""
+        self.client.get(PUBLIC_HABIT_LIST_URL)
+        self.commit_habit(is_public=False)
+        self.assertEqual(self.client.get(PUBLIC_HABIT_LIST_URL)['X-Cache'], 'HIT')
+
+        # Привычка перестала быть публичной
+        with self.captureOnCommitCallbacks(execute=True):
+            self.habit.is_public = False
+            self.habit.save()
+        response = self.client.get(PUBLIC_HABIT_LIST_URL)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.data['count'], 0)
+
+        public = self.commit_habit(is_public=True)
+        self.assertEqual(self.client.get(PUBLIC_HABIT_LIST_URL).data['count'], 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            public.delete()
+        self.assertEqual(self.client.get(PUBLIC_HABIT_LIST_URL).data['count'], 0)
+
+    def test_save_does_not_reread_previous_state(self):
+        """Прежние is_public и action берутся из прочитанной привычки: сохранение — один UPDATE."""
+        self.client.get(PUBLIC_HABIT_LIST_URL)
+        habit = Habit.objects.get(id=self.habit.id)
+        habit.place = 'Стадион'
+        with self.assertNumQueries(1):
+            habit.save()
+
+        habit = Habit.objects.get(id=self.habit.id)
+        with self.captureOnCommitCallbacks(execute=True):
+            habit.is_public = False
+            habit.save()
+        self.assertEqual(self.client.get(PUBLIC_HABIT_LIST_URL).data['count'], 0)
+
+
+class FakeSender:
+    """Отправитель-заглушка: запоминает пачки сообщений вместо отправки в Telegram."""
+
+    def __init__(self, failed_chats=(), error=None):
+        self.batches = []
+        self.failed_chats = set(failed_chats)
+        self.error = error
+
+    def send_batch(self, messages):
+        self.batches.append(messages)
+        return [
+            SendResult(chat_id, False, self.error) if chat_id in self.failed_chats else SendResult(chat_id, True, None)
+            for chat_id, text in messages
+        ]
+
+
+class ReminderPipelineTestCase(TestCase):
+    """
+    Тестирование потоковой рассылки напоминаний.
+    """
+
+    def setUp(self):
+        self.now = datetime(2025, 1, 1, 9, 0, tzinfo=dt_timezone.utc)
+        self.user = User.objects.create_user(username='reminded', password='pass', telegram_id='111')
+        self.silent_user = User.objects.create_user(username='silent', password='pass')
+        self.pleasant_habit = self.create_due_habit(
+            user=self.user, place='Дома', time=time(9, 30), action='Выпить какао',
+            is_pleasant=True, time_to_complete=30,
+        )
+        for minute in range(5):
+            self.create_due_habit(
+                user=self.user, place='Парк', time=time(9, minute), action=f'Пробежка {minute}',
+                related_habit=self.pleasant_habit, time_to_complete=60,
+            )
+        self.create_due_habit(
+            user=self.silent_user, place='Офис', time=time(9, 0), action='Зарядка',
+            reward='Кофе', time_to_complete=60,
+        )
+
+    def create_due_habit(self, user, **fields):
+        """Создаёт привычку со сроком напоминания в день self.now."""
+        next_due_at = datetime.combine(self.now.date(), fields['time'], tzinfo=dt_timezone.utc)
+        return create_habit(user, next_due_at=next_due_at, **fields)
+
+    def test_reminders_are_sent_in_chunks_with_single_query(self):
+        """Все напоминания часа читаются одним запросом и отправляются порциями."""
+        sender = FakeSender()
+        # Один запрос на чтение и на каждую порцию: захват в журнале доставки (вставка и выборка),
+        # сборка текстов (кэш пуст), запись результатов и перенос сроков
+        with self.assertNumQueries(1 + 3 * 5):
+            report = send_due_reminders(self.now, sender, chunk_size=2)
+
+        self.assertEqual(report, {'scanned': 6, 'sent': 6, 'messages': 6})
+        self.assertEqual([len(batch) for batch in sender.batches], [2, 2, 2])
+        texts = [text for batch in sender.batches for chat_id, text in batch]
+        self.assertTrue(any('Выпить какао' in text for text in texts))
+
+    def test_failed_sends_are_not_counted(self):
+        """Неудачные отправки учитываются как просмотренные, но не как отправленные."""
+        report = send_due_reminders(self.now, FakeSender(failed_chats={'111'}), chunk_size=10)
+        self.assertEqual(report, {'scanned': 6, 'sent': 0, 'messages': 6})
+
+    def test_duplicate_run_does_not_resend(self):
+        """Повторный запуск рассылки за тот же срок (другим воркером) ничего не отправляет."""
+        rows = list(get_due_habits(self.now))
+        first, second = FakeSender(), FakeSender()
+
+        self.assertEqual(deliver(rows, first, claim='worker-1'), (6, 6))
+        self.assertEqual(deliver(rows, second, claim='worker-2'), (0, 0))
+        self.assertEqual(second.batches, [])
+        self.assertEqual(ReminderDelivery.objects.filter(status=ReminderDelivery.STATUS_SENT).count(), 6)
+
+    def test_delivery_stats(self):
+        """Журнал доставки позволяет посчитать долю ошибок и задержку отправки."""
+        rows = list(get_due_habits(self.now))
+        deliver(rows[:2], FakeSender(failed_chats={'111'}), claim='worker-1')
+        deliver(rows[2:], FakeSender(), claim='worker-1')
+
+        stats = ReminderDelivery.objects.stats()
+        self.assertEqual((stats['total'], stats['sent'], stats['failed']), (6, 4, 2))
+        self.assertAlmostEqual(stats['failure_rate'], 2 / 6)
+        self.assertGreater(stats['avg_latency'], timedelta(0))
+
+    def test_rendered_bodies_are_cached_by_version(self):
+        """Тексты собираются один раз на версию привычки; изменение связанной привычки меняет текст."""
+        cache = ReminderBodyCache(maxsize=100)
+        rows = list(get_due_habits(self.now))
+        with self.assertNumQueries(1):
+            render_bodies(rows, cache)
+        rows = list(get_due_habits(self.now))
+        with self.assertNumQueries(0):
+            rows = render_bodies(rows, cache)
+        self.assertTrue(all('Выпить какао' in row['body'] for row in rows if row['id'] != self.pleasant_habit.id))
+
+        self.pleasant_habit.action = 'Выпить чай'
+        self.pleasant_habit.save()
+        rows = render_bodies(list(get_due_habits(self.now)), cache)
+        self.assertTrue(all('Выпить чай' in row['body'] for row in rows if row['id'] != self.pleasant_habit.id))
+
+    def test_body_cache_is_bounded_and_invalidated(self):
+        """Кэш в памяти процесса вытесняет давно не использованные тексты и очищается по сигналу."""
+        cache = ReminderBodyCache(maxsize=2)
+        cache.set_many({1: ('v1', 'раз'), 2: ('v1', 'два')})
+        cache.get_many({1: 'v1'})
+        cache.set_many({3: ('v1', 'три')})
+        self.assertEqual(cache.get_many({1: 'v1', 2: 'v1', 3: 'v1'}), {1: 'раз', 3: 'три'})
+        self.assertEqual(cache.get_many({1: 'v2'}), {})
+
+        # Сохранение привычки очищает её текст, а при смене действия — и тексты ссылающихся на неё привычек
+        runner = Habit.objects.filter(related_habit=self.pleasant_habit).first()
+        cache.set_many({self.pleasant_habit.id: ('v1', 'какао'), runner.id: ('v1', 'пробежка')})
+        with patch('habits.signals.get_body_cache', return_value=cache):
+            with self.captureOnCommitCallbacks(execute=True):
+                self.pleasant_habit.save()
+            self.assertEqual(cache.get_many({self.pleasant_habit.id: 'v1', runner.id: 'v1'}), {runner.id: 'пробежка'})
+            with self.captureOnCommitCallbacks(execute=True):
+                self.pleasant_habit.action = 'Выпить чаю'
+                self.pleasant_habit.save()
+        self.assertEqual(cache.get_many({self.pleasant_habit.id: 'v1', runner.id: 'v1'}), {})
+
+    def test_split_id_range_covers_all_ids(self):
+        """Диапазоны id не пересекаются и покрывают весь отрезок."""
+        self.assertEqual(split_id_range(1, 10, 3), [(1, 4), (5, 8), (9, 10)])
+        self.assertEqual(split_id_range(7, 7, 4), [(7, 7)])
+
+    def create_other_users(self, count):
+        """Создаёт ещё count пользователей с Telegram и одной привычкой в 9:00 у каждого."""
+        for number in range(count):
+            user = User.objects.create_user(username=f'other{number}', password='pass', telegram_id=f'9{number}')
+            self.create_due_habit(
+                user=user, place='Дом', time=time(9, 0), action='Зарядка', reward='Чай', time_to_complete=60,
+            )
+
+    def test_partitions_deliver_every_reminder_once(self):
+        """Подзадачи по диапазонам пользователей вместе отправляют каждое напоминание ровно один раз."""
+        self.create_other_users(3)
+        partitions = plan_partitions(self.now, max_partitions=3, min_partition_size=1)
+        self.assertEqual(len(partitions), 3)
+
+        sender = FakeSender()
+        reports = [send_due_reminders(self.now, sender, user_range=user_range) for user_range in partitions]
+        self.assertEqual(sum(report['sent'] for report in reports), 9)
+        self.assertEqual(sum(len(batch) for batch in sender.batches), 9)
+
+    @patch('habits.tasks.chord')
+    @patch('habits.tasks.timezone.now')
+    def test_coordinator_starts_one_subtask_per_partition(self, now_mock, chord_mock):
+        """Координатор запускает chord из подзадач и собирает итог."""
+        now_mock.return_value = self.now
+        self.create_other_users(1)
+        with self.settings(REMINDER_MAX_PARTITIONS=2, REMINDER_MIN_PARTITION_SIZE=1):
+            result = send_habit_reminders.apply().get()
+
+        self.assertEqual(result, {'partitions': 2})
+        header = chord_mock.call_args.args[0]
+        self.assertEqual(len(header), 2)
+        self.assertEqual(
+            collect_reminder_reports(
+                [{'scanned': 4, 'sent': 3, 'messages': 4}, {'scanned': 2, 'sent': 2, 'messages': 1}],
+                self.now.isoformat(),
+            ),
+            {'partitions': 2, 'scanned': 6, 'sent': 5, 'messages': 5},
+        )
+
+    def test_digest_sends_one_message_per_user(self):
+        """В режиме сводки все привычки пользователя уходят одним сообщением, даже через границу порций."""
+        self.create_other_users(1)
+        sender = FakeSender()
+        report = send_due_reminders(self.now, sender, chunk_size=2, digest=True)
+
+        self.assertEqual(report, {'scanned': 7, 'sent': 7, 'messages': 2})
+        messages = dict(message for batch in sender.batches for message in batch)
+        self.assertIn('Напоминание о привычках (6)', messages['111'])
+        for minute in range(5):
+            self.assertIn(f'Пробежка {minute}', messages['111'])
+        self.assertEqual(ReminderDelivery.objects.filter(status=ReminderDelivery.STATUS_SENT).count(), 7)
+
+    def test_long_digest_is_split(self):
+        """Сводка, не помещающаяся в одно сообщение Telegram, делится на части."""
+        rows = [
+            {'user__telegram_id': '1', 'action': 'х' * 250, 'time': time(9, 0), 'place': 'Дом',
+             'reward': 'Чай', 'related_habit__action': None}
+            for _ in range(40)
+        ]
+        groups = group_messages(rows, digest=True)
+        self.assertGreater(len(groups), 1)
+        self.assertEqual(sum(len(group) for group in groups), 40)
+        self.assertTrue(all(len(build_digest_message(group)) <= 4096 for group in groups))
+
+    def test_due_date_moves_forward_by_periodicity(self):
+        """После отправки срок переносится на periodicity дней, и повторной отправки нет."""
+        weekly = self.create_due_habit(
+            user=self.user, place='Бассейн', time=time(9, 15), action='Поплавать',
+            reward='Сауна', periodicity=7, time_to_complete=120,
+        )
+        send_due_reminders(self.now, FakeSender())
+
+        weekly.refresh_from_db()
+        self.assertEqual(weekly.next_due_at, datetime(2025, 1, 8, 9, 15, tzinfo=dt_timezone.utc))
+
+        next_day = self.now + timedelta(days=1)
+        self.assertEqual(send_due_reminders(next_day, FakeSender())['scanned'], 6)
+        self.assertFalse(get_due_queryset(next_day + timedelta(days=1)).filter(id=weekly.id).exists())
+
+    def test_advance_skips_missed_periods(self):
+        """После долгого простоя срок переносится сразу в будущее без серии пропущенных напоминаний."""
+        due_at = datetime(2025, 1, 1, 9, 0, tzinfo=dt_timezone.utc)
+        after = datetime(2025, 1, 20, 12, 0, tzinfo=dt_timezone.utc)
+        self.assertEqual(
+            advance_due_at(time(9, 0), due_at, 3, after),
+            datetime(2025, 1, 22, 9, 0, tzinfo=dt_timezone.utc),
+        )
+
+
+class DeliveryFailureTestCase(TestCase):
+    """
+    Тестирование повторов, очереди недоставленных напоминаний и паузы недоступных чатов.
+    """
+
+    def setUp(self):
+        self.now = datetime(2025, 1, 1, 9, 0, tzinfo=dt_timezone.utc)
+        self.user = User.objects.create_user(username='reminded', password='pass', telegram_id='111')
+        for minute in range(3):
+            Habit.objects.create(
+                user=self.user, place='Парк', time=time(9, minute), action=f'Пробежка {minute}',
+                reward='Чай', time_to_complete=60,
+                next_due_at=datetime(2025, 1, 1, 9, minute, tzinfo=dt_timezone.utc),
+            )
+
+    def send_failing(self, error):
+        """Рассылка, в которой все отправки в чат '111' завершаются ошибкой error."""
+        with patch('habits.tasks.retry_reminder_delivery.apply_async') as apply_async:
+            with self.captureOnCommitCallbacks(execute=True):
+                report = send_due_reminders(self.now, FakeSender(failed_chats={'111'}, error=error))
+        return report, apply_async
+
+    def test_transient_error_is_queued_for_retry(self):
+        """Временная ошибка ставит напоминание в очередь повторов, а не в очередь недоставленных."""
+        report, apply_async = self.send_failing(telegram.error.TimedOut())
+
+        self.assertEqual(report['sent'], 0)
+        self.assertEqual(apply_async.call_count, 3)
+        self.assertEqual(
+            ReminderDelivery.objects.filter(status=ReminderDelivery.STATUS_RETRYING).count(), 3
+        )
+        self.assertFalse(ReminderDeadLetter.objects.exists())
+
+    def test_retry_sends_or_moves_to_dead_letters(self):
+        """Повтор доставляет напоминание, а после последней неудачной попытки оно попадает в очередь недоставленных."""
+        self.send_failing(telegram.error.NetworkError('Connection reset'))
+        first, second = ReminderDelivery.objects.order_by('id')[:2]
+
+        self.assertFalse(retry_delivery(first.id, FakeSender(), attempts=2))
+        first.refresh_from_db()
+        self.assertEqual(first.status, ReminderDelivery.STATUS_SENT)
+
+        failing = FakeSender(failed_chats={'111'}, error=telegram.error.TimedOut())
+        self.assertTrue(retry_delivery(second.id, failing, attempts=2))
+        self.assertFalse(retry_delivery(second.id, failing, attempts=3, final=True))
+        second.refresh_from_db()
+        self.assertEqual(second.status, ReminderDelivery.STATUS_FAILED)
+        self.assertEqual(second.dead_letter.attempts, 3)
+
+        # Обработанное напоминание повторно не отправляется
+        sender = FakeSender()
+        self.assertFalse(retry_delivery(first.id, sender, attempts=3))
+        self.assertEqual(sender.batches, [])
+
+    def test_permanent_error_goes_to_dead_letters_and_is_replayed(self):
+        """Постоянная ошибка сразу попадает в очередь недоставленных; очередь отправляется повторно пачкой."""
+        self.send_failing(telegram.error.BadRequest("Can't parse entities"))
+        self.assertEqual(ReminderDeadLetter.objects.count(), 3)
+
+        sender = FakeSender()
+        report = replay_dead_letters(ReminderDeadLetter.objects.all(), sender, chunk_size=2)
+        self.assertEqual(report, {'replayed': 3, 'failed': 0})
+        self.assertEqual([len(batch) for batch in sender.batches], [2, 1])
+        self.assertEqual(ReminderDelivery.objects.filter(status=ReminderDelivery.STATUS_SENT).count(), 3)
+        # Повторный запуск ничего не отправляет
+        self.assertEqual(replay_dead_letters(ReminderDeadLetter.objects.all(), FakeSender()), {'replayed': 0, 'failed': 0})
+
+    def test_blocked_chat_is_paused(self):
+        """Чат, заблокировавший бота, ставится на паузу и выпадает из следующих рассылок."""
+        report, apply_async = self.send_failing(telegram.error.Forbidden('Forbidden: bot was blocked by the user'))
+
+        apply_async.assert_not_called()
+        self.assertFalse(ReminderDeadLetter.objects.exists())
+        self.user.refresh_from_db()
+        self.assertIsNotNone(self.user.telegram_paused_at)
+        self.assertFalse(get_due_queryset(self.now + timedelta(days=1)).exists())
+
+    def test_retry_delay_grows_with_jitter(self):
+        """Задержка повтора растёт экспоненциально, ограничена сверху и случайно разбросана."""
+        with self.settings(REMINDER_RETRY_BASE_DELAY=10, REMINDER_RETRY_MAX_DELAY=60):
+            for retries, (low, high) in enumerate([(5, 10), (10, 20), (20, 40), (30, 60), (30, 60)]):
+                delay = retry_delay(retries)
+                self.assertGreaterEqual(delay, low)
+                self.assertLessEqual(delay, high)
+
+
+class TimezoneSchedulingTestCase(TestCase):
+    """
+    Тестирование расчёта сроков напоминаний в часовых поясах пользователей.
+    """
+
+    def test_first_due_at_uses_user_timezone(self):
+        """09:00 по Москве — это 06:00 UTC."""
+        now = datetime(2025, 1, 1, 5, 0, tzinfo=dt_timezone.utc)
+        due_at = first_due_at(time(9, 0), now, get_zone('Europe/Moscow'))
+        self.assertEqual(due_at, datetime(2025, 1, 1, 6, 0, tzinfo=dt_timezone.utc))
+
+    def test_advance_keeps_local_time_across_dst(self):
+        """При переходе на летнее время напоминание остаётся в 09:00 по местному времени."""
+        berlin = get_zone('Europe/Berlin')
+        before_dst = datetime(2025, 3, 29, 8, 0, tzinfo=dt_timezone.utc)  # 09:00 CET
+        next_due_at = advance_due_at(time(9, 0), before_dst, 1, before_dst, berlin)
+        self.assertEqual(next_due_at, datetime(2025, 3, 30, 7, 0, tzinfo=dt_timezone.utc))  # 09:00 CEST
+        self.assertEqual(next_due_at.astimezone(berlin).time(), time(9, 0))
+
+    def test_timezone_change_reschedules_habits(self):
+        """Смена часового пояса пользователя пересчитывает сроки его привычек."""
+        user = User.objects.create_user(username='traveller', password='pass', timezone='UTC')
+        habit = Habit.objects.create(
+            user=user, place='Дом', time=time(9, 0), action='Зарядка', reward='Чай', time_to_complete=60,
+        )
+        self.assertEqual(habit.next_due_at.astimezone(dt_timezone.utc).time(), time(9, 0))
+
+        user.timezone = 'Asia/Tokyo'
+        user.save()
+        habit.refresh_from_db()
+        self.assertEqual(habit.next_due_at.astimezone(get_zone('Asia/Tokyo')).time(), time(9, 0))
+        self.assertEqual(habit.next_due_at.astimezone(dt_timezone.utc).time(), time(0, 0))
+
+
+class FakeWheel:
+    """Расписание-заглушка с тем же интерфейсом, что у ReminderWheel, но в памяти."""
+
+    def __init__(self):
+        self.due = {}
+
+    def schedule(self, habit_id, due_at):
+        self.due[habit_id] = due_at
+
+    def schedule_many(self, due_dates):
+        self.due.update(due_dates)
+
+    def unschedule(self, habit_id):
+        self.due.pop(habit_id, None)
+
+    def pop_due(self, until, limit):
+        habit_ids = sorted(habit_id for habit_id, due_at in self.due.items() if due_at < until)[:limit]
+        for habit_id in habit_ids:
+            del self.due[habit_id]
+        return habit_ids
+
+
+class ReminderWheelTestCase(TestCase):
+    """
+    Тестирование поминутного планировщика напоминаний в Redis.
+    """
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='wheel', password='pass', telegram_id='222')
+        self.silent_user = User.objects.create_user(username='silent', password='pass')
+        self.habits = {
+            minute: Habit.objects.create(
+                user=self.user, place='Дом', time=time(14, minute), action=f'Отжимания {minute}',
+                reward='Чай', time_to_complete=60,
+                next_due_at=datetime(2025, 1, 1, 14, minute, tzinfo=dt_timezone.utc),
+            )
+            for minute in (44, 45, 46)
+        }
+        self.silent_habit = Habit.objects.create(
+            user=self.silent_user, place='Дом', time=time(14, 45), action='Растяжка',
+            reward='Чай', time_to_complete=60,
+            next_due_at=datetime(2025, 1, 1, 14, 45, tzinfo=dt_timezone.utc),
+        )
+        self.wheel = FakeWheel()
+        for habit in Habit.objects.all():
+            self.wheel.schedule(habit.id, habit.next_due_at)
+
+    def test_tick_sends_only_current_minute(self):
+        """Тик в 14:45 отправляет напоминания со сроком до конца этой минуты, а не всего часа."""
+        sender = FakeSender()
+        now = datetime(2025, 1, 1, 14, 45, 10, tzinfo=dt_timezone.utc)
+        report = send_wheel_reminders(now, self.wheel, sender)
+
+        self.assertEqual(report, {'scanned': 3, 'sent': 2, 'messages': 2})
+        self.assertIn(self.habits[46].id, self.wheel.due)
+        # Отправленные и пропущенные привычки возвращаются в расписание со сроком на следующий день
+        tomorrow = datetime(2025, 1, 2, 14, 45, tzinfo=dt_timezone.utc)
+        self.assertEqual(self.wheel.due[self.habits[45].id], tomorrow)
+        self.assertEqual(self.wheel.due[self.silent_habit.id], tomorrow)
+        self.habits[45].refresh_from_db()
+        self.assertEqual(self.habits[45].next_due_at, tomorrow)
+
+    @override_settings(REMINDER_SCHEDULER='redis')
+    def test_signals_keep_wheel_in_sync(self):
+        """Сохранение и удаление привычки синхронизируют расписание после коммита."""
+        wheel = FakeWheel()
+        with patch('habits.signals.get_wheel', return_value=wheel):
+            with self.captureOnCommitCallbacks(execute=True):
+                habit = Habit.objects.create(
+                    user=self.user, place='Дом', time=time(8, 0), action='Зарядка',
+                    reward='Чай', time_to_complete=60,
+                )
+            self.assertEqual(wheel.due, {habit.id: habit.next_due_at})
+
+            with self.captureOnCommitCallbacks(execute=True):
+                habit.delete()
+            self.assertEqual(wheel.due, {})
+
+
+class TelegramSenderTestCase(SimpleTestCase):
+    """
+    Тестирование асинхронного отправителя на локальном фейковом Bot API.
+    """
+
+    def test_batch_is_delivered_concurrently(self):
+        """Пачка отправляется параллельно: время близко к одной задержке, а не к их сумме."""
+        messages = [(str(100 + i), f'Сообщение {i}') for i in range(20)]
+        with FakeBotAPIServer(latency=0.2) as server:
+            with TelegramSender(token='1:test', base_url=server.base_url, max_in_flight=20) as sender:
+                started = monotonic()
+                results = sender.send_batch(messages)
+                elapsed = monotonic() - started
+
+        self.assertTrue(all(result.ok for result in results))
+        self.assertEqual(sorted(server.messages), sorted(messages))
+        self.assertLess(elapsed, 20 * 0.2 / 2)
+
+    def test_retry_after_is_respected(self):
+        """После ответа 429 сообщение отправляется повторно, не раньше retry_after."""
+        with FakeBotAPIServer(rate_limit_first=1, retry_after=1) as server:
+            with TelegramSender(token='1:test', base_url=server.base_url) as sender:
+                started = monotonic()
+                results = sender.send_batch([('100', 'Привет')])
+                elapsed = monotonic() - started
+
+        self.assertTrue(results[0].ok)
+        self.assertEqual(server.rate_limited, 1)
+        self.assertGreaterEqual(elapsed, 1)
+
+    def test_failed_chat_does_not_block_others(self):
+        """Ошибка в одном чате возвращается в результате, остальные сообщения доставляются."""
+        with FakeBotAPIServer(failing_chats={'200'}) as server:
+            with TelegramSender(token='1:test', base_url=server.base_url) as sender:
+                results = sender.send_batch([('100', 'Раз'), ('200', 'Два'), ('300', 'Три')])
+
+        self.assertEqual([result.ok for result in results], [True, False, True])
+        self.assertIsInstance(results[1].error, telegram.error.Forbidden)
+        self.assertTrue(is_chat_unavailable(results[1].error))
+
+    def test_errors_are_classified(self):
+        """Недоступный чат и временные ошибки различаются по типу ответа Bot API."""
+        self.assertTrue(is_chat_unavailable(telegram.error.BadRequest('Bad Request: chat not found')))
+        self.assertFalse(is_chat_unavailable(telegram.error.BadRequest("Can't parse entities")))
+        self.assertTrue(is_transient(telegram.error.TimedOut()))
+        self.assertTrue(is_transient(telegram.error.RetryAfter(5)))
+        self.assertFalse(is_transient(telegram.error.BadRequest("Can't parse entities")))
+        self.assertFalse(is_transient(telegram.error.Forbidden('Forbidden: bot was blocked by the user')))
+
+    def test_per_chat_rate_limit(self):
+        """Сообщения в один чат разносятся во времени согласно per_chat_rate."""
+        with FakeBotAPIServer() as server:
+            with TelegramSender(token='1:test', base_url=server.base_url, per_chat_rate=5) as sender:
+                started = monotonic()
+                sender.send_batch([('100', f'Сообщение {i}') for i in range(4)])
+                elapsed = monotonic() - started
+
+        self.assertGreaterEqual(elapsed, 3 / 5)
@@ -0,0 +1,84 @@
+import redis
+from django.conf import settings
+
+# Сколько элементов записывать в Redis одной командой
+WRITE_BATCH_SIZE = 5000
+
+# Атомарно забирает из ZSET до ARGV[2] элементов со score < ARGV[1] и удаляет их.
+# Благодаря атомарности несколько одновременных тиков не получат одну и ту же привычку.
+POP_DUE_SCRIPT = """
+local ids = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', '(' .. ARGV[1], 'LIMIT', 0, ARGV[2])
+if #ids > 0 then
+    redis.call('ZREM', KEYS[1], unpack(ids))
+end
+return ids
+"""
+
+
+class ReminderWheel:
+    """
+    Расписание напоминаний в Redis: сортированное множество (ZSET),
+    где элемент — id привычки, а score — unix-время её next_due_at.
+    Выборка привычек, срок которых наступил, стоит O(log n + k)
+    и не требует сканировать таблицу привычек.
+    """
+
+    def __init__(self, client=None, key=None):
+        self.client = client or redis.Redis.from_url(settings.REMINDER_WHEEL_REDIS_URL)
+        self.key = key or settings.REMINDER_WHEEL_KEY
+        self._pop_due = self.client.register_script(POP_DUE_SCRIPT)
+
+    def schedule(self, habit_id, due_at):
+        """Добавляет привычку в расписание или переносит её срок."""
+        self.client.zadd(self.key, {habit_id: due_at.timestamp()})
+
+    def schedule_many(self, due_dates, key=None):
+        """Добавляет в расписание пары {id привычки: срок}."""
+        items = list(due_dates.items())
+        for start in range(0, len(items), WRITE_BATCH_SIZE):
+            batch = items[start:start + WRITE_BATCH_SIZE]
+            self.client.zadd(key or self.key, {habit_id: due_at.timestamp() for habit_id, due_at in batch})
+
+    def unschedule(self, habit_id):
+        """Удаляет привычку из расписания."""
+        self.client.zrem(self.key, habit_id)
+
+    def pop_due(self, until, limit):
+        """Забирает из расписания до limit привычек со сроком раньше until и возвращает их id."""
+        return [int(habit_id) for habit_id in self._pop_due(keys=[self.key], args=[until.timestamp(), limit])]
+
+    def rebuild(self, queryset):
+        """
+        Полностью пересобирает расписание по базе данных.
+        Новое множество строится под временным ключом и атомарно подменяет старое.
+        """
+        tmp_key = f'{self.key}:rebuild'
+        self.client.delete(tmp_key)
+        batch = {}
+        for habit_id, due_at in queryset.values_list('id', 'next_due_at').iterator(chunk_size=WRITE_BATCH_SIZE):
+            batch[habit_id] = due_at
+            if len(batch) >= WRITE_BATCH_SIZE:
+                self.schedule_many(batch, key=tmp_key)
+                batch = {}
+        self.schedule_many(batch, key=tmp_key)
+
+        if self.client.exists(tmp_key):
+            self.client.rename(tmp_key, self.key)
+        else:
+            self.client.delete(self.key)
+
+
+_wheel = None
+
+
+def get_wheel():
+    """Возвращает общий для процесса экземпляр ReminderWheel."""
+    global _wheel
+    if _wheel is None:
+        _wheel = ReminderWheel()
+    return _wheel
+
+
+def wheel_enabled():
+    """True, если напоминания планируются через Redis (REMINDER_SCHEDULER='redis')."""
+    return settings.REMINDER_SCHEDULER == 'redis'
@@ -1,7 +1,7 @@
 from django.urls import path
 from rest_framework.routers import DefaultRouter
 
-from habits.views import MyHabitViewSet, PublicHabitListView
+from habits.views import HabitExportView, HabitImportView, HabitStatsView, MyHabitViewSet, PublicHabitListView
 
 # Создаем роутер для автоматической генерации URL для CRUD
 router = DefaultRouter()
@@ -13,4 +13,13 @@ urlpatterns = [
 
     # Список публичных привычек
     path('public/', PublicHabitListView.as_view(), name='public_habits'),
+
+    # Статистика выполнения личных привычек
+    path('stats/', HabitStatsView.as_view(), name='habit_stats'),
+
+    # Выгрузка привычек всех пользователей (только для администраторов)
+    path('export/', HabitExportView.as_view(), name='export_habits'),
+
+    # Импорт привычек из файла NDJSON/CSV (только для администраторов)
+    path('import/', HabitImportView.as_view(), name='import_habits'),
 ]
@@ -1,18 +1,106 @@
-from rest_framework import viewsets, generics
-from rest_framework.permissions import IsAuthenticated
-from habits.models import Habit
-from habits.serializers import HabitSerializer
+import datetime
+import io
+
+from django.conf import settings
+from django.utils import timezone
+from django.utils.http import parse_etags
+from rest_framework import viewsets, generics, status
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.parsers import MultiPartParser
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
+from rest_framework.renderers import BrowsableAPIRenderer
+from rest_framework.response import Response
+from rest_framework.views import APIView
+from habits import feed_cache
+from habits import export, importer
+from habits.completions import record_check_ins
+from habits.scheduling import get_zone
+from habits.rollups import habit_stats, rollup_position
+from habits.streaks import streak_data
+from habits.bulk import BulkValidationError, bulk_create_habits, bulk_delete_habits, bulk_update_habits
+from habits.models import Habit, HabitTombstone
+from habits.sync import is_expired, make_page_token, next_sync_token, parse_page_token
+from habits.serializers import HabitReadSerializer, HabitSerializer
 from habits.paginators import HabitPaginator
+from habits.renderers import FastJSONRenderer
 from django.contrib.auth.models import AnonymousUser
 
 
-class MyHabitViewSet(viewsets.ModelViewSet):
+class HabitReadMixin:
+    """
+    Быстрое чтение списков привычек: строки читаются через .values()
+    и сериализуются HabitReadSerializer, ответ рендерится FastJSONRenderer.
+    Результат совпадает с HabitSerializer байт в байт.
+    """
+    renderer_classes = [FastJSONRenderer, BrowsableAPIRenderer]
+    # Разворачивать по ?expand= только публичные связанные привычки, даже свои:
+    # страницы ленты кэшируются общими для всех пользователей
+    expand_public_only = False
+
+    def get_requested_fields(self):
+        """
+        Поля из параметра ?fields=action,time в порядке полей HabitSerializer
+        или None, если параметр не задан. Неизвестные поля — ошибка 400.
+        """
+        fields = self.request.query_params.get('fields')
+        if not fields:
+            return None
+        requested = {name.strip() for name in fields.split(',') if name.strip()}
+        allowed = HabitReadSerializer().fields
+        unknown = sorted(requested - set(allowed))
+        if unknown:
+            raise ValidationError({'fields': [f'Неизвестные поля: {", ".join(unknown)}.']})
+        return [name for name in allowed if name in requested]
+
+    def get_requested_expand(self):
+        """
+        Поля из параметра ?expand=related_habit, которые нужно вывести вложенным объектом.
+        Неизвестные поля — ошибка 400.
+        """
+        expand = {name.strip() for name in self.request.query_params.get('expand', '').split(',') if name.strip()}
+        unknown = sorted(expand - set(HabitReadSerializer.expandable))
+        if unknown:
+            raise ValidationError({'expand': [f'Нельзя развернуть поля: {", ".join(unknown)}.']})
+        return expand
+
+    def export_response(self, queryset, filename, extra_columns=()):
+        """
+        Потоковая выгрузка queryset: ?as=ndjson (по умолчанию) или ?as=csv и ?fields=.
+        Параметр называется as, а не format: format DRF использует для выбора рендерера.
+        """
+        export_format = self.request.query_params.get('as', export.NDJSON)
+        if export_format not in export.EXPORT_FORMATS:
+            raise ValidationError({'as': [f'Допустимые форматы: {", ".join(export.EXPORT_FORMATS)}.']})
+        read_serializer = HabitReadSerializer(self.get_requested_fields())
+        return export.export_response(queryset, read_serializer, export_format, filename, extra_columns)
+
+    def list(self, request, *args, **kwargs):
+        """
+        Параметры: ?fields= — вывести только указанные поля,
+        ?expand=related_habit — вывести связанную привычку объектом (читается тем же запросом).
+        """
+        read_serializer = HabitReadSerializer(
+            self.get_requested_fields(), self.get_requested_expand(),
+            viewer=None if self.expand_public_only else request.user.pk,
+        )
+        queryset = self.filter_queryset(self.get_queryset()).values(*read_serializer.columns)
+
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(read_serializer.to_representation(page))
+        return Response(read_serializer.to_representation(queryset))
+
+
+class MyHabitViewSet(HabitReadMixin, viewsets.ModelViewSet):
     """
     CRUD для личных привычек пользователя.
     """
     serializer_class = HabitSerializer
     permission_classes = [IsAuthenticated]
     pagination_class = HabitPaginator
+    # Поля, которые читаются всегда, даже при ?fields=: по ним проверяется доступ
+    ALWAYS_LOADED_FIELDS = ('id', 'user', 'is_public')
 
     def get_queryset(self):
         """
@@ -22,7 +110,78 @@ class MyHabitViewSet(viewsets.ModelViewSet):
         if isinstance(self.request.user, AnonymousUser):
             return Habit.objects.none()
 
-        return Habit.objects.filter(user=self.request.user)
+        queryset = Habit.objects.filter(user=self.request.user)
+        if self.action == 'retrieve':
+            fields = self.get_requested_fields()
+            if fields is not None:
+                # Читаем только запрошенные столбцы и те, что нужны для проверки доступа
+                queryset = queryset.only(*self.ALWAYS_LOADED_FIELDS, *fields)
+        return queryset
+
+    def get_object(self):
+        """
+        Все привычки выборки принадлежат текущему пользователю: подставляем его в привычку,
+        чтобы сериализатор и save() брали часовой пояс без повторного чтения пользователя.
+        """
+        habit = super().get_object()
+        habit.user = self.request.user
+        return habit
+
+    def retrieve(self, request, *args, **kwargs):
+        """
+        С параметром ?fields= выводятся и читаются из базы только указанные поля.
+        """
+        serializer = self.get_serializer(self.get_object(), fields=self.get_requested_fields())
+        return Response(serializer.data)
+
+    def list(self, request, *args, **kwargs):
+        """
+        С параметром since=<токен> возвращает только изменения после токена:
+        изменённые привычки (changed), id удалённых (deleted) и токен для следующего
+        запроса (since). since=0 — полная выгрузка, с которой клиент начинает синхронизацию.
+        Изменения отдаются страницами по HABIT_SYNC_PAGE_SIZE в порядке (updated_at, id):
+        пока next не пуст, клиент передаёт его в since; deleted и since приходят с последней страницей.
+        Без since — обычный постраничный список.
+        """
+        if 'since' not in request.query_params:
+            return super().list(request, *args, **kwargs)
+
+        since, position = parse_page_token(request.query_params['since'])
+        if is_expired(since):
+            return Response(
+                {'detail': 'Токен синхронизации устарел, выполните полную синхронизацию (since=0).'},
+                status=status.HTTP_410_GONE,
+            )
+
+        # Токен берётся до чтения, чтобы изменения во время чтения попали в следующую синхронизацию
+        token = next_sync_token()
+        read_serializer = HabitReadSerializer(viewer=request.user.pk)
+        changed = self.get_queryset().filter(updated_at__gt=since)
+        if position is not None:
+            # Условие записано так, чтобы по индексу (user, updated_at) читался диапазон после позиции
+            updated_at, habit_id = position
+            changed = changed.filter(updated_at__gte=updated_at).exclude(updated_at=updated_at, id__lte=habit_id)
+        page_size = settings.HABIT_SYNC_PAGE_SIZE
+        rows = list(
+            changed.order_by('updated_at', 'id')
+            .values(*dict.fromkeys((*read_serializer.columns, 'updated_at')))[:page_size + 1]
+        )
+        if len(rows) > page_size:
+            last = rows[page_size - 1]
+            return Response({
+                'since': None,
+                'next': make_page_token(since, last['updated_at'], last['id']),
+                'changed': read_serializer.to_representation(rows[:page_size]),
+                'deleted': [],
+            })
+
+        deleted = HabitTombstone.objects.filter(user=request.user, deleted_at__gt=since).order_by('deleted_at')
+        return Response({
+            'since': token,
+            'next': None,
+            'changed': read_serializer.to_representation(rows),
+            'deleted': list(deleted.values_list('habit_id', flat=True)),
+        })
 
     def perform_create(self, serializer):
         """
@@ -30,14 +189,70 @@ class MyHabitViewSet(viewsets.ModelViewSet):
         """
         serializer.save(user=self.request.user)
 
+    @action(detail=False, methods=['post', 'patch', 'delete'], url_path='bulk')
+    def bulk(self, request):
+        """
+        Массовые операции над личными привычками в одной транзакции:
+        POST — создать список привычек, PATCH — частично обновить список
+        (каждый элемент содержит id), DELETE — удалить привычки по списку id.
+        Ошибки возвращаются по каждому элементу с его индексом; при любой ошибке ничего не записывается.
+        """
+        try:
+            if request.method == 'DELETE':
+                bulk_delete_habits(request.data, self.get_queryset())
+                return Response(status=status.HTTP_204_NO_CONTENT)
+
+            if request.method == 'POST':
+                habits = bulk_create_habits(request.data, request)
+                response_status = status.HTTP_201_CREATED
+            else:
+                habits = bulk_update_habits(request.data, request, self.get_queryset())
+                response_status = status.HTTP_200_OK
+        except BulkValidationError as e:
+            return Response({'errors': e.errors}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(self.get_serializer(habits, many=True).data, status=response_status)
 
-class PublicHabitListView(generics.ListAPIView):
+    @action(detail=False, methods=['post'], url_path='check-in')
+    def check_in(self, request):
+        """
+        Отметки о выполнении привычек пачкой: [{"habit": id, "completed_at": "2025-01-01T08:00:00+03:00"}, ...].
+        Время без пояса понимается в поясе пользователя. Повторно отправленные отметки
+        пропускаются, поэтому офлайн-клиент может выгрузить накопленные отметки одним запросом
+        и безопасно повторить его. При любой ошибке ничего не записывается.
+        В ответе — сколько отметок пришло (received), сколько из них записано (created)
+        и пропущено как повторы (duplicates), и обновлённые серии привычек пачки.
+        """
+        try:
+            result = record_check_ins(request.data, request.user)
+        except BulkValidationError as e:
+            return Response({'errors': e.errors}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(result, status=status.HTTP_201_CREATED)
+
+    @action(detail=True, methods=['get'])
+    def streak(self, request, pk=None):
+        """
+        Серии выполнений привычки: текущая (с учётом периодичности на сегодня), самая длинная
+        и время последней отметки. Значения хранятся в привычке, история не читается.
+        """
+        habit = self.get_object()
+        return Response(streak_data(habit, timezone.now(), get_zone(request.user.timezone)))
+
+    @action(detail=False, methods=['get'], url_path='export')
+    def export(self, request):
+        """
+        Выгрузка всех привычек пользователя одним потоковым ответом (NDJSON или CSV, см. ?as=).
+        """
+        return self.export_response(self.get_queryset(), filename='habits')
+
+
+class PublicHabitListView(HabitReadMixin, generics.ListAPIView):
     """
     Список всех публичных привычек. Только для чтения.
     """
     serializer_class = HabitSerializer
     permission_classes = [IsAuthenticated]
     pagination_class = HabitPaginator
+    expand_public_only = True
 
     def get_queryset(self):
         """
@@ -45,3 +260,111 @@ class PublicHabitListView(generics.ListAPIView):
         """
         return Habit.objects.filter(is_public=True)
 
+    def list(self, request, *args, **kwargs):
+        """
+        Страницы ленты кэшируются по версии ленты, которая меняется при изменении
+        публичных привычек (см. habits.signals). ETag определяется версией и параметрами
+        запроса, поэтому на совпавший If-None-Match ответ 304 отдаётся без чтения страницы.
+        Заголовок X-Cache показывает, из кэша ли ответ.
+        """
+        page_key = feed_cache.feed_page_key(feed_cache.get_feed_version(), request.get_host(), request.query_params)
+        etag = feed_cache.feed_etag(page_key)
+        headers = {'ETag': etag}
+
+        if etag in parse_etags(request.headers.get('If-None-Match', '')):
+            feed_cache.count(feed_cache.NOT_MODIFIED)
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+        data = feed_cache.get_feed_page(page_key)
+        if data is not None:
+            feed_cache.count(feed_cache.HIT)
+            return Response(data, headers={**headers, 'X-Cache': 'HIT'})
+
+        feed_cache.count(feed_cache.MISS)
+        response = super().list(request, *args, **kwargs)
+        feed_cache.set_feed_page(page_key, response.data)
+        response['ETag'] = etag
+        response['X-Cache'] = 'MISS'
+        return response
+
+
+class HabitExportView(HabitReadMixin, generics.GenericAPIView):
+    """
+    Выгрузка привычек всех пользователей для администраторов (NDJSON или CSV, см. ?as=).
+    Первым столбцом идёт id владельца; ?user=<id> ограничивает выгрузку одним пользователем.
+    """
+    serializer_class = HabitSerializer
+    permission_classes = [IsAdminUser]
+    queryset = Habit.objects.all()
+
+    def get(self, request):
+        queryset = self.get_queryset()
+        user_id = request.query_params.get('user')
+        if user_id is not None:
+            if not user_id.isdigit():
+                raise ValidationError({'user': ['Ожидается id пользователя.']})
+            queryset = queryset.filter(user_id=user_id)
+        return self.export_response(queryset, filename='habits-all', extra_columns=('user',))
+
+
+class HabitImportView(generics.GenericAPIView):
+    """
+    Импорт привычек из файла NDJSON или CSV для администраторов (поле формы file).
+    Правила те же, что у команды import_habits; формат — ?as= или расширение файла,
+    ?user=<id> — владелец для строк без столбца user. В ответе — счётчики, скорость
+    и первые отклонённые строки. Большие файлы лучше загружать командой import_habits.
+    """
+    permission_classes = [IsAdminUser]
+    parser_classes = [MultiPartParser]
+    # Сколько отклонённых строк вернуть в ответе
+    max_reported_errors = 100
+
+    def post(self, request):
+        upload = request.FILES.get('file')
+        if upload is None:
+            raise ValidationError({'file': ['Файл не передан.']})
+        import_format = request.query_params.get('as') or upload.name.rsplit('.', 1)[-1].lower()
+        if import_format not in importer.IMPORT_FORMATS:
+            raise ValidationError({'as': [f'Допустимые форматы: {", ".join(importer.IMPORT_FORMATS)}.']})
+        user_id = request.query_params.get('user')
+        if user_id is not None and not user_id.isdigit():
+            raise ValidationError({'user': ['Ожидается id пользователя.']})
+
+        rejected = []
+
+        def reject(line_number, row, errors):
+            if len(rejected) < self.max_reported_errors:
+                rejected.append({'line': line_number, 'row': row, 'errors': errors})
+
+        stream = io.TextIOWrapper(upload.file, encoding='utf-8', newline='')
+        report = importer.import_habits(importer.read_rows(stream, import_format), reject, default_user_id=user_id)
+        return Response({**report, 'rows_per_second': importer.rows_per_second(report), 'errors': rejected})
+
+
+class HabitStatsView(APIView):
+    """
+    Статистика выполнения личных привычек за период ?start=ГГГГ-ММ-ДД&end=ГГГГ-ММ-ДД
+    (включительно, по умолчанию — последние 30 дней): по привычкам, дням недели и часам.
+    Считается по дневным сводкам, поэтому время ответа зависит от длины периода,
+    а не от количества отметок. rolled_up_to — до какого момента отметки учтены в сводках.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        today = timezone.now().astimezone(get_zone(request.user.timezone)).date()
+        end = self.parse_day('end', today)
+        start = self.parse_day('start', end - datetime.timedelta(days=29))
+        if start > end:
+            raise ValidationError({'start': ['Начало периода позже конца.']})
+        if (end - start).days + 1 > settings.HABIT_STATS_MAX_DAYS:
+            raise ValidationError({'start': [f'Период не длиннее {settings.HABIT_STATS_MAX_DAYS} дней.']})
+        return Response({**habit_stats(request.user, start, end), 'rolled_up_to': rollup_position()})
+
+    def parse_day(self, name, default):
+        value = self.request.query_params.get(name)
+        if value is None:
+            return default
+        try:
+            return datetime.date.fromisoformat(value)
+        except ValueError:
+            raise ValidationError({name: ['Ожидается дата в формате ГГГГ-ММ-ДД.']})
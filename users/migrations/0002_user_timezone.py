@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:23
+
+import users.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='timezone',
+            field=models.CharField(default='UTC', help_text='Часовой пояс пользователя (например, Europe/Moscow); время привычек указывается в нём.', max_length=64, validators=[users.validators.validate_timezone], verbose_name='Часовой пояс'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0002_user_timezone'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='telegram_paused_at',
+            field=models.DateTimeField(blank=True, help_text='Когда рассылка была приостановлена, потому что чат недоступен (бот заблокирован или чат не найден).', null=True, verbose_name='Рассылка приостановлена'),
+        ),
+    ]
@@ -1,6 +1,8 @@
 from django.contrib.auth.models import AbstractUser
 from django.db import models
 
+from users.validators import validate_timezone
+
 
 class User(AbstractUser):
     """
@@ -16,6 +18,21 @@ class User(AbstractUser):
         help_text='Уникальный ID пользователя в Телеграм для рассылки уведомлений.'
     )
 
+    telegram_paused_at = models.DateTimeField(
+        blank=True,
+        null=True,
+        verbose_name='Рассылка приостановлена',
+        help_text='Когда рассылка была приостановлена, потому что чат недоступен (бот заблокирован или чат не найден).'
+    )
+
+    timezone = models.CharField(
+        max_length=64,
+        default='UTC',
+        validators=[validate_timezone],
+        verbose_name='Часовой пояс',
+        help_text='Часовой пояс пользователя (например, Europe/Moscow); время привычек указывается в нём.'
+    )
+
     class Meta:
         verbose_name = 'пользователь'
         verbose_name_plural = 'пользователи'
@@ -6,7 +6,7 @@ class UserCreateSerializer(serializers.ModelSerializer):
     class Meta:
         model = User
         # Включаем все поля, необходимые для регистрации, включая username и password
-        fields = ('id', 'email', 'username', 'password', 'telegram_id')
+        fields = ('id', 'email', 'username', 'password', 'telegram_id', 'timezone')
         extra_kwargs = {'password': {'write_only': True}} # Пароль только для записи
 
     def create(self, validated_data):
@@ -15,6 +15,7 @@ class UserCreateSerializer(serializers.ModelSerializer):
             email=validated_data['email'],
             username=validated_data['username'],
             telegram_id=validated_data.get('telegram_id'),
+            timezone=validated_data.get('timezone', 'UTC'),
         )
         user.set_password(validated_data['password'])
         user.save()
@@ -24,6 +25,13 @@ class UserSerializer(serializers.ModelSerializer):
     """Сериализатор для отображения данных пользователя (после регистрации/авторизации)."""
     class Meta:
         model = User
-        fields = ('id', 'email', 'username', 'telegram_id', 'is_staff')
+        fields = ('id', 'email', 'username', 'telegram_id', 'telegram_paused_at', 'timezone', 'is_staff')
+        read_only_fields = ('telegram_paused_at',)
         ref_name = 'CustomUser'
 
+    def update(self, instance, validated_data):
+        # Новый ID Телеграм снимает паузу рассылки, поставленную из-за недоступного чата
+        if 'telegram_id' in validated_data and validated_data['telegram_id'] != instance.telegram_id:
+            validated_data['telegram_paused_at'] = None
+        return super().update(instance, validated_data)
+
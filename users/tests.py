@@ -1,3 +1,43 @@
 from django.test import TestCase
+from django.utils import timezone
 
-# Create your tests here.
+from users.models import User
+from users.serializers import UserCreateSerializer, UserSerializer
+
+
+class UserTimezoneTestCase(TestCase):
+    """
+    Тестирование часового пояса пользователя.
+    """
+
+    def test_timezone_defaults_to_utc(self):
+        """Если пояс не указан при регистрации, используется UTC."""
+        serializer = UserCreateSerializer(data={
+            'email': 'user@example.com', 'username': 'user', 'password': 'secret-pass-123',
+        })
+        self.assertTrue(serializer.is_valid(), serializer.errors)
+        self.assertEqual(serializer.save().timezone, 'UTC')
+
+    def test_unknown_timezone_is_rejected(self):
+        """Неизвестное имя часового пояса не проходит валидацию."""
+        serializer = UserCreateSerializer(data={
+            'email': 'user@example.com', 'username': 'user', 'password': 'secret-pass-123',
+            'timezone': 'Mars/Olympus',
+        })
+        self.assertFalse(serializer.is_valid())
+        self.assertIn('timezone', serializer.errors)
+
+
+class UserTelegramPauseTestCase(TestCase):
+    """
+    Тестирование паузы рассылки для недоступного чата.
+    """
+
+    def test_new_telegram_id_resumes_reminders(self):
+        """Смена ID Телеграм снимает паузу рассылки."""
+        user = User.objects.create_user(
+            username='user', password='pass', telegram_id='111', telegram_paused_at=timezone.now()
+        )
+        serializer = UserSerializer(user, data={'telegram_id': '222'}, partial=True)
+        self.assertTrue(serializer.is_valid(), serializer.errors)
+        self.assertIsNone(serializer.save().telegram_paused_at)
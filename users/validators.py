@@ -0,0 +1,18 @@
+import functools
+import zoneinfo
+
+from django.core.exceptions import ValidationError
+
+
+@functools.lru_cache(maxsize=None)
+def timezone_names():
+    """Имена поясов базы IANA: available_timezones() обходит файлы tzdata, поэтому читаются один раз."""
+    return frozenset(zoneinfo.available_timezones())
+
+
+def validate_timezone(value):
+    """
+    Валидатор: часовой пояс должен быть именем из базы IANA (например, Europe/Moscow).
+    """
+    if value not in timezone_names():
+        raise ValidationError(f"Неизвестный часовой пояс: {value}.")